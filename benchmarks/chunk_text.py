@@ -0,0 +1,87 @@
+"""
+Benchmarks ops.chunk_text on a synthetic 10-hour transcript.
+
+Usage: PYTHONPATH=. python benchmarks/chunk_text.py [--hours 10] [--legacy]
+"""
+
+import argparse
+import random
+import time
+from typing import Callable
+
+from platogram.ops import chunk_text, parse, render
+
+WORDS = "the of and to in is that it was for on are as with his they at be this from have or by".split()
+
+
+def synthetic_transcript(hours: float, seconds_per_event: float = 3.0, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    n_events = int(hours * 3600 / seconds_per_event)
+    return render(
+        {i: " ".join(rng.choices(WORDS, k=rng.randint(4, 16))) + "." for i in range(n_events)}
+    )
+
+
+def token_count(text: str) -> int:
+    # Additive stand-in for a tokenizer, so both implementations must agree exactly.
+    return text.count(" ") + text.count("【")
+
+
+def legacy_chunk_text(
+    text_with_markers: str, chunk_size: int, token_count_fn: Callable[[str], int]
+) -> list[str]:
+    segments = parse(text_with_markers)
+    total_tokens = token_count_fn(render(segments))
+    num_chunks = (total_tokens + chunk_size - 1) // chunk_size
+    target_chunk_size = (total_tokens + num_chunks - 1) // num_chunks
+
+    chunks = []
+    chunk_segments: dict[int, str] = {}
+    for key, segment in segments.items():
+        updated_chunk_segments = {**chunk_segments, key: segment}
+        if token_count_fn(render(updated_chunk_segments)) > target_chunk_size and chunk_segments:
+            chunks.append(chunk_segments)
+            chunk_segments = {key: segment}
+        else:
+            chunk_segments = updated_chunk_segments
+
+    if chunk_segments:
+        chunks.append(chunk_segments)
+
+    return [render(chunk) for chunk in chunks]
+
+
+def measure(fn: Callable[[], list[str]], repeat: int) -> tuple[float, list[str]]:
+    best = float("inf")
+    result: list[str] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hours", type=float, default=10.0)
+    parser.add_argument("--chunk-size", type=int, default=2048)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy", action="store_true", help="Also time the quadratic implementation")
+    args = parser.parse_args()
+
+    text = synthetic_transcript(args.hours)
+    print(f"transcript: {args.hours}h, {len(parse(text))} markers, {len(text)} chars")
+
+    elapsed, chunks = measure(lambda: chunk_text(text, args.chunk_size, token_count), args.repeat)
+    print(f"chunk_text: {len(chunks)} chunks in {elapsed * 1000:.1f} ms")
+
+    if args.legacy:
+        legacy_elapsed, legacy_chunks = measure(
+            lambda: legacy_chunk_text(text, args.chunk_size, token_count), args.repeat
+        )
+        print(f"legacy:     {len(legacy_chunks)} chunks in {legacy_elapsed * 1000:.1f} ms")
+        print(f"speedup:    {legacy_elapsed / elapsed:.1f}x, identical: {chunks == legacy_chunks}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmarks ingestion and retrieval of LocalChromaLibrary: passages/sec of put() one document at a
+time and of put_many(), with a cold and a warm embedding cache, and query latency.
+
+Usage: PYTHONPATH=. python benchmarks/embeddings.py [--model local/hashing] [--documents 100] [--passages 50]
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from platogram.library.semantic_local_chroma import LocalChromaLibrary
+from platogram.types import Content, SpeechEvent
+
+WORDS = "the of and to in is that it was for on are as with his they at be this from have or by".split()
+WORDS += [f"topic{i}" for i in range(500)]
+
+
+def synthetic_content(n_passages: int, rng: random.Random) -> Content:
+    return Content(
+        title=" ".join(rng.choices(WORDS, k=4)),
+        summary=" ".join(rng.choices(WORDS, k=40)),
+        chapters={0: "All Content"},
+        passages=[" ".join(rng.choices(WORDS, k=60)) + f"【{i}】" for i in range(n_passages)],
+        transcript=[SpeechEvent(time_ms=0, text="")],
+    )
+
+
+def ingest(home: Path, model: str, contents: dict[str, Content], batched: bool) -> float:
+    library = LocalChromaLibrary(home, model)
+    start = time.perf_counter()
+    if batched:
+        library.put_many(contents)
+    else:
+        for id, content in contents.items():
+            library.put(id, content)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="local/hashing")
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--passages", type=int, default=50, help="Passages per document")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    contents = {f"doc-{i}": synthetic_content(args.passages, rng) for i in range(args.documents)}
+    n_passages = args.documents * args.passages
+    print(f"{args.model}: {args.documents} documents x {args.passages} passages")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, batched in [("put", False), ("put_many", True)]:
+            home = Path(tmp) / name
+            cold = ingest(home, args.model, contents, batched)
+            warm = ingest(home, args.model, contents, batched)
+            print(
+                f"{name:>8}: {n_passages / cold:8.0f} passages/s cold cache, "
+                f"{n_passages / warm:8.0f} passages/s warm cache"
+            )
+
+        library = LocalChromaLibrary(Path(tmp) / "put_many", args.model)
+        ids = list(contents)[: max(args.documents // 10, 1)]
+        for name, filter_keys in [("all documents", []), (f"{len(ids)} documents", ids)]:
+            times = []
+            for _ in range(args.queries):
+                query = " ".join(rng.choices(WORDS, k=5))
+                start = time.perf_counter()
+                library.retrieve(query, 10, filter_keys)
+                times.append(time.perf_counter() - start)
+            print(f"query {name}: median {statistics.median(times) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmarks ingest.extract_images on a local video against the previous implementation,
+which ran one seeking ffmpeg process per timestamp, and checks that both write the same images.
+
+Timestamps are spaced like transcript events (every 2.4 s, 1500 an hour). Without --video a
+synthetic test video is generated with ffmpeg first.
+
+Usage: PYTHONPATH=. python benchmarks/frame_extraction.py [--video talk.mp4] [--duration 300] [--workers 1 4]
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from platogram import ingest
+
+
+def seek_per_timestamp(video_path: Path, output_dir: Path, timestamps_ms: list[int]) -> list[Path]:
+    image_paths = []
+    for timestamp_ms in timestamps_ms:
+        image_path = ingest.image_path(output_dir, timestamp_ms)
+        subprocess.run(
+            ["ffmpeg", "-ss", f"{timestamp_ms / 1000:.3f}", "-i", str(video_path)]
+            + ["-frames:v", "1", "-q:v", "2", "-f", "image2", str(image_path)],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        image_paths.append(image_path)
+    return image_paths
+
+
+def make_video(path: Path, duration_s: int) -> None:
+    subprocess.run(
+        ["ffmpeg", "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=30", "-t", str(duration_s)]
+        + ["-c:v", "libx264", "-preset", "ultrafast", "-g", "250", str(path)],
+        check=True,
+        capture_output=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--video", type=Path, help="Local video, generated if not given")
+    parser.add_argument("--duration", type=int, default=300, help="Seconds of video to take images from")
+    parser.add_argument("--interval-ms", type=int, default=2400, help="Milliseconds between timestamps")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        video = args.video
+        if video is None:
+            video = tmp_dir / "video.mp4"
+            make_video(video, args.duration)
+        timestamps_ms = list(range(0, args.duration * 1000 - 1000, args.interval_ms))
+        print(f"{video.name}: {args.duration} s, {len(timestamps_ms)} timestamps")
+
+        baseline_dir = tmp_dir / "baseline"
+        baseline_dir.mkdir()
+        start = time.perf_counter()
+        baseline = seek_per_timestamp(video, baseline_dir, timestamps_ms)
+        elapsed = time.perf_counter() - start
+        print(f"{'ffmpeg per timestamp':>22}: {elapsed:6.1f} s, {len(timestamps_ms) / elapsed:6.1f} frames/s")
+
+        for workers in args.workers:
+            output_dir = tmp_dir / f"workers-{workers}"
+            output_dir.mkdir()
+            # extract_images deletes a local video after extraction, so it gets a link to it
+            link = output_dir / "video.mp4"
+            os.link(video, link)
+            start = time.perf_counter()
+            images = ingest.extract_images(f"file://{link}", output_dir, timestamps_ms, workers=workers)
+            elapsed = time.perf_counter() - start
+            same = all(a.read_bytes() == b.read_bytes() for a, b in zip(images, baseline))
+            print(
+                f"{f'single pass, {workers} workers':>22}: {elapsed:6.1f} s, "
+                f"{len(timestamps_ms) / elapsed:6.1f} frames/s, same images: {same}"
+            )
+
+
+if __name__ == "__main__":
+    main()
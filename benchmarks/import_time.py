@@ -0,0 +1,96 @@
+"""
+Benchmarks startup: `import platogram`, `import platogram.cli` and a read-only `plato` command
+(printing titles of content already in the library) in fresh interpreters.
+
+Usage: PYTHONPATH=. python benchmarks/import_time.py [--runs 10] [--target-ms 150] [--top 10]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from platogram.library import get_local_dumb
+from platogram.types import Content, SpeechEvent
+
+IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_times(statement: str) -> dict[str, tuple[int, int]]:
+    """Runs `statement` under -X importtime, returns (self, cumulative) microseconds by module."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if match := IMPORTTIME.match(line):
+            times[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return times
+
+
+def wall_time(args: list[str], cwd: Path) -> float:
+    start = time.perf_counter()
+    subprocess.run(args, cwd=cwd, capture_output=True, check=True, env=os.environ)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--target-ms", type=float, default=150)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ["PYTHONPATH"] = os.pathsep.join(
+        [str(Path(__file__).resolve().parent.parent), os.environ.get("PYTHONPATH", "")]
+    )
+
+    for module in ["platogram", "platogram.cli"]:
+        runs = [import_times(f"import {module}") for _ in range(args.runs)]
+        total = statistics.median(times[module][1] for times in runs) / 1000
+        print(f"import {module}: {total:.1f} ms (median of {args.runs})")
+
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1][0], reverse=True)[: args.top]
+    print("\nSlowest modules imported by platogram.cli (self time):")
+    for module, (self_us, cumulative_us) in slowest:
+        print(f"  {module:<50} {self_us / 1000:7.1f} ms  (cumulative {cumulative_us / 1000:.1f} ms)")
+
+    heavy = [module for module in ["anthropic", "yt_dlp", "requests", "tqdm"] if module in runs[-1]]
+    print(f"\nHeavy dependencies loaded by platogram.cli: {', '.join(heavy) or 'none'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = Path(tmp)
+        library = get_local_dumb(cwd / ".platogram-cache")
+        library.put(
+            "sample",
+            Content(
+                title="Sample",
+                summary="Sample summary.",
+                passages=["Sample passage【0】"],
+                transcript=[SpeechEvent(time_ms=0, text="Sample passage.")],
+                chapters={0: "Sample"},
+            ),
+        )
+
+        command = [sys.executable, "-m", "platogram.cli", "--title"]
+        wall_time(command, cwd)
+        baseline = statistics.median(wall_time([sys.executable, "-c", "pass"], cwd) for _ in range(args.runs))
+        elapsed = statistics.median(wall_time(command, cwd) for _ in range(args.runs))
+
+    startup = (elapsed - baseline) * 1000
+    print(
+        f"\nplato --title: {elapsed * 1000:.1f} ms wall, {startup:.1f} ms over a bare interpreter "
+        f"(target {args.target_ms:.0f} ms): {'ok' if startup <= args.target_ms else 'over target'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
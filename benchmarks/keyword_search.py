@@ -0,0 +1,66 @@
+"""
+Benchmarks keyword retrieval of LocalBM25Library on a synthetic library: indexing and compaction
+time, and query latency across all documents and within a subset of them.
+
+Usage: PYTHONPATH=. python benchmarks/keyword_search.py [--documents 2000] [--passages 100]
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from platogram.library.keyword_local_bm25 import LocalBM25Library
+from platogram.types import Content, SpeechEvent
+
+WORDS = [f"word{i}" for i in range(5000)]
+
+
+def synthetic_content(n_passages: int, rng: random.Random) -> Content:
+    return Content(
+        title=" ".join(rng.choices(WORDS, k=4)),
+        summary=" ".join(rng.choices(WORDS, k=40)),
+        chapters={0: "All Content"},
+        passages=[" ".join(rng.choices(WORDS, k=60)) + f"【{i}】" for i in range(n_passages)],
+        transcript=[SpeechEvent(time_ms=0, text="")],
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--passages", type=int, default=100, help="Passages per document")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        library = LocalBM25Library(Path(tmp), compact_threshold=20 * args.passages)
+
+        start = time.perf_counter()
+        for i in range(args.documents):
+            library.put(f"doc-{i}", synthetic_content(args.passages, rng))
+        elapsed = time.perf_counter() - start
+        print(f"put {args.documents} documents x {args.passages} passages: {elapsed:.1f} s")
+
+        start = time.perf_counter()
+        library.compact()
+        print(f"compact: {time.perf_counter() - start:.2f} s")
+
+        library = LocalBM25Library(Path(tmp))
+        queries = [" ".join(rng.choices(WORDS, k=3)) for _ in range(args.queries)]
+        ids = [f"doc-{i}" for i in range(0, args.documents, 10)]
+        for name, filter_keys in [("all documents", []), (f"{len(ids)} documents", ids)]:
+            times = []
+            for query in queries:
+                start = time.perf_counter()
+                library.passage_index.search(query, 10, filter_keys)
+                times.append(time.perf_counter() - start)
+            print(f"search {name}: median {statistics.median(times) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
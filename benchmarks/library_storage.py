@@ -0,0 +1,97 @@
+"""
+Compares the JSON library (LocalDumbLibrary) with the binary one (LocalBinaryLibrary) on a
+synthetic library: on-disk size, migration time and load latency of the whole content
+and of the title alone.
+
+Usage: PYTHONPATH=. python benchmarks/library_storage.py [--documents 500] [--hours 1]
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from platogram.library.local_binary import LocalBinaryLibrary, migrate
+from platogram.library.local_dumb import LocalDumbLibrary
+from platogram.types import Content, SpeechEvent
+
+WORDS = "the of and to in is that it was for on are as with his they at be this from have or by".split()
+
+
+def synthetic_content(hours: float, rng: random.Random, seconds_per_event: float = 3.0) -> Content:
+    n_events = int(hours * 3600 / seconds_per_event)
+    transcript = [
+        SpeechEvent(
+            time_ms=int(i * seconds_per_event * 1000) + rng.randint(0, 999),
+            text=" ".join(rng.choices(WORDS, k=rng.randint(4, 16))) + ".",
+        )
+        for i in range(n_events)
+    ]
+    passages = [
+        " ".join(event.text for event in transcript[i : i + 20]) + f"【{i}】"
+        for i in range(0, n_events, 20)
+    ]
+    return Content(
+        title=" ".join(rng.choices(WORDS, k=6)).title(),
+        summary=" ".join(rng.choices(WORDS, k=80)) + ".",
+        chapters={i: " ".join(rng.choices(WORDS, k=4)) for i in range(0, n_events, 200)},
+        passages=passages,
+        transcript=transcript,
+        origin="https://example.com/recording",
+    )
+
+
+def size(home: Path, pattern: str) -> int:
+    return sum(file.stat().st_size for file in home.glob(pattern))
+
+
+def latency(load: Callable[[str], object], ids: list[str]) -> float:
+    """Median milliseconds per load."""
+    times = []
+    for id in ids:
+        start = time.perf_counter()
+        load(id)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--hours", type=float, default=1.0, help="Transcript length of each document")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_library = LocalDumbLibrary(Path(tmp) / "json")
+        for i in range(args.documents):
+            json_library.put(f"doc-{i}", synthetic_content(args.hours, rng))
+        ids = json_library.ls()
+
+        start = time.perf_counter()
+        migrate(json_library.home, Path(tmp) / "binary")
+        migration = time.perf_counter() - start
+        binary_library = LocalBinaryLibrary(Path(tmp) / "binary")
+
+        json_size = size(json_library.home, "*.json")
+        binary_size = size(binary_library.home, "*.plato")
+        print(f"{args.documents} documents, {args.hours:g} h transcripts each")
+        print(f"on disk: json {json_size / 2**20:.1f} MiB, binary {binary_size / 2**20:.1f} MiB "
+              f"({json_size / binary_size:.1f}x smaller)")
+        print(f"migration: {migration:.2f} s ({migration / args.documents * 1000:.1f} ms per document)")
+
+        print("median load latency:")
+        print(f"  json   get_content        {latency(json_library.get_content, ids):8.3f} ms")
+        print(f"  binary get_content        {latency(binary_library.get_content, ids):8.3f} ms")
+        title = latency(lambda id: binary_library.get_fields(id, ["title"]), ids)
+        print(f"  binary get_fields(title)  {title:8.3f} ms")
+        summary = latency(lambda id: binary_library.get_fields(id, ["title", "summary", "chapters"]), ids)
+        print(f"  binary get_fields(title, summary, chapters) {summary:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
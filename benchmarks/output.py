@@ -0,0 +1,85 @@
+"""
+Benchmarks writing the output of `plato` for a library of many documents with every section
+and inline references: the previous renderer, which substituted markers over the whole
+accumulated output after every document, against the streaming writers of platogram.output.
+
+Usage: PYTHONPATH=. python benchmarks/output.py [--documents 200] [--events 500]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from platogram.library.local_dumb import LocalDumbLibrary
+from platogram.output import (
+    SECTIONS,
+    get_writer,
+    render_paragraph,
+    render_passages,
+    render_reference,
+    render_transcript,
+)
+from platogram.types import Content, SpeechEvent
+
+WORDS = "the of and to in is that it was for on are as with his they at be this from".split()
+
+
+def synthetic_content(n_events: int, rng: random.Random) -> Content:
+    transcript = [SpeechEvent(time_ms=i * 2500, text=" ".join(rng.choices(WORDS, k=12))) for i in range(n_events)]
+    passages = [
+        " ".join(f"{transcript[i].text}【{i}】" for i in range(start, min(start + 8, n_events)))
+        for start in range(0, n_events, 8)
+    ]
+    return Content(
+        title=" ".join(rng.choices(WORDS, k=5)),
+        summary=" ".join(rng.choices(WORDS, k=60)),
+        chapters={i: f"Chapter {i}" for i in range(0, n_events, 100)},
+        passages=passages,
+        transcript=transcript,
+        origin="https://example.com/video",
+    )
+
+
+def previous_renderer(contents: list[Content]) -> str:
+    result = ""
+    for content in contents:
+        result += f"{content.origin}\n\n\n\n{content.title}\n\n\n\n{content.summary}\n\n\n\n"
+        result += f"{render_passages(content, True)}\n\n\n\n"
+        result += f"{render_transcript(0, len(content.transcript), content.transcript, content.origin)}\n\n\n\n"
+        fn = lambda i, content=content: render_reference(content.origin or "", content.transcript, i)  # noqa: E731
+        result = render_paragraph(result, fn)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--events", type=int, default=500, help="Transcript events per document")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sections = [section for section in SECTIONS if section != "images"]
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        library = LocalDumbLibrary(Path(tmp))
+        for i in range(args.documents):
+            library.put(f"doc-{i}", synthetic_content(args.events, rng))
+        ids = library.ls()
+        print(f"{args.documents} documents x {args.events} events")
+
+        start = time.perf_counter()
+        devnull.write(previous_renderer([library.get_content(id) for id in ids]) + "\n")
+        print(f"{'previous':>10}: {time.perf_counter() - start:6.2f} s")
+
+        for format in ["markdown", "json", "html"]:
+            start = time.perf_counter()
+            writer = get_writer(format, devnull, sections, inline_references=True)  # type: ignore
+            writer.write_all(library.get_content(id) for id in ids)
+            print(f"{format:>10}: {time.perf_counter() - start:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
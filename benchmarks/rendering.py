@@ -0,0 +1,61 @@
+"""
+Benchmarks building the ContentIndex and rendering a long synthetic content the way `plato`
+does with --passages --chapters --references --inline-references.
+
+Usage: PYTHONPATH=. python benchmarks/rendering.py [--events 10000] [--repeat 5]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from platogram.output import render_paragraph, render_passages, render_reference, render_transcript
+from platogram.types import Content, ContentIndex, SpeechEvent
+
+
+def synthetic_content(n_events: int, rng: random.Random) -> Content:
+    transcript = [SpeechEvent(time_ms=i * 2500, text=f"Sentence number {i}.") for i in range(n_events)]
+    passages = []
+    for start in range(0, n_events, 8):
+        markers = range(start, min(start + 8, n_events))
+        passages.append(" ".join(f"Sentence {i} paraphrased【{i}】" for i in markers))
+    chapters = {i: f"Chapter {i}" for i in sorted(rng.sample(range(n_events), max(n_events // 200, 1)))}
+    return Content(
+        title="Title", summary="Summary", chapters=chapters, passages=passages, transcript=transcript
+    )
+
+
+def render(content: Content) -> str:
+    fn = lambda i: render_reference(content.origin or "", content.transcript, i)  # noqa: E731
+    text = render_passages(content, chapters=True)
+    text += render_transcript(0, len(content.transcript), content.transcript, content.origin)
+    return render_paragraph(text, fn)
+
+
+def timed(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    content = synthetic_content(args.events, random.Random(args.seed))
+    build = lambda: ContentIndex.build(content.passages, content.transcript, content.chapters)  # noqa: E731
+    print(f"{args.events} events, {len(content.passages)} passages, {len(content.chapters)} chapters")
+    print(f"build index: {timed(build, args.repeat):.1f} ms")
+    content.get_index()
+    print(f"render: {timed(lambda: render(content), args.repeat):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
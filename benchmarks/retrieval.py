@@ -0,0 +1,81 @@
+"""
+Benchmarks recall@k and query latency of keyword, semantic and hybrid retrieval on the labeled
+queries in samples/relevance.json.
+
+A query counts as a hit at k when any of its relevant passages is among the top k passages.
+
+Usage: PYTHONPATH=. python benchmarks/retrieval.py [--model local/hashing] [--k 1 3 5]
+"""
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from platogram.library.hybrid_local import LocalHybridLibrary
+from platogram.types import Content
+
+
+def evaluate(search, queries: list[dict], ks: list[int]) -> tuple[dict[int, float], float]:
+    hits = {k: 0 for k in ks}
+    times = []
+    for query in queries:
+        relevant = {(id, position) for id, positions in query["relevant"].items() for position in positions}
+        start = time.perf_counter()
+        ranked = search(query["query"], max(ks))
+        times.append(time.perf_counter() - start)
+        for k in ks:
+            hits[k] += bool(relevant & set(ranked[:k]))
+    return {k: hits[k] / len(queries) for k in ks}, statistics.median(times) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="local/hashing", help="Embedding model")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--relevance", type=Path, default=Path("samples/relevance.json"))
+    args = parser.parse_args()
+
+    with open(args.relevance, "r") as f:
+        relevance = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        library = LocalHybridLibrary(Path(tmp), args.model)
+        for id, file in relevance["documents"].items():
+            with open(file, "r") as f:
+                library.put(id, Content(**json.load(f)))
+
+        def semantic(query: str, n: int) -> list[tuple[str, int]]:
+            positions = {}
+            ranked = []
+            for id, passage, _ in library.semantic.search(query, n, []):
+                if id not in positions:
+                    positions[id] = library.get_content(id).passages
+                ranked.append((id, positions[id].index(passage)))
+            return ranked
+
+        def fused(fusion: str):
+            def search(query: str, n: int) -> list[tuple[str, int]]:
+                library.fusion = fusion
+                return [(id, position) for id, position, _ in library.search(query, n, [])]
+
+            return search
+
+        methods = {
+            "keyword": lambda query, n: [(id, p) for id, p, _ in library.keyword.search(query, n, [])],
+            "semantic": semantic,
+            "hybrid rrf": fused("rrf"),
+            "hybrid weighted": fused("weighted"),
+        }
+
+        print(f"{len(relevance['queries'])} queries, embedding model {args.model}")
+        print(f"{'method':<16}" + "".join(f"{f'recall@{k}':>11}" for k in args.k) + f"{'latency':>12}")
+        for name, search in methods.items():
+            recall, latency = evaluate(search, relevance["queries"], args.k)
+            print(f"{name:<16}" + "".join(f"{recall[k]:>11.2f}" for k in args.k) + f"{latency:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 import asyncio
 import os
-import re
 import tempfile
 from functools import partial
 from pathlib import Path
+from typing import Awaitable, Callable
 
 import logfire
 from telethon import TelegramClient, events
 
 import platogram as plato
+from platogram.paper import Paper, make_paper
+from platogram.types import MARKER, IndexEvent
 
 logfire.configure()
 
@@ -66,6 +68,22 @@ Error: {error}
         del tasks[user_id]
 
 
+def progress_reporter(client, status) -> Callable[[IndexEvent], Awaitable[None]]:
+    """Edits the status message with indexing progress and sends the first indexed paragraphs right away."""
+    preview_sent = False
+
+    async def on_event(event: IndexEvent) -> None:
+        nonlocal preview_sent
+        if event.type == "progress":
+            await client.edit_message(status, f"Working on it... Indexed {event.done} of {event.total} chunks.")
+        elif event.type == "paragraphs" and not preview_sent:
+            preview_sent = True
+            preview = "\n\n".join(MARKER.sub("", paragraph) for paragraph in event.paragraphs[:3])
+            await client.send_message(status.chat_id, f"Here's how it starts:\n\n{preview}")
+
+    return on_event
+
+
 @logfire.instrument("convert_and_respond")
 async def convert_and_respond(client, url: str, lang: str | None, chat_id, user_id):
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -76,8 +94,8 @@ async def convert_and_respond(client, url: str, lang: str | None, chat_id, user_
             raise ValueError("Please provide a valid URL.")
 
         try:
-            await client.send_message(chat_id, "Working on it... It takes about 5 minutes per 1 hour of content.")
-            stdout, stderr = await audio_to_paper(url, lang, Path(tmpdir), user_id)
+            status = await client.send_message(chat_id, "Working on it... It takes about 5 minutes per 1 hour of content.")
+            paper = await audio_to_paper(url, lang, Path(tmpdir), user_id, progress_reporter(client, status))
         finally:
             if url.startswith("file:///tmp/platogram_uploads"):
                 try:
@@ -91,19 +109,8 @@ async def convert_and_respond(client, url: str, lang: str | None, chat_id, user_
                         f"Failed to delete temporary file {url}: {e}"
                     )
 
-        title_match = re.search(r"<title>(.*?)</title>", stdout, re.DOTALL)
-        if title_match:
-            title = title_match.group(1).strip()
-        else:
-            title = "👋"
-            logfire.warning("No title found in stdout, using default title")
-
-        abstract_match = re.search(r"<abstract>(.*?)</abstract>", stdout, re.DOTALL)
-        if abstract_match:
-            abstract = abstract_match.group(1).strip()
-        else:
-            abstract = ""
-            logfire.warning("No abstract found in stdout, using default abstract")
+        title = paper.title or "👋"
+        abstract = paper.abstract
 
         files = [f for f in Path(tmpdir).glob("*") if f.is_file()]
 
@@ -120,40 +127,31 @@ async def convert_and_respond(client, url: str, lang: str | None, chat_id, user_
 
 
 async def audio_to_paper(
-    url: str, lang: str, output_dir: Path, user_id: str
-) -> tuple[str, str]:
-    # Get absolute path of current working directory
-    script_path = Path.cwd() / "examples" / "audio_to_paper.sh"
-    command = f'cd {output_dir} && {script_path} "{url}" --lang {lang} --verbose'
-
+    url: str,
+    lang: str,
+    output_dir: Path,
+    user_id: str,
+    on_event: Callable[[IndexEvent], Awaitable[None]] | None = None,
+) -> Paper:
     if user_id in processes:
         raise RuntimeError("Conversion already in progress.")
 
-    process = await asyncio.create_subprocess_shell(
-        command,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        shell=True,
-    )
-    processes[user_id] = process
-
+    task = asyncio.current_task()
+    processes[user_id] = task
     try:
-        stdout, stderr = await process.communicate()
+        return await make_paper(
+            url,
+            output_dir,
+            lang=lang,
+            library_dir=output_dir / ".platogram-cache",
+            on_event=on_event,
+        )
     finally:
-        if user_id in processes:
+        # make_paper returns only after processing has stopped, even when cancelled,
+        # and until then a new conversion for the user is refused
+        if processes.get(user_id) is task:
             del processes[user_id]
 
-    if process.returncode != 0:
-        raise RuntimeError(f"""Failed to execute {command} with return code {process.returncode}.
-
-stdout:
-{stdout.decode()}
-
-stderr:
-{stderr.decode()}""")
-
-    return stdout.decode(), stderr.decode()
-
 
 async def handle_other_messages(event):
     instructions = """
@@ -15,14 +15,36 @@
 #    min_duration=1.0,
 # )
 
-from platogram.ops import index, get_paragraphs  # noqa: E402
-from platogram.ingest import extract_transcript  # noqa: E402
-from platogram import llm, asr, library, ops  # noqa: E402
-from platogram.types import Content, SpeechEvent  # noqa: E402
+from importlib import import_module  # noqa: E402
+from typing import TYPE_CHECKING  # noqa: E402
+
+if TYPE_CHECKING:
+    from platogram.ops import index, index_async, index_stream, index_stream_async, get_paragraphs
+    from platogram.ingest import extract_transcript
+    from platogram import llm, asr, library, ops
+    from platogram.types import Content, SpeechEvent
+
+
+# Attributes are imported on first access (PEP 562): ingest pulls in yt-dlp and requests,
+# and llm.anthropic the anthropic SDK, which read-only commands never need.
+_LAZY_ATTRIBUTES = {
+    "index": "platogram.ops",
+    "index_async": "platogram.ops",
+    "index_stream": "platogram.ops",
+    "index_stream_async": "platogram.ops",
+    "get_paragraphs": "platogram.ops",
+    "extract_transcript": "platogram.ingest",
+    "Content": "platogram.types",
+    "SpeechEvent": "platogram.types",
+}
+_LAZY_MODULES = {"llm", "asr", "library", "ops"}
 
 
 __all__ = [
     "index",
+    "index_async",
+    "index_stream",
+    "index_stream_async",
     "extract_transcript",
     "get_paragraphs",
     "llm",
@@ -32,3 +54,19 @@ __all__ = [
     "Content",
     "SpeechEvent",
 ]
+
+
+def __getattr__(name: str):
+    if name in _LAZY_MODULES:
+        value = import_module(f"{__name__}.{name}")
+    elif name in _LAZY_ATTRIBUTES:
+        value = getattr(import_module(_LAZY_ATTRIBUTES[name]), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
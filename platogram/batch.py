@@ -0,0 +1,423 @@
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Literal, Protocol
+
+from pydantic import BaseModel, model_validator
+
+from platogram.llm.anthropic import PromptBuilder
+from platogram.ops import (
+    chunk_bounds,
+    count_segment_tokens,
+    render_range,
+    rewrite_examples,
+    shift_markers,
+    stitch_paragraphs,
+)
+from platogram.types import Content, ContentIndex, SpeechEvent
+from platogram.utils import write_json
+
+# Message Batches API limits per batch
+MAX_BATCH_REQUESTS = 100_000
+MAX_BATCH_BYTES = 256 * 2**20
+
+
+class BatchRequest(BaseModel):
+    custom_id: str
+    params: dict[str, Any]
+
+
+class BatchBackend(Protocol):
+    def submit(self, requests: list[BatchRequest]) -> str: ...
+
+    def status(self, batch_id: str) -> Literal["in_progress", "ended"]: ...
+
+    def results(self, batch_id: str) -> dict[str, str | dict | None]:
+        """Returns output of every request by custom_id, None for requests that failed."""
+        ...
+
+
+class AnthropicBatchBackend:
+    """Message Batches API. Requires an anthropic SDK with `messages.batches`."""
+
+    def __init__(self, key: str | None = None) -> None:
+        import anthropic
+
+        if key is None:
+            key = os.environ["ANTHROPIC_API_KEY"]
+
+        self.client = anthropic.Anthropic(api_key=key)
+
+    def submit(self, requests: list[BatchRequest]) -> str:
+        batch = self.client.messages.batches.create(
+            requests=[request.model_dump() for request in requests]  # type: ignore
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> Literal["in_progress", "ended"]:
+        batch = self.client.messages.batches.retrieve(batch_id)
+        return "ended" if batch.processing_status == "ended" else "in_progress"
+
+    def results(self, batch_id: str) -> dict[str, str | dict | None]:
+        outputs: dict[str, str | dict | None] = {}
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                outputs[entry.custom_id] = PromptBuilder.response_output(entry.result.message)
+            else:
+                outputs[entry.custom_id] = None
+        return outputs
+
+
+class LocalBatchBackend:
+    """
+    Local stand-in for the Message Batches API.
+
+    Requests are answered by `respond`, which takes request params and returns the model output
+    (text, or tool input for tool calls). Batches are stored as JSON files in `home`, so they
+    survive restarts, and a batch ends only after it has been polled `polls` times.
+    """
+
+    def __init__(
+        self, home: Path, respond: Callable[[dict[str, Any]], str | dict], polls: int = 1
+    ) -> None:
+        home.mkdir(parents=True, exist_ok=True)
+        self.home = home
+        self.respond = respond
+        self.polls = polls
+
+    def submit(self, requests: list[BatchRequest]) -> str:
+        batch_id = f"localbatch_{uuid.uuid4().hex}"
+        self._save(
+            batch_id,
+            {"requests": [request.model_dump() for request in requests], "polls": 0, "results": None},
+        )
+        return batch_id
+
+    def status(self, batch_id: str) -> Literal["in_progress", "ended"]:
+        batch = self._load(batch_id)
+        if batch["results"] is None:
+            batch["polls"] += 1
+            if batch["polls"] >= self.polls:
+                batch["results"] = {
+                    request["custom_id"]: self._respond(request["params"])
+                    for request in batch["requests"]
+                }
+            self._save(batch_id, batch)
+        return "ended" if batch["results"] is not None else "in_progress"
+
+    def results(self, batch_id: str) -> dict[str, str | dict | None]:
+        batch = self._load(batch_id)
+        if batch["results"] is None:
+            raise ValueError(f"Batch {batch_id} has not ended")
+        return batch["results"]
+
+    def _respond(self, params: dict[str, Any]) -> str | dict | None:
+        try:
+            return self.respond(params)
+        except Exception:
+            return None
+
+    def _load(self, batch_id: str) -> dict:
+        with open(self.home / f"{batch_id}.json", "r") as f:
+            return json.load(f)
+
+    def _save(self, batch_id: str, batch: dict) -> None:
+        write_json(self.home / f"{batch_id}.json", batch)
+
+
+class BatchItem(BaseModel):
+    transcript: list[SpeechEvent]
+    lang: str
+    windows: list[tuple[int, int]]
+    core_ends: list[int]
+    paragraphs: dict[int, list[str]] = {}
+    attempts: dict[int, int] = {}
+    title: str | None = None
+    summary: str | None = None
+    chapters: dict[int, str] | None = None
+    error: str | None = None
+
+
+class BatchState(BaseModel):
+    ids: list[str] = []
+    items: dict[str, BatchItem] = {}
+    batch_ids: list[str] = []
+
+    @model_validator(mode="before")
+    @classmethod
+    def _single_batch(cls, data: Any) -> Any:
+        # state files written when a job had at most one batch in flight
+        if isinstance(data, dict) and "batch_id" in data:
+            data = dict(data)
+            batch_id = data.pop("batch_id")
+            data.setdefault("batch_ids", [batch_id] if batch_id else [])
+        return data
+
+
+class BatchIndexer:
+    """
+    Indexes many transcripts through a batch backend instead of interactive requests.
+
+    Every transcript is split into chunks like in ops.index(). Chunks are extended by `overlap`
+    segments and rewritten independently, so all of them are submitted at once and are stitched
+    together by marker ranges (see ops.stitch_paragraphs). Title, summary and chapters need the
+    paragraphs, so they are submitted once those are back. Failed chunks are resubmitted up to
+    `max_attempts` times, failed title/summary and chapters fall back to the same defaults as ops.index().
+
+    Requests submitted at once are split into batches of at most `max_batch_requests` requests and
+    `max_batch_bytes` bytes, the limits of the Message Batches API.
+
+    The job state is saved to `state_file` after every change, and the id of every batch right after
+    it is submitted, so an indexer created with the same file picks up where the previous one stopped,
+    including batches that are still in progress.
+    """
+
+    def __init__(
+        self,
+        llm: PromptBuilder,
+        backend: BatchBackend,
+        state_file: Path,
+        max_tokens: int = 4096,
+        temperature: float = 0.5,
+        chunk_size: int = 2048,
+        overlap: int = 16,
+        max_attempts: int = 3,
+        max_batch_requests: int = MAX_BATCH_REQUESTS,
+        max_batch_bytes: int = MAX_BATCH_BYTES,
+    ) -> None:
+        self.llm = llm
+        self.backend = backend
+        self.state_file = state_file
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.max_attempts = max_attempts
+        self.max_batch_requests = max_batch_requests
+        self.max_batch_bytes = max_batch_bytes
+
+        if state_file.exists():
+            self.state = BatchState.model_validate_json(state_file.read_text())
+        else:
+            self.state = BatchState()
+
+    def add(self, id: str, transcript: list[SpeechEvent], lang: str | None = None) -> None:
+        """Adds a transcript to the job. Transcripts that are already part of the job are ignored."""
+        if not transcript:
+            raise ValueError("Transcript cannot be empty.")
+
+        if id in self.state.items:
+            return
+
+        if not lang:
+            lang = "en"
+
+        texts = [event.text for event in transcript]
+        markers = range(len(transcript))
+        token_counts = count_segment_tokens(
+            texts, markers, lambda segments: self.llm.count_tokens_many(segments, lang=lang)
+        )
+        bounds = chunk_bounds(token_counts, self.chunk_size)
+
+        self.state.ids.append(id)
+        self.state.items[id] = BatchItem(
+            transcript=transcript,
+            lang=lang,
+            windows=[
+                (max(start - self.overlap, 0), min(stop + self.overlap, len(transcript)))
+                for start, stop in bounds
+            ],
+            core_ends=[stop - 1 for _, stop in bounds],
+        )
+        self._save()
+
+    def step(self) -> bool:
+        """
+        Advances the job without waiting: collects results of the batches that have ended, and once
+        none is in progress submits the next requests. Returns True when there is nothing left to do.
+        """
+        for batch_id in list(self.state.batch_ids):
+            if self.backend.status(batch_id) == "ended":
+                self._collect(self.backend.results(batch_id))
+                self.state.batch_ids.remove(batch_id)
+                self._save()
+        if self.state.batch_ids:
+            return False
+
+        requests = self._requests()
+        self._save()
+        for batch in self._batches(requests):
+            # saved right away, a crash must not leave a paid batch the job doesn't know about
+            self.state.batch_ids.append(self.backend.submit(batch))
+            self._save()
+        return not requests
+
+    def run(self, poll_interval: float = 60) -> dict[str, Content]:
+        """Steps the job until it is done, returns contents of successfully indexed transcripts."""
+        while not self.step():
+            time.sleep(poll_interval)
+        return self.contents()
+
+    def contents(self) -> dict[str, Content]:
+        contents = {}
+        for id in self.state.ids:
+            item = self.state.items[id]
+            if item.error or item.title is None or item.chapters is None:
+                continue
+
+            passages = self._passages(item)
+            contents[id] = Content(
+                title=item.title,
+                summary=item.summary or "",
+                passages=passages,
+                transcript=item.transcript,
+                chapters=item.chapters,
+                index=ContentIndex.build(passages, item.transcript, item.chapters),
+            )
+        return contents
+
+    @property
+    def failed(self) -> dict[str, str]:
+        return {id: item.error for id, item in self.state.items.items() if item.error}
+
+    def _passages(self, item: BatchItem) -> list[str]:
+        return stitch_paragraphs(
+            [item.paragraphs[i] for i in range(len(item.windows))], item.core_ends
+        )
+
+    def _requests(self) -> list[BatchRequest]:
+        requests = []
+        for n, id in enumerate(self.state.ids):
+            item = self.state.items[id]
+            if item.error:
+                continue
+
+            missing = [i for i in range(len(item.windows)) if i not in item.paragraphs]
+            if missing:
+                exhausted = [i for i in missing if item.attempts.get(i, 0) >= self.max_attempts]
+                if exhausted:
+                    item.error = f"Chunk {exhausted[0]} failed {self.max_attempts} times"
+                    continue
+
+                for i in missing:
+                    requests.append(
+                        BatchRequest(custom_id=f"{n}-p{i}", params=self._paragraphs_params(item, i))
+                    )
+                continue
+
+            if item.title is None or item.chapters is None:
+                passages = self._passages(item)
+                requests.append(
+                    BatchRequest(
+                        custom_id=f"{n}-meta",
+                        params=self._params(
+                            self.llm.meta_request(
+                                passages, self.max_tokens, self.temperature, lang=item.lang
+                            )
+                        ),
+                    )
+                )
+                requests.append(
+                    BatchRequest(
+                        custom_id=f"{n}-chapters",
+                        params=self._params(
+                            self.llm.chapters_request(
+                                passages, self.max_tokens, self.temperature, lang=item.lang
+                            )
+                        ),
+                    )
+                )
+        return requests
+
+    def _batches(self, requests: list[BatchRequest]) -> list[list[BatchRequest]]:
+        """Splits requests into batches within max_batch_requests and max_batch_bytes."""
+        batches: list[list[BatchRequest]] = []
+        size = 0
+        for request in requests:
+            request_size = len(request.model_dump_json().encode())
+            if (
+                not batches
+                or len(batches[-1]) >= self.max_batch_requests
+                or size + request_size > self.max_batch_bytes
+            ):
+                batches.append([])
+                size = 0
+            batches[-1].append(request)
+            size += request_size
+        return batches
+
+    def _collect(self, outputs: dict[str, str | dict | None]) -> None:
+        for custom_id, output in outputs.items():
+            n, kind = custom_id.split("-", 1)
+            item = self.state.items[self.state.ids[int(n)]]
+
+            if kind == "meta":
+                try:
+                    item.title, item.summary = self.llm.parse_meta(output)
+                except Exception:
+                    item.title, item.summary = "Missing Title", "Missing Summary"
+            elif kind == "chapters":
+                try:
+                    item.chapters = self.llm.parse_chapters(output)
+                except Exception:
+                    item.chapters = {0: "All Content"}
+            else:
+                i = int(kind[1:])
+                start, _ = item.windows[i]
+                try:
+                    paragraphs = self.llm.parse_paragraphs(output)
+                except Exception:
+                    item.attempts[i] = item.attempts.get(i, 0) + 1
+                    continue
+                item.paragraphs[i] = [shift_markers(paragraph, start) for paragraph in paragraphs]
+
+    def _paragraphs_params(self, item: BatchItem, i: int) -> dict[str, Any]:
+        start, stop = item.windows[i]
+        texts = [event.text for event in item.transcript]
+        examples = {
+            str(example["input"]): list(example["output"])
+            for example in rewrite_examples[item.lang]
+        }
+        return self._params(
+            self.llm.paragraphs_request(
+                render_range(texts, range(len(texts)), start, stop, start),
+                examples,
+                self.max_tokens,
+                self.temperature,
+                item.lang,
+            )
+        )
+
+    def _params(self, request: dict[str, Any]) -> dict[str, Any]:
+        params = self.llm.message_params(
+            request["messages"],
+            request["max_tokens"],
+            request["temperature"],
+            request.get("system"),
+            request.get("tools"),
+        )
+        # batch requests can't carry their own HTTP headers
+        params.pop("extra_headers", None)
+        return params
+
+    def _save(self) -> None:
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        write_json(self.state_file, self.state.model_dump(mode="json"))
+
+
+def index_batch(
+    transcripts: dict[str, list[SpeechEvent]],
+    llm: PromptBuilder,
+    backend: BatchBackend,
+    state_file: Path,
+    lang: str | None = None,
+    poll_interval: float = 60,
+    **kwargs,
+) -> dict[str, Content]:
+    """Indexes transcripts by id through a batch backend, see BatchIndexer."""
+    indexer = BatchIndexer(llm, backend, state_file, **kwargs)
+    for id, transcript in transcripts.items():
+        indexer.add(id, transcript, lang=lang)
+    return indexer.run(poll_interval=poll_interval)
@@ -0,0 +1,183 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from platogram.utils import normalize_url
+
+
+class DiskCache:
+    """
+    Persistent key-value cache on a single SQLite file.
+
+    Values are stored as JSON. Entries older than `ttl` seconds are treated as missing, and once
+    the values take more than `max_bytes` the least recently used entries are evicted.
+    Safe to share between threads, and between processes through SQLite locking.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = 256 * 2**20, ttl: float | None = None):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self.lock, self.db:
+            self.db.execute(
+                """CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )"""
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+
+    def get(self, key: str, ttl: float | None = None) -> Any | None:
+        """Returns cached value or None. `ttl` overrides the cache-wide TTL for this lookup."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self.lock, self.db:
+            row = self.db.execute(
+                "SELECT value, created FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and ttl is not None and now - row[1] > ttl:
+                self.db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        data = json.dumps(value)
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            self._evict()
+
+    def get_many(self, keys: list[str], ttl: float | None = None) -> dict[str, Any]:
+        """Returns cached values by key for the keys that are in the cache, in one transaction."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        values = {}
+        expired = []
+        with self.lock, self.db:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                rows = self.db.execute(
+                    f"SELECT key, value, created FROM cache WHERE key IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, value, created in rows:
+                    if ttl is not None and now - created > ttl:
+                        expired.append((key,))
+                    else:
+                        values[key] = value
+
+            self.db.executemany("DELETE FROM cache WHERE key = ?", expired)
+            self.db.executemany("UPDATE cache SET accessed = ? WHERE key = ?", [(now, key) for key in values])
+            self.hits += len(values)
+            self.misses += len(set(keys)) - len(values)
+        return {key: json.loads(value) for key, value in values.items()}
+
+    def put_many(self, items: dict[str, Any]) -> None:
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            data = json.dumps(value)
+            rows.append((key, data, len(data), now, now))
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM cache")
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _evict(self) -> None:
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # drop the least recently used entries until the cache fits
+        excess = total - self.max_bytes
+        freed = 0
+        keys = []
+        for key, size in self.db.execute("SELECT key, size FROM cache ORDER BY accessed"):
+            keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self.db.executemany("DELETE FROM cache WHERE key = ?", keys)
+
+
+class MetadataCache:
+    """
+    Disk-backed cache of media metadata by normalized URL.
+
+    Metadata expires after `ttl` seconds. Failed lookups, stored as empty metadata, expire
+    after `failure_ttl`, so that a broken URL isn't retried on every run but is retried soon.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float = 24 * 3600,
+        failure_ttl: float = 3600,
+        max_bytes: int = 256 * 2**20,
+    ) -> None:
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.store = DiskCache(path, max_bytes=max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str) -> dict | None:
+        key = normalize_url(url)
+        entry = self.store.get(key, ttl=self.ttl)
+        if entry == {} and self.failure_ttl < self.ttl:
+            # failures are stored like metadata, so their shorter TTL is checked on a second read
+            entry = self.store.get(key, ttl=self.failure_ttl)
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, url: str, meta: dict) -> None:
+        self.store.put(normalize_url(url), meta)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
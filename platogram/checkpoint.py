@@ -0,0 +1,40 @@
+import json
+import shutil
+from pathlib import Path
+
+from platogram.utils import get_sha256_hash, write_json
+
+
+class Checkpoints:
+    """
+    Stores model responses for every chunk of a long-running job on disk.
+
+    Entries are content-addressed: the key is a hash of everything that determines the response
+    (chunk text, model, language, prompt version, etc.), so a restarted job reuses the chunks
+    it has already paid for and only calls the model for the missing ones.
+    """
+
+    def __init__(self, home: Path):
+        self.home = home
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        return get_sha256_hash("\0".join(parts))
+
+    def get(self, key: str) -> list[str] | None:
+        file = self.home / f"{key}.json"
+        try:
+            with open(file, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, paragraphs: list[str]) -> None:
+        self.home.mkdir(parents=True, exist_ok=True)
+        write_json(self.home / f"{key}.json", paragraphs)
+
+    def __len__(self) -> int:
+        return len(list(self.home.glob("*.json"))) if self.home.exists() else 0
+
+    def clear(self) -> None:
+        shutil.rmtree(self.home, ignore_errors=True)
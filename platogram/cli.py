@@ -1,115 +1,77 @@
 import argparse
-import re
 import sys
 from pathlib import Path
-from typing import Callable, Literal, Sequence
+from typing import Iterable, Literal, Sequence
 from urllib.parse import urlparse
 
-from tqdm import tqdm
-
 import platogram as plato
-import platogram.ingest as ingest
-from platogram.library import Library
+from platogram.cache import MetadataCache
+from platogram.llm.cache import ResponseCache
+from platogram.output import SECTIONS, get_writer
+from platogram.pipeline import CACHE_DIR, CONTEXT_BUDGET, IMAGE_WIDTH, process_urls
 from platogram.types import Assistant, Content, User
 from platogram.utils import make_filesystem_safe
 
-CACHE_DIR = Path("./.platogram-cache")
-
-
-def format_time(ms):
-    seconds = ms // 1000
-    minutes, seconds = divmod(seconds, 60)
-    hours, minutes = divmod(minutes, 60)
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-
-
-def render_reference(url: str, transcript: list[plato.SpeechEvent], i: int) -> str:
-    link = f" [[{i+1}]](#ts-{i + 1})"
-    return link
-
-
-def render_transcript(first, last, transcript, url):
-    return "\n".join(
-        [
-            f"\n##### {{#ts-{i + 1}}}\n{i-first+1}. [{format_time(event.time_ms)}]({url}#t={event.time_ms // 1000}): {event.text}"
-            for i, event in enumerate(transcript)
-            if first <= i <= last
-        ]
-    )
-
-
-def render_paragraph(p: str, render_reference_fn: Callable[[int], str]) -> str:
-    references = sorted([int(i) for i in re.findall(r"【(\d+)】", p)])
-    if not references:
-        return p
-
-    paragraph = re.sub(
-        r"【(\d+)】",
-        lambda match: render_reference_fn(int(match.group(1))),
-        p,
-    )
-
-    return paragraph
-
-
-def process_url(
-    url: str,
-    library: Library,
-    anthropic_api_key: str,
-    assemblyai_api_key: str | None = None,
-    extract_images: bool = False,
-    lang: str | None = None,
-) -> Content:
-    if not lang:
-        lang = "en"
-
-    llm = plato.llm.get_model("anthropic/claude-3-5-sonnet", anthropic_api_key)
-    asr = (
-        plato.asr.get_model("assembly-ai/best", assemblyai_api_key)
-        if assemblyai_api_key
-        else None
-    )
-    id = make_filesystem_safe(url)
-
-    if library.exists(id):
-        return library.get_content(id)
-
-    with tqdm(total=4, desc=f"Processing {url}", file=sys.stderr) as pbar:
-        transcript = plato.extract_transcript(url, asr, lang=lang)
-        pbar.update(1)
-        pbar.set_description("Indexing content")
-        content = plato.index(transcript, llm, lang=lang)
-        pbar.update(1)
-        if extract_images:
-            pbar.set_description("Extracting images")
-            images_dir = library.home / id
-            images_dir.mkdir(exist_ok=True)
-            timestamps_ms = [event.time_ms for event in content.transcript]
-            images = ingest.extract_images(url, images_dir, timestamps_ms)
-            content.images = [str(image.relative_to(library.home)) for image in images]
-            pbar.update(1)
-        pbar.set_description("Saving content")
-        library.put(id, content)
-        pbar.update(1)
-
-    return content
-
 
 def prompt_context(
     context: list[Content],
     prompt: Sequence[Assistant | User],
     context_size: Literal["small", "medium", "large"],
     anthropic_api_key: str | None,
+    llm_cache: ResponseCache | None = None,
+    context_budget: int | None = None,
+    query: str | None = None,
+    verbose: bool = False,
 ) -> str:
-    llm = plato.llm.get_model("anthropic/claude-3-5-sonnet", anthropic_api_key)
+    llm = plato.llm.get_model("anthropic/claude-3-5-sonnet", anthropic_api_key, cache=llm_cache)
     response = llm.prompt(
         prompt=prompt,
         context=context,
         context_size=context_size,
+        budget=context_budget,
+        query=query,
     )
+    if verbose:
+        report_usage(llm)
     return response
 
 
+def report_usage(llm: plato.llm.LanguageModel) -> None:
+    usage = getattr(llm, "usage", None)
+    if usage:
+        print(
+            f"LLM tokens: {usage['input_tokens']} input, {usage['output_tokens']} output, "
+            f"{usage['cache_creation_input_tokens']} cache write, {usage['cache_read_input_tokens']} cache read",
+            file=sys.stderr,
+        )
+
+
+def required_fields(args: argparse.Namespace) -> list[str] | None:
+    """Content fields needed to render the output for args, None if the whole content is needed."""
+    if args.generate or args.retrieve:
+        return None
+
+    fields = set()
+    if args.images:
+        fields.add("images")
+    if args.origin:
+        fields.add("origin")
+    if args.title:
+        fields.add("title")
+    if args.abstract:
+        fields.add("summary")
+    if args.passages:
+        fields.update(["passages", "chapters"])
+    if args.passages and args.chapters:
+        # chapters of passages come from the index, which is built from the transcript if missing
+        fields.update(["index", "transcript"])
+    if args.chapters:
+        fields.add("chapters")
+    if args.references or args.inline_references:
+        fields.update(["transcript", "origin"])
+    return sorted(fields)
+
+
 def is_uri(s):
     try:
         result = urlparse(s)
@@ -139,19 +101,43 @@ def main():
         default="small",
         help="Context size for prompting",
     )
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        default=CONTEXT_BUDGET,
+        help="Maximum number of context tokens, the most relevant to the query are kept (0 for no limit)",
+    )
     parser.add_argument("--title", action="store_true", help="Include title")
     parser.add_argument("--abstract", action="store_true", help="Include abstract")
     parser.add_argument("--passages", action="store_true", help="Include passages")
     parser.add_argument("--chapters", action="store_true", help="Include chapters")
     parser.add_argument("--references", action="store_true", help="Include references")
     parser.add_argument("--images", action="store_true", help="Include images")
+    parser.add_argument(
+        "--image-width",
+        type=int,
+        default=IMAGE_WIDTH,
+        help="Scale extracted images down to this width (0 keeps the video's size)",
+    )
     parser.add_argument("--origin", action="store_true", help="Include origin URL")
+    parser.add_argument(
+        "--format",
+        choices=["markdown", "json", "html"],
+        default="markdown",
+        help="Output format",
+    )
+    parser.add_argument("--output", type=Path, help="Write output to a file instead of stdout")
     parser.add_argument(
         "--retrieval-method",
-        choices=["keyword", "semantic", "dumb"],
+        choices=["keyword", "semantic", "hybrid", "dumb", "binary", "sqlite"],
         default="dumb",
         help="Retrieval method",
     )
+    parser.add_argument(
+        "--embedding-model",
+        default="openai/text-embedding-3-large",
+        help="Embedding model for semantic and hybrid retrieval: openai/<model>, onnx/all-MiniLM-L6-v2 (local CPU) or local/hashing (offline)",
+    )
     parser.add_argument(
         "--prefill",
         default="",
@@ -160,6 +146,50 @@ def main():
     parser.add_argument(
         "--inline-references", action="store_true", help="Render references inline"
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of inputs to download, transcribe and index at once",
+    )
+    parser.add_argument(
+        "--partial",
+        choices=["resume", "discard"],
+        default="resume",
+        help="Resume an interrupted indexing job from its checkpoints or discard them and start over",
+    )
+    parser.add_argument(
+        "--llm-cache",
+        choices=["use", "refresh", "bypass"],
+        default="use",
+        help="Reuse cached LLM responses, refresh them, or bypass the cache",
+    )
+    parser.add_argument(
+        "--llm-cache-ttl",
+        type=float,
+        default=7 * 24 * 3600,
+        help="Seconds before a cached LLM response expires",
+    )
+    parser.add_argument(
+        "--llm-cache-any-temperature",
+        action="store_true",
+        help="Also cache LLM responses sampled with temperature > 0",
+    )
+    parser.add_argument(
+        "--temperature",
+        type=float,
+        default=0.5,
+        help="Sampling temperature for indexing, at 0 indexing responses are cached without --llm-cache-any-temperature",
+    )
+    parser.add_argument(
+        "--metadata-cache-ttl",
+        type=float,
+        default=24 * 3600,
+        help="Seconds before cached metadata of a URL (id, subtitles) expires",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Report cache statistics and token usage to stderr"
+    )
     args = parser.parse_args()
 
     if args.lang:
@@ -167,40 +197,79 @@ def main():
     else:
         lang = "en"
 
+    # rendering what is already in the library makes no LLM calls and needs no cache
+    llm_cache = (
+        ResponseCache(
+            CACHE_DIR / "llm-cache.sqlite3",
+            mode=args.llm_cache,
+            any_temperature=args.llm_cache_any_temperature,
+            ttl=args.llm_cache_ttl,
+        )
+        if args.inputs or args.generate
+        else None
+    )
+
     if args.retrieval_method == "semantic":
-        library = plato.library.get_semantic_local_chroma(CACHE_DIR)
+        library = plato.library.get_semantic_local_chroma(CACHE_DIR, args.embedding_model)
     elif args.retrieval_method == "keyword":
         library = plato.library.get_keyword_local_bm25(CACHE_DIR)
+    elif args.retrieval_method == "hybrid":
+        library = plato.library.get_hybrid_local(CACHE_DIR, args.embedding_model)
     elif args.retrieval_method == "dumb":
         library = plato.library.get_local_dumb(CACHE_DIR)
+    elif args.retrieval_method == "binary":
+        library = plato.library.get_local_binary(CACHE_DIR)
+    elif args.retrieval_method == "sqlite":
+        library = plato.library.get_local_sqlite(CACHE_DIR)
     else:
         raise ValueError(f"Invalid retrieval method: {args.retrieval_method}")
 
+    failed: list[str] = []
     if not args.inputs:
         ids = library.ls()
-        context = [library.get_content(id) for id in ids]
+        fields = required_fields(args)
+        context: Iterable[Content]
+        if hasattr(library, "get_fields") and fields is not None:
+            # only what is going to be rendered is read from disk, one content at a time
+            context = (Content.model_construct(**library.get_fields(id, fields)) for id in ids)
+        elif fields is not None:
+            context = (library.get_content(id) for id in ids)
+        else:
+            context = [library.get_content(id) for id in ids]
     else:
-        ids = [make_filesystem_safe(url_or_file) for url_or_file in args.inputs]
-        context = [
-            process_url(
-                url_or_file,
-                library,
-                args.anthropic_api_key,
-                args.assemblyai_api_key,
-                extract_images=args.images,
-                lang=lang,
-            )
-            for url_or_file in args.inputs
-        ]
-
-    if args.retrieval_method == "keyword":
-        library.put(ids[0], context[0])
+        import platogram.ingest as ingest
+
+        metadata_cache = MetadataCache(CACHE_DIR / "metadata-cache.sqlite3", ttl=args.metadata_cache_ttl)
+        ingest.set_metadata_cache(metadata_cache)
+        results = process_urls(
+            args.inputs,
+            library,
+            args.anthropic_api_key,
+            args.assemblyai_api_key,
+            jobs=args.jobs,
+            extract_images=args.images,
+            image_width=args.image_width or None,
+            temperature=args.temperature,
+            lang=lang,
+            resume=args.partial == "resume",
+            llm_cache=llm_cache,
+        )
+
+        ids = []
+        context = []
+        for url_or_file, result in zip(args.inputs, results):
+            if isinstance(result, Exception):
+                failed.append(url_or_file)
+                print(f"Failed to process {url_or_file}: {result}", file=sys.stderr)
+            else:
+                ids.append(make_filesystem_safe(url_or_file))
+                context.append(result)
 
     if args.retrieve:
         n_results = int(args.retrieve)
         context, scores = library.retrieve(args.query, n_results, ids)
 
-    result = ""
+    answer = None
     if args.generate:
         if not args.query:
             raise ValueError("Query is required for generation")
@@ -210,71 +279,38 @@ def main():
         else:
             prompt = [User(content=args.query)]
 
-        result += f"""\n\n{
-            prompt_context(
-                context, prompt, args.context_size, args.anthropic_api_key,
-            )}\n\n"""
-
-    for content in context:
-        if args.images and content.images:
-            images = "\n".join([str(image) for image in content.images])
-            result += f"""{images}\n\n\n\n"""
-
-        if args.origin:
-            result += f"""{content.origin}\n\n\n\n"""
-
-        if args.title:
-            result += f"""{content.title}\n\n\n\n"""
-
-        if args.abstract:
-            result += f"""{content.summary}\n\n\n\n"""
-
-        def get_chapter(passage_marker: int) -> int | None:
-            chapter_markers = list(content.chapters.keys())
-            for start, end in zip(chapter_markers[:-1], chapter_markers[1:]):
-                if start <= passage_marker < end:
-                    return start
-            if passage_marker >= chapter_markers[-1]:
-                return chapter_markers[-1]
-            return None
-
-        if args.passages:
-            passages = ""
-            if args.chapters:
-                current_chapter = None
-                for passage in content.passages:
-                    passage_markers = [int(m) for m in re.findall(r"【(\d+)】", passage)]
-                    chapter_marker = get_chapter(passage_markers[0]) if passage_markers else None
-                    if chapter_marker is not None and chapter_marker != current_chapter:
-                        passages += f"### {content.chapters[chapter_marker]}\n\n"
-                        current_chapter = chapter_marker
-                    passages += f"{passage.strip()}\n\n"
-            else:
-                passages = "\n\n".join(
-                    passage.strip() for passage in content.passages
-                )
-
-            result += f"""{passages}\n\n\n\n"""
-
-        if args.chapters and not args.passages:
-            chapters = "\n".join(
-                f"- {chapter} [{i}]" for i, chapter in content.chapters.items()
-            )
-            result += f"""{chapters}\n\n\n\n"""
-
-        if args.references:
-            result += f"""{render_transcript(0, len(content.transcript), content.transcript, content.origin)}\n\n\n\n"""
-
-        if args.inline_references:
-            render_reference_fn = lambda i: render_reference(
-                content.origin or "", content.transcript, i
+        context = list(context)
+        answer = prompt_context(
+            context,
+            prompt,
+            args.context_size,
+            args.anthropic_api_key,
+            llm_cache,
+            context_budget=args.context_budget or None,
+            query=args.query,
+            verbose=args.verbose,
+        )
+
+    sections = [section for section in SECTIONS if getattr(args, section)]
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        get_writer(args.format, out, sections, args.inline_references).write_all(context, answer)
+    finally:
+        if args.output:
+            out.close()
+
+    if args.verbose:
+        if llm_cache is not None:
+            print(f"LLM cache: {llm_cache.hits} hits, {llm_cache.misses} misses", file=sys.stderr)
+        if args.inputs:
+            print(
+                f"Metadata cache: {metadata_cache.hits} hits, {metadata_cache.misses} misses "
+                f"({metadata_cache.hit_rate:.0%} hit rate)",
+                file=sys.stderr,
             )
-        else:
-            render_reference_fn = lambda _: ""
-
-        result = render_paragraph(result, render_reference_fn)
 
-    print(result)
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,9 @@
 import logging
 import mimetypes
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from pathlib import Path
 from tempfile import TemporaryDirectory
@@ -10,6 +14,7 @@ import subprocess
 
 from platogram.parsers import parse_subtitles, parse_waffly
 from platogram.asr import ASRModel
+from platogram.cache import MetadataCache
 from platogram.types import SpeechEvent
 from platogram.utils import get_sha256_hash
 
@@ -17,8 +22,21 @@ from platogram.utils import get_sha256_hash
 logger = logging.getLogger(__name__)
 
 
-@lru_cache(maxsize=None)
-def get_metadata(url: str) -> dict:
+# persistent metadata cache shared by every lookup in the process, see set_metadata_cache
+metadata_cache: MetadataCache | None = None
+
+
+def set_metadata_cache(cache: MetadataCache | None) -> None:
+    global metadata_cache
+    metadata_cache = cache
+    get_metadata.cache_clear()
+
+
+def is_local_file(url: str) -> bool:
+    return url.lower().startswith("file://") or ("://" not in url and Path(url).exists())
+
+
+def extract_metadata(url: str) -> dict:
     ydl_opts = {"skip_download": True, "quiet": True}
     with YoutubeDL(ydl_opts) as ydl:
         try:
@@ -27,7 +45,27 @@ def get_metadata(url: str) -> dict:
             logger.warning(f"Failed to extract metadata: {e}")
             return {}
 
-    return meta  # type: ignore
+    return ydl.sanitize_info(meta)  # type: ignore
+
+
+@lru_cache(maxsize=256)
+def get_metadata(url: str) -> dict:
+    """
+    yt-dlp metadata of url, {} if it can't be extracted. Local files have none, so they are
+    never looked up. Other urls are looked up once per process and, with set_metadata_cache,
+    once per TTL across processes.
+    """
+    if is_local_file(url):
+        return {}
+
+    if metadata_cache is None:
+        return extract_metadata(url)
+
+    meta = metadata_cache.get(url)
+    if meta is None:
+        meta = extract_metadata(url)
+        metadata_cache.put(url, meta)
+    return meta
 
 
 def has_subtitles(url: str) -> bool:
@@ -143,58 +181,198 @@ def download_file(url: str, output_dir: Path) -> Path:
         return file
 
 
+# frame after the last timestamp of a segment is looked for this far, enough for slideshows
+FRAME_SEARCH_MS = 5_000
+TIME_EPSILON_S = 1e-6
+SHOWINFO_TIME = re.compile(r"Parsed_showinfo.*\bpts_time:\s*(-?[\d.]+)")
+
+
+@lru_cache(maxsize=None)
+def passthrough_option() -> list[str]:
+    """
+    ffmpeg option that passes frames through with their own timestamps: -fps_mode since
+    ffmpeg 5.1, which deprecated -vsync, and -vsync on older versions that don't have it.
+    """
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-h", "long"], capture_output=True, text=True)
+    if "-fps_mode" in result.stdout:
+        return ["-fps_mode", "passthrough"]
+    return ["-vsync", "passthrough"]
+
+
+def scale_filter(width: int) -> str:
+    # down only, a smaller video keeps its size
+    return f"scale='min(iw,{width})':-2"
+
+
+def image_path(output_dir: Path, timestamp_ms: int) -> Path:
+    return Path(output_dir) / f"image_{timestamp_ms:09d}.jpg"
+
+
+def frame_segments(timestamps_ms: list[int], workers: int, max_gap_ms: int) -> list[list[int]]:
+    """
+    Splits timestamps into sorted segments decoded by one ffmpeg pass each: a new segment starts
+    after a gap longer than max_gap_ms, where seeking is cheaper than decoding through the gap,
+    and no segment has more than its share of timestamps for `workers` passes to run at once.
+    """
+    timestamps_ms = sorted(set(timestamps_ms))
+    share = max(-(-len(timestamps_ms) // max(workers, 1)), 1)
+    segments: list[list[int]] = []
+    for timestamp_ms in timestamps_ms:
+        if (
+            not segments
+            or timestamp_ms - segments[-1][-1] > max_gap_ms
+            or len(segments[-1]) >= share
+        ):
+            segments.append([])
+        segments[-1].append(timestamp_ms)
+    return segments
+
+
+def extract_frame(video_path: Path, output_dir: Path, timestamp_ms: int, width: int | None = None) -> Path:
+    """Extracts the frame at timestamp_ms by seeking, no image is written past the end of the video."""
+    path = image_path(output_dir, timestamp_ms)
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-ss",
+            f"{timestamp_ms / 1000:.3f}",
+            "-i",
+            str(video_path),
+            *(["-vf", scale_filter(width)] if width else []),
+            "-frames:v",
+            "1",
+            "-q:v",
+            "2",
+            "-f",
+            "image2",
+            str(path),
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return path
+
+
+def extract_frames(
+    video_path: Path, output_dir: Path, timestamps_ms: list[int], width: int | None = None
+) -> list[Path]:
+    """
+    Extracts the frames at sorted timestamps_ms in one decode pass. Like seeking ffmpeg to each
+    timestamp, the frame of a timestamp is the first one at or after it.
+
+    The pass stops FRAME_SEARCH_MS after the last timestamp, timestamps it found no frame for
+    (e.g. a slideshow with longer gaps between frames) are extracted by seeking.
+    """
+    start_s = timestamps_ms[0] / 1000
+    duration_s = (timestamps_ms[-1] - timestamps_ms[0] + FRAME_SEARCH_MS) / 1000
+    # a frame is selected when it is the first one at or after any of the timestamps,
+    # prev_t is NaN for the first frame, so that it is selected if it is past a timestamp.
+    # t is a float, TIME_EPSILON_S keeps a frame exactly at a timestamp from being missed.
+    select = "+".join(
+        f"gte(t,{t:.6f})*not(gte(prev_t,{t:.6f}))"
+        for t in (ts / 1000 - TIME_EPSILON_S for ts in timestamps_ms)
+    )
+    filters = f"select='{select}'" + (f",{scale_filter(width)}" if width else "") + ",showinfo"
+
+    with TemporaryDirectory(dir=output_dir) as temp_dir:
+        result = subprocess.run(
+            [
+                "ffmpeg",
+                "-hide_banner",
+                "-copyts",
+                "-ss",
+                f"{start_s:.3f}",
+                "-t",
+                f"{duration_s:.3f}",
+                "-i",
+                str(video_path),
+                "-an",
+                "-sn",
+                "-vf",
+                filters,
+                *passthrough_option(),
+                "-frames:v",
+                str(len(timestamps_ms)),
+                "-q:v",
+                "2",
+                "-f",
+                "image2",
+                str(Path(temp_dir) / "frame_%06d.jpg"),
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        times_s = [float(time) for time in SHOWINFO_TIME.findall(result.stderr)]
+        frames = sorted(Path(temp_dir).glob("frame_*.jpg"))
+        if len(frames) != len(times_s):
+            raise RuntimeError(f"ffmpeg wrote {len(frames)} frames but reported {len(times_s)}")
+
+        image_paths = []
+        i = 0
+        for timestamp_ms in timestamps_ms:
+            while i < len(times_s) and times_s[i] < timestamp_ms / 1000 - TIME_EPSILON_S:
+                i += 1
+            path = image_path(output_dir, timestamp_ms)
+            if i < len(frames):
+                # timestamps closer than a frame apart share it
+                shutil.copyfile(frames[i], path)
+            else:
+                extract_frame(video_path, output_dir, timestamp_ms, width)
+            image_paths.append(path)
+    return image_paths
+
+
 def extract_images(
-    url: str, output_dir: Path, timestamps_ms: list[int] | None = None
+    url: str,
+    output_dir: Path,
+    timestamps_ms: list[int] | None = None,
+    workers: int = 4,
+    max_gap_ms: int = 10_000,
+    width: int | None = None,
 ) -> list[Path]:
     """
     Extracts images from a video at the specified timestamps.
 
+    Timestamps are split into segments (see frame_segments) and the frames of each segment
+    are extracted in a single ffmpeg decode pass, with up to `workers` passes at once.
+    Images are written as JPEG.
+
     Args:
         url (str): The URL of the video.
         timestamps_ms (list[int], optional): A list of timestamps in milliseconds at which to extract images.
             If not provided, a single image will be extracted at the start of the video.
+        workers (int): Number of ffmpeg processes to run at once.
+        max_gap_ms (int): Timestamps further apart are extracted by seeking instead of decoding through.
+        width (int, optional): Scale images down to this width, keeping the aspect ratio.
 
     Returns:
-        list[Path]: A list of file paths to the extracted images.
+        list[Path]: A list of file paths to the extracted images, one per timestamp and in the same
+            order. A timestamp past the end of the video has no image.
     """
     video_path = download_video(url, output_dir)
 
     if timestamps_ms is None:
         timestamps_ms = [0]
 
-    image_paths = []
     try:
-        for timestamp_ms in timestamps_ms:
-            timestamp_s = timestamp_ms / 1000
-            image_path = Path(output_dir) / f"image_{timestamp_ms:09d}.png"
-
-            subprocess.run(
-                [
-                    "ffmpeg",
-                    "-ss",
-                    f"{timestamp_s:.3f}",
-                    "-i",
-                    str(video_path),
-                    "-frames:v",
-                    "1",
-                    "-q:v",
-                    "2",
-                    "-f",
-                    "image2",
-                    str(image_path),
-                ],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-
-            image_paths.append(image_path)
+        started = time.perf_counter()
+        segments = frame_segments(timestamps_ms, workers, max_gap_ms)
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            list(executor.map(lambda segment: extract_frames(video_path, output_dir, segment, width), segments))
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Extracted {len(timestamps_ms)} images in {len(segments)} passes, "
+            f"{elapsed:.1f} s ({len(timestamps_ms) / max(elapsed, 1e-9):.1f} frames/s)"
+        )
     finally:
         # Delete the downloaded video file
         if video_path:
             video_path.unlink()
 
-    return image_paths
+    return [image_path(output_dir, timestamp_ms) for timestamp_ms in timestamps_ms]
 
 
 def extract_transcript(
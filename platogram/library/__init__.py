@@ -12,7 +12,8 @@ class Library(Protocol):
 
     def exists(self, id: str) -> bool: ...
 
-    def put(self, id: str, content: Content): ...
+    # lang is the language of the content, libraries with a metadata index store it
+    def put(self, id: str, content: Content, lang: str | None = None): ...
 
     def retrieve(
         self,
@@ -24,10 +25,12 @@ class Library(Protocol):
     def get_content(self, id: str) -> Content: ...
 
 
-def get_semantic_local_chroma(home_dir: Path = Path("./my_library")) -> Library:
-    from .semantic_local_chroma import LocalChromaLibrary
+def get_semantic_local_chroma(
+    home_dir: Path = Path("./my_library"), embedding_model: str | None = None
+) -> Library:
+    from .semantic_local_chroma import EMBEDDING_MODEL, LocalChromaLibrary
 
-    return LocalChromaLibrary(home_dir)
+    return LocalChromaLibrary(home_dir, embedding_model or EMBEDDING_MODEL)
 
 
 def get_keyword_local_bm25(home_dir: Path = Path("./my_library")) -> Library:
@@ -39,4 +42,25 @@ def get_keyword_local_bm25(home_dir: Path = Path("./my_library")) -> Library:
 def get_local_dumb(home_dir: Path = Path("./my_library")) -> Library:
     from .local_dumb import LocalDumbLibrary
 
-    return LocalDumbLibrary(home_dir)
\ No newline at end of file
+    return LocalDumbLibrary(home_dir)
+
+
+def get_local_binary(home_dir: Path = Path("./my_library")) -> Library:
+    from .local_binary import LocalBinaryLibrary
+
+    return LocalBinaryLibrary(home_dir)
+
+
+def get_local_sqlite(home_dir: Path = Path("./my_library")) -> Library:
+    from .local_sqlite import LocalSQLiteLibrary
+
+    return LocalSQLiteLibrary(home_dir)
+
+
+def get_hybrid_local(
+    home_dir: Path = Path("./my_library"), embedding_model: str | None = None
+) -> Library:
+    from .hybrid_local import LocalHybridLibrary
+    from .semantic_local_chroma import EMBEDDING_MODEL
+
+    return LocalHybridLibrary(home_dir, embedding_model or EMBEDDING_MODEL)
@@ -0,0 +1,122 @@
+import base64
+import hashlib
+import math
+import os
+import re
+from array import array
+from pathlib import Path
+from typing import Protocol
+
+from platogram.cache import DiskCache
+from platogram.utils import get_sha256_hash
+
+TOKEN = re.compile(r"\w\w+")
+
+
+class EmbeddingFunction(Protocol):
+    """Same call signature as chromadb embedding functions, so those can be used as is."""
+
+    def __call__(self, input: list[str]) -> list[list[float]]: ...
+
+
+class HashingEmbeddingFunction:
+    """
+    Bag-of-words vectors by feature hashing, l2-normalized. Needs no model or network and runs
+    anywhere at memory speed, but only matches shared words, not meaning.
+    """
+
+    def __init__(self, dim: int = 1024) -> None:
+        self.dim = dim
+
+    def __call__(self, input: list[str]) -> list[list[float]]:
+        return [self.embed(text) for text in input]
+
+    def embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.dim
+        for token in TOKEN.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            vector[h % self.dim] += 1.0 if h >> 63 else -1.0
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+
+class CachedEmbeddingFunction:
+    """
+    Wraps an embedding function with a persistent cache keyed by model name and text hash,
+    and embeds texts missing from the cache in batches of `batch_size`.
+    """
+
+    def __init__(
+        self, function: EmbeddingFunction, model: str, cache: DiskCache, batch_size: int = 256
+    ) -> None:
+        self.function = function
+        self.model = model
+        self.cache = cache
+        self.batch_size = batch_size
+
+    def __call__(self, input: list[str]) -> list[list[float]]:
+        keys = [get_sha256_hash(f"{self.model}\n{text}") for text in input]
+        embeddings = {key: decode(value) for key, value in self.cache.get_many(keys).items()}
+        missing = list({key: text for key, text in zip(keys, input) if key not in embeddings}.items())
+
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i : i + self.batch_size]
+            computed = {
+                key: [float(x) for x in embedding]
+                for (key, _), embedding in zip(batch, self.function([text for _, text in batch]))
+            }
+            self.cache.put_many({key: encode(embedding) for key, embedding in computed.items()})
+            embeddings.update(computed)
+
+        return [embeddings[key] for key in keys]
+
+    @property
+    def hits(self) -> int:
+        return self.cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self.cache.misses
+
+
+def encode(embedding: list[float]) -> str:
+    # float32 as base64 is about a quarter of the size of a JSON list of floats
+    return base64.b64encode(array("f", embedding).tobytes()).decode()
+
+
+def decode(data: str) -> list[float]:
+    return array("f", base64.b64decode(data)).tolist()
+
+
+def get_embedding_function(
+    model: str, cache_path: Path | None = None, batch_size: int = 256
+) -> EmbeddingFunction:
+    """
+    Models:
+        openai/<model name>: OpenAI embeddings API, needs OPENAI_API_KEY.
+        onnx/all-MiniLM-L6-v2: local CPU model run by onnxruntime, downloaded by chromadb on first use.
+        local/hashing: HashingEmbeddingFunction, fully offline.
+
+    With `cache_path` embeddings are cached on disk, see CachedEmbeddingFunction.
+    """
+    function: EmbeddingFunction
+    if model.startswith("openai/"):
+        from chromadb.utils import embedding_functions
+
+        function = embedding_functions.OpenAIEmbeddingFunction(
+            api_key=os.environ.get("OPENAI_API_KEY"), model_name=model.split("/", 1)[1]
+        )  # type: ignore
+    elif model == "onnx/all-MiniLM-L6-v2":
+        from chromadb.utils import embedding_functions
+
+        function = embedding_functions.ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])  # type: ignore
+    elif model == "local/hashing":
+        function = HashingEmbeddingFunction()
+    else:
+        raise ValueError(f"Unsupported embedding model: {model}")
+
+    if cache_path is None:
+        return function
+    return CachedEmbeddingFunction(
+        function, model, DiskCache(cache_path, max_bytes=4 * 2**30), batch_size=batch_size
+    )
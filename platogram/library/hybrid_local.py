@@ -0,0 +1,141 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Literal
+
+from platogram.library.keyword_local_bm25 import LocalBM25Library, group_hits
+from platogram.library.semantic_local_chroma import EMBEDDING_MODEL, LocalChromaLibrary
+from platogram.types import Content
+from platogram.utils import make_filesystem_safe
+
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    rankings: list[list[tuple[str, int]]], weights: list[float], k: int = RRF_K
+) -> dict[tuple[str, int], float]:
+    """Scores every passage by sum of weight / (k + rank) over the rankings it appears in."""
+    scores: dict[tuple[str, int], float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, passage in enumerate(ranking, start=1):
+            scores[passage] = scores.get(passage, 0.0) + weight / (k + rank)
+    return scores
+
+
+def weighted_fusion(
+    rankings: list[list[tuple[tuple[str, int], float]]], weights: list[float]
+) -> dict[tuple[str, int], float]:
+    """Scores every passage by the weighted sum of its scores min-max normalized per ranking."""
+    scores: dict[tuple[str, int], float] = {}
+    for ranking, weight in zip(rankings, weights):
+        if not ranking:
+            continue
+        low = min(score for _, score in ranking)
+        high = max(score for _, score in ranking)
+        for passage, score in ranking:
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            scores[passage] = scores.get(passage, 0.0) + weight * normalized
+    return scores
+
+
+class LocalHybridLibrary:
+    """
+    Keyword (LocalBM25Library) and semantic (LocalChromaLibrary) retrieval over the same home,
+    queried concurrently and fused by reciprocal rank ("rrf") or by normalized scores ("weighted").
+
+    Each index is asked for `candidates` times n_results passages, so that passages ranked lower
+    by one of them can still make it to the top after fusion.
+    """
+
+    def __init__(
+        self,
+        home_dir: Path,
+        embedding_model: str = EMBEDDING_MODEL,
+        fusion: Literal["rrf", "weighted"] = "rrf",
+        keyword_weight: float = 1.0,
+        semantic_weight: float = 1.0,
+        candidates: int = 4,
+    ):
+        if not home_dir.exists():
+            home_dir.mkdir(parents=True)
+        self.home_dir = home_dir
+        self.lock = threading.Lock()
+        self.keyword = LocalBM25Library(home_dir)
+        self.semantic = LocalChromaLibrary(home_dir, embedding_model)
+        self.fusion = fusion
+        self.weights = [keyword_weight, semantic_weight]
+        self.candidates = candidates
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+    @property
+    def home(self) -> Path:
+        return self.home_dir
+
+    def ls(self) -> list[str]:
+        return self.keyword.ls()
+
+    def exists(self, id: str) -> bool:
+        return self.keyword.exists(id)
+
+    def put(self, id: str, content: Content, lang: str | None = None) -> None:
+        self.put_many({id: content})
+
+    def put_many(self, contents: dict[str, Content]) -> None:
+        with self.lock:
+            semantic = self.executor.submit(self.semantic.put_many, contents)
+            for id, content in contents.items():
+                self.keyword.put(id, content)
+            semantic.result()
+
+    def get_content(self, id: str) -> Content:
+        return self.keyword.get_content(id)
+
+    def delete(self, id: str) -> None:
+        with self.lock:
+            # both indexes share the content file, the first delete removes it
+            self.keyword.delete(id)
+            self.semantic.segments.delete(where={"id": id})
+            self.semantic.content.delete(ids=[id])
+
+    def search(self, query: str, n_results: int, filter_keys: list[str]) -> list[tuple[str, int, float]]:
+        """Returns up to n_results (id, passage position, fused score), best first."""
+        n_candidates = n_results * self.candidates
+        keyword = self.executor.submit(self.keyword.search, query, n_candidates, filter_keys)
+        semantic = self.executor.submit(self.semantic.search, query, n_candidates, filter_keys)
+
+        keyword_hits = [((id, position), score) for id, position, score in keyword.result()]
+        semantic_hits = []
+        positions: dict[str, dict[str, int]] = {}
+        for id, passage, distance in semantic.result():
+            id = make_filesystem_safe(id)
+            if id not in positions:
+                passages = self.get_content(id).passages
+                positions[id] = {passage: i for i, passage in reversed(list(enumerate(passages)))}
+            if passage in positions[id]:
+                # distances are turned into scores, so that higher is better for both
+                semantic_hits.append(((id, positions[id][passage]), -distance))
+
+        if self.fusion == "rrf":
+            scores = reciprocal_rank_fusion(
+                [[passage for passage, _ in keyword_hits], [passage for passage, _ in semantic_hits]],
+                self.weights,
+            )
+        elif self.fusion == "weighted":
+            scores = weighted_fusion([keyword_hits, semantic_hits], self.weights)
+        else:
+            raise ValueError(f"Unsupported fusion: {self.fusion}")
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+        return [(id, position, score) for (id, position), score in ranked]
+
+    def retrieve(
+        self,
+        query: str,
+        n_results: int,
+        filter_keys: list[str],
+    ) -> tuple[list[Content], list[float]]:
+        """
+        Returns contents with their best n_results passages by fused score across all documents
+        in filter_keys (all documents if empty), and the fused scores in the order of contents and passages.
+        """
+        return group_hits(self.search(query, n_results, filter_keys), self.get_content)
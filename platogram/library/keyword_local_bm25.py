@@ -1,5 +1,9 @@
 import json
+import shutil
+import threading
+from bisect import bisect_right
 from pathlib import Path
+from typing import Callable
 
 try:
     import bm25s  # type: ignore
@@ -11,17 +15,225 @@ try:
 except ImportError:
     pass
 
+try:
+    import numpy as np
+except ImportError:
+    pass
+
 from platogram.types import Content
-from platogram.utils import make_filesystem_safe
+from platogram.utils import make_filesystem_safe, write_json
 from platogram.ops import remove_markers
 
 
+class PassageIndex:
+    """
+    Corpus-wide BM25 index over passages of many documents, persisted in `home`.
+
+    The main segment is a bm25s index saved to disk and loaded memory-mapped, with the passages
+    of every document in consecutive rows. Documents put since the last compaction go into a small
+    delta segment, which is indexed in memory when it is searched, and documents deleted or replaced
+    since then are tombstoned in the main segment. Tokens of every live document are kept in a file
+    per document, so neither loading the delta nor compaction has to tokenize passages again.
+
+    `compact` merges both segments into a new main segment. It happens on its own once the delta
+    holds more than `compact_threshold` passages and more than `compact_ratio` of the main segment,
+    so that compactions get rarer as the corpus grows.
+
+    Scores of the two segments come from separate IDF statistics, so they are only comparable
+    approximately until the next compaction.
+    """
+
+    def __init__(
+        self,
+        home: Path,
+        compact_threshold: int = 2000,
+        compact_ratio: float = 0.25,
+    ) -> None:
+        (home / "tokens").mkdir(parents=True, exist_ok=True)
+        self.home = home
+        self.compact_threshold = compact_threshold
+        self.compact_ratio = compact_ratio
+        self.stemmer = Stemmer.Stemmer("english")
+
+        self.generation = 0
+        self.docs: list[tuple[str, int, int]] = []  # (id, first row, last row + 1) of the main segment
+        self.tombstones: set[str] = set()
+        self.delta: dict[str, list[list[str]]] = {}  # tokens of every passage
+        self.main = None
+        self.delta_index = None
+        self.delta_rows: list[tuple[str, int]] = []
+        self.delta_stale = False
+
+        state_file = home / "state.json"
+        if state_file.exists():
+            with open(state_file, "r") as f:
+                state = json.load(f)
+            self.generation = state["generation"]
+            self.docs = [tuple(doc) for doc in state["docs"]]  # type: ignore
+            self.tombstones = set(state["tombstones"])
+            for id in state["delta"]:
+                self.delta[id] = self._load_tokens(id)
+            if self.docs:
+                self.main = bm25s.BM25.load(self._segment_dir(self.generation), mmap=True)
+            self.delta_stale = True
+
+        self.starts = [start for _, start, _ in self.docs]
+        self.main_ids = {id for id, _, _ in self.docs}
+
+    def put(self, id: str, passages: list[str]) -> None:
+        self.put_many({id: passages})
+
+    def put_many(self, documents: dict[str, list[str]]) -> None:
+        for id, passages in documents.items():
+            if id in self.main_ids:
+                self.tombstones.add(id)
+            self.delta[id] = self._tokenize(passages)
+            write_json(self._tokens_file(id), self.delta[id])
+
+        delta_rows = sum(len(tokens) for tokens in self.delta.values())
+        main_rows = self.docs[-1][2] if self.docs else 0
+        if delta_rows > max(self.compact_threshold, self.compact_ratio * main_rows):
+            self.compact()
+        else:
+            self.delta_stale = True
+            self._save()
+
+    def delete(self, id: str) -> None:
+        if id in self.main_ids:
+            self.tombstones.add(id)
+        if self.delta.pop(id, None) is not None:
+            self.delta_stale = True
+        self._save()
+        self._tokens_file(id).unlink(missing_ok=True)
+
+    def compact(self) -> None:
+        """Builds a new main segment from all live documents, dropping tombstones and the delta."""
+        documents = {
+            id: self._load_tokens(id)
+            for id, _, _ in self.docs
+            if id not in self.tombstones and id not in self.delta
+        }
+        documents.update(self.delta)
+
+        tokens: list[list[str]] = []
+        docs = []
+        for id, passages in documents.items():
+            docs.append((id, len(tokens), len(tokens) + len(passages)))
+            tokens.extend(passages)
+
+        generation = self.generation + 1
+        main = None
+        if tokens:
+            main = bm25s.BM25()
+            main.index(tokens, show_progress=False)
+            main.save(self._segment_dir(generation))
+            main = bm25s.BM25.load(self._segment_dir(generation), mmap=True)
+
+        previous = self._segment_dir(self.generation)
+        self.generation = generation
+        self.docs = docs
+        self.tombstones = set()
+        self.delta = {}
+        self.main = main
+        self.delta_stale = True
+        self.starts = [start for _, start, _ in self.docs]
+        self.main_ids = {id for id, _, _ in self.docs}
+        self._save()
+        shutil.rmtree(previous, ignore_errors=True)
+
+    def search(self, query: str, k: int, ids: list[str] | None = None) -> list[tuple[str, int, float]]:
+        """Returns up to k (document id, passage position, score) by descending score, within `ids` if given."""
+        if self.delta_stale:
+            self._index_delta()
+
+        query_tokens = self._tokenize([query])
+        wanted = set(ids) if ids else None
+
+        hits: list[tuple[str, int, float]] = []
+        if self.main is not None:
+            mask = np.zeros(self.docs[-1][2], dtype=np.float32)
+            for id, start, stop in self.docs:
+                if id not in self.tombstones and id not in self.delta and (wanted is None or id in wanted):
+                    mask[start:stop] = 1
+            hits += self._retrieve(self.main, query_tokens, k, mask, self._main_row)
+
+        if self.delta_index is not None:
+            mask = np.array(
+                [wanted is None or id in wanted for id, _ in self.delta_rows], dtype=np.float32
+            )
+            hits += self._retrieve(self.delta_index, query_tokens, k, mask, self.delta_rows.__getitem__)
+
+        return sorted(hits, key=lambda hit: hit[2], reverse=True)[:k]
+
+    def _retrieve(self, index, query_tokens, k, mask, row) -> list[tuple[str, int, float]]:
+        k = min(k, int(mask.sum()))
+        if k == 0:
+            return []
+
+        rows, scores = index.retrieve(query_tokens, k=k, weight_mask=mask, show_progress=False)
+        return [(*row(int(i)), float(score)) for i, score in zip(rows[0], scores[0]) if mask[i]]
+
+    def _main_row(self, i: int) -> tuple[str, int]:
+        id, start, _ = self.docs[bisect_right(self.starts, i) - 1]
+        return id, i - start
+
+    def _index_delta(self) -> None:
+        self.delta_stale = False
+        self.delta_rows = [(id, i) for id, tokens in self.delta.items() for i in range(len(tokens))]
+        if not self.delta_rows:
+            self.delta_index = None
+            return
+
+        self.delta_index = bm25s.BM25()
+        self.delta_index.index(
+            [passage for tokens in self.delta.values() for passage in tokens], show_progress=False
+        )
+
+    def _tokenize(self, texts: list[str]) -> list[list[str]]:
+        return bm25s.tokenize(
+            [remove_markers(text) for text in texts],
+            stopwords="en",
+            stemmer=self.stemmer,
+            return_ids=False,
+            show_progress=False,
+        )
+
+    def _segment_dir(self, generation: int) -> Path:
+        return self.home / f"main-{generation}"
+
+    def _tokens_file(self, id: str) -> Path:
+        return self.home / "tokens" / f"{id}.json"
+
+    def _load_tokens(self, id: str) -> list[list[str]]:
+        with open(self._tokens_file(id), "r") as f:
+            return json.load(f)
+
+    def _save(self) -> None:
+        write_json(
+            self.home / "state.json",
+            {
+                "generation": self.generation,
+                "docs": self.docs,
+                "tombstones": sorted(self.tombstones),
+                "delta": list(self.delta),
+            },
+        )
+
+
 class LocalBM25Library:
-    def __init__(self, home_dir: Path):
+    def __init__(self, home_dir: Path, compact_threshold: int = 2000):
         if not home_dir.exists():
             home_dir.mkdir(parents=True)
         self.home_dir = home_dir
-        self.stemmer = Stemmer.Stemmer("english")
+        self.lock = threading.Lock()
+
+        with self.lock:
+            index_dir = home_dir / "bm25.index"
+            new = not (index_dir / "state.json").exists()
+            self.passage_index = PassageIndex(index_dir, compact_threshold=compact_threshold)
+            if new and self.ls():
+                # library written before the index existed
+                self.passage_index.put_many({id: self.get_content(id).passages for id in self.ls()})
 
     @property
     def home(self) -> Path:
@@ -33,18 +245,11 @@ class LocalBM25Library:
     def exists(self, id: str) -> bool:
         return (self.home / f"{make_filesystem_safe(id)}.json").exists()
 
-    def put(self, id: str, content: Content) -> None:
-        file = self.home / f"{make_filesystem_safe(id)}.json"
-        with open(file, "w") as f:
-            json.dump(content.model_dump(mode="json"), f)
-
-        self.passage_retriever = bm25s.BM25()
-        passages_tokens = bm25s.tokenize(
-            [remove_markers(passage) for passage in content.passages],
-            stopwords="en",
-            stemmer=self.stemmer,
-        )
-        self.passage_retriever.index(passages_tokens)
+    def put(self, id: str, content: Content, lang: str | None = None) -> None:
+        with self.lock:
+            file = self.home / f"{make_filesystem_safe(id)}.json"
+            write_json(file, content.model_dump(mode="json"))
+            self.passage_index.put(make_filesystem_safe(id), content.passages)
 
     def get_content(self, id: str) -> Content:
         file = self.home_dir / f"{make_filesystem_safe(id)}.json"
@@ -53,8 +258,21 @@ class LocalBM25Library:
         return content
 
     def delete(self, id: str) -> None:
-        file = self.home_dir / f"{make_filesystem_safe(id)}.json"
-        file.unlink()
+        with self.lock:
+            file = self.home_dir / f"{make_filesystem_safe(id)}.json"
+            file.unlink()
+            self.passage_index.delete(make_filesystem_safe(id))
+
+    def compact(self) -> None:
+        with self.lock:
+            self.passage_index.compact()
+
+    def search(self, query: str, n_results: int, filter_keys: list[str]) -> list[tuple[str, int, float]]:
+        """Returns up to n_results (id, passage position, score), best first."""
+        with self.lock:
+            return self.passage_index.search(
+                query, n_results, [make_filesystem_safe(id) for id in filter_keys]
+            )
 
     def retrieve(
         self,
@@ -62,20 +280,32 @@ class LocalBM25Library:
         n_results: int,
         filter_keys: list[str],
     ) -> tuple[list[Content], list[float]]:
-        if len(filter_keys) == 0:
-            return ([], [])
-
-        if len(filter_keys) > 1:
-            raise ValueError(
-                "Keyword local BM25 library cannot handle multiple documents"
-            )
+        """
+        Returns contents with their best n_results passages across all documents in filter_keys
+        (all documents if empty), and scores of the passages in the order of contents and passages.
+        """
+        return group_hits(self.search(query, n_results, filter_keys), self.get_content)
 
-        content = self.get_content(filter_keys[0])
-        n_passages = min(len(content.passages), n_results)
 
-        query_tokens = bm25s.tokenize(query, stemmer=self.stemmer)
-        ids, distances = self.passage_retriever.retrieve(query_tokens, k=n_passages)  # type: ignore
+def group_hits(
+    hits: list[tuple[str, int, float]], get_content: Callable[[str], Content]
+) -> tuple[list[Content], list[float]]:
+    """
+    Turns ranked (id, passage position, score) into contents in the order of their best passage,
+    each with its hit passages in rank order, and the scores in the order of contents and passages.
+    """
+    contents: dict[str, Content] = {}
+    passages: dict[str, list[tuple[int, float]]] = {}
+    for id, position, score in hits:
+        if id not in contents:
+            contents[id] = get_content(id)
+            passages[id] = []
+        passages[id].append((position, score))
 
-        content.passages = [content.passages[i] for i in ids[0]]
+    scores = []
+    for id, content in contents.items():
+        content.passages = [content.passages[position] for position, _ in passages[id]]
+        content.index = None
+        scores += [score for _, score in passages[id]]
 
-        return ([content], distances[0])
+    return list(contents.values()), scores
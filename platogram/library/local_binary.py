@@ -0,0 +1,164 @@
+import argparse
+import json
+import shutil
+import struct
+import threading
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Sequence
+
+from pydantic import TypeAdapter
+
+from platogram.types import Content
+from platogram.utils import make_filesystem_safe, write_bytes
+
+# File layout: MAGIC, header length (uint32 LE), header, field blocks.
+# The header is JSON {field: [offset, length]} with offsets relative to the end of the header,
+# every block is zlib-compressed JSON of one field, so a field is loaded with one seek and read.
+MAGIC = b"PLATO\x01"
+HEADER_LENGTH = struct.Struct("<I")
+SUFFIX = ".plato"
+
+FIELDS = tuple(Content.model_fields)
+
+
+@lru_cache(maxsize=None)
+def field_adapter(field: str) -> TypeAdapter:
+    # fields are serialized and validated by pydantic-core without going through Python objects
+    return TypeAdapter(Content.model_fields[field].annotation)
+
+
+def encode(content: Content, level: int = 6) -> bytes:
+    header: dict[str, list[int]] = {}
+    blocks = []
+    offset = 0
+    for field in FIELDS:
+        block = zlib.compress(field_adapter(field).dump_json(getattr(content, field)), level)
+        header[field] = [offset, len(block)]
+        blocks.append(block)
+        offset += len(block)
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    return b"".join([MAGIC, HEADER_LENGTH.pack(len(header_bytes)), header_bytes, *blocks])
+
+
+def read_fields(file: Path, fields: Sequence[str]) -> dict[str, Any]:
+    """Reads and validates only the requested fields of an encoded file."""
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {sorted(unknown)}")
+
+    with open(file, "rb") as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{file} is not a platogram binary file")
+        (header_length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+        header = json.loads(f.read(header_length))
+        data_start = len(MAGIC) + HEADER_LENGTH.size + header_length
+
+        # files written before a field was added lack it, Content defaults fill it in
+        present = [field for field in fields if field in header]
+        values = {}
+        for field in sorted(present, key=lambda field: header[field][0]):
+            offset, length = header[field]
+            f.seek(data_start + offset)
+            values[field] = field_adapter(field).validate_json(zlib.decompress(f.read(length)))
+    return values
+
+
+class LocalBinaryLibrary:
+    """
+    Stores every Content as one compressed binary file with a field index (see `encode`),
+    so that `get_fields` loads e.g. only the title without reading the transcript.
+    """
+
+    def __init__(self, home_dir: Path):
+        if not home_dir.exists():
+            home_dir.mkdir(parents=True)
+        self.home_dir = home_dir
+        self.lock = threading.Lock()
+
+    @property
+    def home(self) -> Path:
+        return self.home_dir
+
+    def ls(self) -> list[str]:
+        return [f.stem for f in self.home.glob(f"*{SUFFIX}")]
+
+    def exists(self, id: str) -> bool:
+        return self._file(id).exists()
+
+    def put(self, id: str, content: Content, lang: str | None = None) -> None:
+        data = encode(content)
+        with self.lock:
+            write_bytes(self._file(id), data)
+
+    def get_content(self, id: str) -> Content:
+        # every field has been validated on read
+        return Content.model_construct(**self.get_fields(id, FIELDS))
+
+    def get_fields(self, id: str, fields: Sequence[str]) -> dict[str, Any]:
+        """Returns values of `fields` by name, other fields are not read from disk."""
+        return read_fields(self._file(id), fields)
+
+    def delete(self, id: str) -> None:
+        with self.lock:
+            self._file(id).unlink()
+
+    def retrieve(
+        self,
+        query: str,
+        n_results: int,
+        filter_keys: list[str],
+    ) -> tuple[list[Content], list[float]]:
+        raise NotImplementedError("Binary local storage does not support retrieval. Use get_content().")
+
+    def _file(self, id: str) -> Path:
+        return self.home_dir / f"{make_filesystem_safe(id)}{SUFFIX}"
+
+
+def migrate(source_dir: Path, target_dir: Path | None = None, remove: bool = False) -> list[str]:
+    """
+    Converts every <id>.json Content in source_dir into a binary file in target_dir
+    (source_dir by default), returns the migrated ids.
+
+    Image paths are relative to the library home, so image directories are copied along
+    when the target is a different directory. With `remove` the JSON files are deleted
+    once their binary file has been written and read back.
+    """
+    library = LocalBinaryLibrary(target_dir or source_dir)
+    ids = []
+    for file in sorted(source_dir.glob("*.json")):
+        with open(file, "r") as f:
+            content = Content(**json.load(f))
+
+        id = file.stem
+        library.put(id, content)
+        if library.get_content(id) != content:
+            raise RuntimeError(f"Failed to migrate {file}: content does not match")
+
+        if library.home.resolve() != source_dir.resolve():
+            images_dir = source_dir / id
+            if images_dir.is_dir():
+                shutil.copytree(images_dir, library.home / id, dirs_exist_ok=True)
+
+        if remove:
+            file.unlink()
+        ids.append(id)
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate a JSON library to the binary format")
+    parser.add_argument("source", type=Path, help="Library directory with <id>.json files")
+    parser.add_argument("--target", type=Path, help="Where to write binary files (default: source)")
+    parser.add_argument("--remove", action="store_true", help="Delete JSON files after migration")
+    args = parser.parse_args()
+
+    for id in migrate(args.source, args.target, args.remove):
+        print(id)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import json
+import threading
 from pathlib import Path
 
 from platogram.types import Content
-from platogram.utils import make_filesystem_safe
+from platogram.utils import make_filesystem_safe, write_json
 
 
 class LocalDumbLibrary:
@@ -10,6 +11,7 @@ class LocalDumbLibrary:
         if not home_dir.exists():
             home_dir.mkdir(parents=True)
         self.home_dir = home_dir
+        self.lock = threading.Lock()
 
     @property
     def home(self) -> Path:
@@ -21,10 +23,10 @@ class LocalDumbLibrary:
     def exists(self, id: str) -> bool:
         return (self.home / f"{make_filesystem_safe(id)}.json").exists()
 
-    def put(self, id: str, content: Content) -> None:
-        file = self.home / f"{make_filesystem_safe(id)}.json"
-        with open(file, "w") as f:
-            json.dump(content.model_dump(mode="json"), f)
+    def put(self, id: str, content: Content, lang: str | None = None) -> None:
+        with self.lock:
+            file = self.home / f"{make_filesystem_safe(id)}.json"
+            write_json(file, content.model_dump(mode="json"))
 
     def get_content(self, id: str) -> Content:
         file = self.home_dir / f"{make_filesystem_safe(id)}.json"
@@ -33,8 +35,9 @@ class LocalDumbLibrary:
         return content
 
     def delete(self, id: str) -> None:
-        file = self.home_dir / f"{make_filesystem_safe(id)}.json"
-        file.unlink()
+        with self.lock:
+            file = self.home_dir / f"{make_filesystem_safe(id)}.json"
+            file.unlink()
 
     def retrieve(
         self,
@@ -0,0 +1,248 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Sequence
+
+from pydantic import BaseModel
+
+from platogram.types import Content, SpeechEvent
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS contents (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        origin TEXT,
+        lang TEXT,
+        created REAL NOT NULL,
+        chapters TEXT NOT NULL,
+        images TEXT,
+        passages INTEGER NOT NULL,
+        events INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS contents_origin ON contents (origin, created, id)",
+    "CREATE INDEX IF NOT EXISTS contents_lang ON contents (lang, created, id)",
+    "CREATE INDEX IF NOT EXISTS contents_created ON contents (created, id)",
+    """CREATE TABLE IF NOT EXISTS passages (
+        content_id TEXT NOT NULL REFERENCES contents (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (content_id, position)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS events (
+        content_id TEXT NOT NULL REFERENCES contents (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        time_ms INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        speaker TEXT,
+        PRIMARY KEY (content_id, position)
+    ) WITHOUT ROWID""",
+]
+
+METADATA_COLUMNS = "id, title, summary, origin, lang, created, passages, events"
+
+
+class ContentMetadata(BaseModel):
+    id: str
+    title: str
+    summary: str
+    origin: str | None
+    lang: str | None
+    created: float
+    passages: int
+    events: int
+
+
+class LocalSQLiteLibrary:
+    """
+    Library on a single SQLite file: one row per content with its metadata, passages and
+    transcript events in their own tables.
+
+    Listing, paging and metadata queries read only the contents table, so they never load
+    passages or transcripts. Safe to share between threads, and between processes through
+    SQLite locking.
+    """
+
+    def __init__(self, home_dir: Path):
+        if not home_dir.exists():
+            home_dir.mkdir(parents=True)
+        self.home_dir = home_dir
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(home_dir / "library.sqlite3", check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        with self.lock, self.db:
+            for statement in SCHEMA:
+                self.db.execute(statement)
+
+    @property
+    def home(self) -> Path:
+        return self.home_dir
+
+    def ls(self) -> list[str]:
+        with self.lock:
+            return [row[0] for row in self.db.execute("SELECT id FROM contents ORDER BY created, id")]
+
+    def exists(self, id: str) -> bool:
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM contents WHERE id = ?", (id,)).fetchone() is not None
+
+    def put(self, id: str, content: Content, lang: str | None = None) -> None:
+        """Adds or replaces content, a replaced content keeps its created time."""
+        with self.lock, self.db:
+            row = self.db.execute("SELECT created FROM contents WHERE id = ?", (id,)).fetchone()
+            created = row[0] if row else time.time()
+            self.db.execute("DELETE FROM contents WHERE id = ?", (id,))
+            self.db.execute(
+                f"INSERT INTO contents ({METADATA_COLUMNS}, chapters, images) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    id,
+                    content.title,
+                    content.summary,
+                    content.origin,
+                    lang,
+                    created,
+                    len(content.passages),
+                    len(content.transcript),
+                    json.dumps(content.chapters),
+                    json.dumps(content.images) if content.images is not None else None,
+                ),
+            )
+            self.db.executemany(
+                "INSERT INTO passages (content_id, position, text) VALUES (?, ?, ?)",
+                ((id, i, passage) for i, passage in enumerate(content.passages)),
+            )
+            self.db.executemany(
+                "INSERT INTO events (content_id, position, time_ms, text, speaker) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (id, i, event.time_ms, event.text, event.speaker)
+                    for i, event in enumerate(content.transcript)
+                ),
+            )
+
+    def get_content(self, id: str) -> Content:
+        return Content(**self.get_fields(id, list(Content.model_fields)))
+
+    def get_fields(self, id: str, fields: Sequence[str]) -> dict[str, Any]:
+        """Returns values of `fields` by name, passages and transcript are read only if requested."""
+        unknown = set(fields) - set(Content.model_fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {sorted(unknown)}")
+
+        with self.lock:
+            row = self.db.execute(
+                "SELECT title, summary, origin, chapters, images FROM contents WHERE id = ?", (id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(id)
+
+            title, summary, origin, chapters, images = row
+            values: dict[str, Any] = {}
+            for field in fields:
+                if field == "title":
+                    values[field] = title
+                elif field == "summary":
+                    values[field] = summary
+                elif field == "origin":
+                    values[field] = origin
+                elif field == "chapters":
+                    values[field] = {int(marker): chapter for marker, chapter in json.loads(chapters).items()}
+                elif field == "images":
+                    values[field] = json.loads(images) if images is not None else None
+                elif field == "passages":
+                    values[field] = [
+                        text
+                        for (text,) in self.db.execute(
+                            "SELECT text FROM passages WHERE content_id = ? ORDER BY position", (id,)
+                        )
+                    ]
+                elif field == "transcript":
+                    values[field] = [
+                        SpeechEvent(time_ms=time_ms, text=text, speaker=speaker)
+                        for time_ms, text, speaker in self.db.execute(
+                            "SELECT time_ms, text, speaker FROM events WHERE content_id = ? ORDER BY position",
+                            (id,),
+                        )
+                    ]
+                # index is derived and not stored, Content.get_index rebuilds it
+        return values
+
+    def get_metadata(self, id: str) -> ContentMetadata:
+        with self.lock:
+            row = self.db.execute(f"SELECT {METADATA_COLUMNS} FROM contents WHERE id = ?", (id,)).fetchone()
+        if row is None:
+            raise KeyError(id)
+        return self._metadata(row)
+
+    def ls_page(
+        self,
+        limit: int = 100,
+        after: str | None = None,
+        origin: str | None = None,
+        lang: str | None = None,
+        created_after: float | None = None,
+        created_before: float | None = None,
+        title: str | None = None,
+    ) -> list[ContentMetadata]:
+        """
+        Lists metadata in the order of ls(), `limit` entries after the id `after`
+        (pass the id of the last entry of the previous page to get the next one).
+
+        Filters: exact `origin` and `lang`, created time in [created_after, created_before),
+        and case-insensitive substring of `title`. Raises KeyError if `after` isn't in the library.
+        """
+        conditions = []
+        params: list[Any] = []
+        if after is not None:
+            with self.lock:
+                cursor = self.db.execute("SELECT created, id FROM contents WHERE id = ?", (after,)).fetchone()
+            if cursor is None:
+                raise KeyError(after)
+            conditions.append("(created, id) > (?, ?)")
+            params.extend(cursor)
+        if origin is not None:
+            conditions.append("origin = ?")
+            params.append(origin)
+        if lang is not None:
+            conditions.append("lang = ?")
+            params.append(lang)
+        if created_after is not None:
+            conditions.append("created >= ?")
+            params.append(created_after)
+        if created_before is not None:
+            conditions.append("created < ?")
+            params.append(created_before)
+        if title is not None:
+            conditions.append("title LIKE ? ESCAPE '\\'")
+            escaped = title.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT {METADATA_COLUMNS} FROM contents {where} ORDER BY created, id LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [self._metadata(row) for row in rows]
+
+    def count(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM contents").fetchone()[0]
+
+    def delete(self, id: str) -> None:
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM contents WHERE id = ?", (id,))
+
+    def retrieve(
+        self,
+        query: str,
+        n_results: int,
+        filter_keys: list[str],
+    ) -> tuple[list[Content], list[float]]:
+        raise NotImplementedError("SQLite local storage does not support retrieval. Use get_content().")
+
+    @staticmethod
+    def _metadata(row: tuple) -> ContentMetadata:
+        return ContentMetadata(**dict(zip(METADATA_COLUMNS.split(", "), row)))
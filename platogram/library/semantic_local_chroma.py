@@ -1,5 +1,6 @@
 import json
-import os
+import re
+import threading
 from pathlib import Path
 
 try:
@@ -7,38 +8,42 @@ try:
 except ImportError:
     pass
 
-try:
-    from chromadb.utils import embedding_functions
-except ImportError:
-    pass
-
+from platogram.library.embeddings import EmbeddingFunction, get_embedding_function
 from platogram.ops import remove_markers
 from platogram.types import Content
-from platogram.utils import get_sha256_hash, make_filesystem_safe
+from platogram.utils import get_sha256_hash, make_filesystem_safe, write_json
 
-EMBEDDING_MODEL = "text-embedding-3-large"
+EMBEDDING_MODEL = "openai/text-embedding-3-large"
 
 
 class LocalChromaLibrary:
-    def __init__(self, home_dir: Path):
+    """
+    Passages are embedded by `embedding_function`, by default the one for `embedding_model`
+    with embeddings cached in the library home (see library.embeddings), and every model
+    gets its own collections.
+    """
+
+    def __init__(
+        self,
+        home_dir: Path,
+        embedding_model: str = EMBEDDING_MODEL,
+        embedding_function: EmbeddingFunction | None = None,
+    ):
         if not home_dir.exists():
             home_dir.mkdir(parents=True)
         self.home_dir = home_dir
+        self.lock = threading.Lock()
 
         self.client = chromadb.PersistentClient(path=str(home_dir / "chroma.index"))
-
-        embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-            api_key=os.environ.get("OPENAI_API_KEY"), model_name=EMBEDDING_MODEL
-        )
-        self.content = self.client.get_or_create_collection(
-            name="content",
-            embedding_function=embedding_function,  # type: ignore
-        )
-        self.segments = self.client.get_or_create_collection(
-            name="segments",
-            embedding_function=embedding_function,  # type: ignore
+        self.embed = embedding_function or get_embedding_function(
+            embedding_model, cache_path=home_dir / "embeddings.sqlite3"
         )
 
+        # collections of the default model keep their original names
+        suffix = "" if embedding_model == EMBEDDING_MODEL else "-" + re.sub(r"[^a-zA-Z0-9]+", "-", embedding_model)
+        self.content = self.client.get_or_create_collection(name=f"content{suffix}", embedding_function=None)
+        self.segments = self.client.get_or_create_collection(name=f"segments{suffix}", embedding_function=None)
+
     @property
     def home(self) -> Path:
         return self.home_dir
@@ -49,21 +54,57 @@ class LocalChromaLibrary:
     def exists(self, id: str) -> bool:
         return bool(self.content.get(ids=[id])["ids"])
 
-    def put(self, id: str, content: Content) -> None:
-        file = self.home / f"{make_filesystem_safe(id)}.json"
-        with open(file, "w") as f:
-            json.dump(content.model_dump(mode="json"), f)
-
-        self.content.add(
-            documents=[f"{content.title} {content.summary}"],
-            ids=[id],
-        )
-
-        self.segments.add(
-            documents=[remove_markers(p) for p in content.passages],
-            metadatas=[{"id": id, "passage": p} for p in content.passages],
-            ids=[get_sha256_hash(f"{id}-{p}") for p in content.passages],
-        )
+    def put(self, id: str, content: Content, lang: str | None = None) -> None:
+        self.put_many({id: content})
+
+    def put_many(self, contents: dict[str, Content]) -> None:
+        """
+        Puts contents at once: passages of all of them are embedded together in batches.
+        Passages that are already in the library are not embedded or written again, and
+        passages that are no longer part of a replaced content are removed.
+        """
+        documents = [f"{content.title} {content.summary}" for content in contents.values()]
+        segments = {
+            get_sha256_hash(f"{id}-{p}"): (id, p)
+            for id, content in contents.items()
+            for p in content.passages
+        }
+
+        with self.lock:
+            existing = set(
+                self.segments.get(where={"id": {"$in": list(contents)}}, include=[])["ids"]  # type: ignore
+            )
+        new = [key for key in segments if key not in existing]
+
+        document_embeddings = self.embed(documents)
+        segment_embeddings = self.embed([remove_markers(segments[key][1]) for key in new])
+
+        with self.lock:
+            for id, content in contents.items():
+                file = self.home / f"{make_filesystem_safe(id)}.json"
+                write_json(file, content.model_dump(mode="json"))
+
+            self._upsert(
+                self.content,
+                ids=list(contents),
+                documents=documents,
+                embeddings=document_embeddings,
+            )
+            stale = [key for key in existing if key not in segments]
+            if stale:
+                self.segments.delete(ids=stale)
+            self._upsert(
+                self.segments,
+                ids=new,
+                documents=[remove_markers(segments[key][1]) for key in new],
+                embeddings=segment_embeddings,
+                metadatas=[{"id": segments[key][0], "passage": segments[key][1]} for key in new],
+            )
+
+    def _upsert(self, collection, **columns) -> None:
+        batch_size = self.client.get_max_batch_size()
+        for i in range(0, len(columns["ids"]), batch_size):
+            collection.upsert(**{name: values[i : i + batch_size] for name, values in columns.items()})
 
     def get_content(self, id: str) -> Content:
         file = self.home_dir / f"{make_filesystem_safe(id)}.json"
@@ -72,13 +113,29 @@ class LocalChromaLibrary:
         return content
 
     def delete(self, id: str) -> None:
-        content = self.get_content(id)
-        file = self.home_dir / f"{make_filesystem_safe(id)}.json"
-        file.unlink()
-        self.segments.delete(
-            ids=[get_sha256_hash(f"{id}-{p}") for p in content.passages]
+        with self.lock:
+            content = self.get_content(id)
+            file = self.home_dir / f"{make_filesystem_safe(id)}.json"
+            file.unlink()
+            self.segments.delete(
+                ids=[get_sha256_hash(f"{id}-{p}") for p in content.passages]
+            )
+            self.content.delete(ids=[id])
+
+    def search(self, query: str, n_results: int, filter_keys: list[str]) -> list[tuple[str, str, float]]:
+        """Returns up to n_results (id, passage, distance), nearest first."""
+        results = self.segments.query(
+            query_embeddings=self.embed([query]),  # type: ignore
+            n_results=n_results,
+            where={"id": {"$in": filter_keys}} if filter_keys else None,  # type: ignore
         )
-        self.content.delete(ids=[id])
+        if not results or not results["metadatas"] or not results["distances"]:
+            return []
+
+        return [
+            (str(metadata["id"]), str(metadata["passage"]), distance)
+            for metadata, distance in zip(results["metadatas"][0], results["distances"][0])
+        ]
 
     def retrieve(
         self,
@@ -86,23 +143,16 @@ class LocalChromaLibrary:
         n_results: int,
         filter_keys: list[str],
     ) -> tuple[list[Content], list[float]]:
-        filter_keys = filter_keys or []
-        results = self.segments.query(
-            query_texts=[query],
-            n_results=n_results,
-            where={"id": {"$in": filter_keys}} if filter_keys else None,  # type: ignore
-        )
-
-        retrieved_content: dict[str, Content] = {}
-        if not results or not results["metadatas"] or not results["distances"]:
+        hits = self.search(query, n_results, filter_keys or [])
+        if not hits:
             return [], []
 
-        for metadata in results["metadatas"][0]:
-            id = str(metadata["id"])
-            passage = str(metadata["passage"])
+        retrieved_content: dict[str, Content] = {}
+        for id, passage, _ in hits:
             if id not in retrieved_content:
                 retrieved_content[id] = self.get_content(id)
                 retrieved_content[id].passages = []
+                retrieved_content[id].index = None
             retrieved_content[id].passages.append(passage)
 
-        return list(retrieved_content.values()), results["distances"][0]
+        return list(retrieved_content.values()), [distance for _, _, distance in hits]
@@ -1,9 +1,11 @@
-from typing import Protocol, Literal, Generator, Sequence
+from typing import AsyncGenerator, Protocol, Literal, Generator, Sequence
 from platogram.types import Content, User, Assistant
 
 
 class LanguageModel(Protocol):
-    def count_tokens(self, text: str) -> int: ...
+    def count_tokens(self, text: str, lang: str | None = None) -> int: ...
+
+    def count_tokens_many(self, texts: Sequence[str], lang: str | None = None) -> list[int]: ...
 
     def get_meta(
         self, paragraphs: list[str], max_tokens: int = 4096, temperature: float = 0.5, lang: str | None = None
@@ -41,17 +43,88 @@ class LanguageModel(Protocol):
         max_tokens: int = 4096,
         temperature: float = 0.5,
         lang: str | None = None,
+        budget: int | None = None,
+        query: str | None = None,
     ) -> str: ...
 
     def render_context(
-        self, context: list[Content], context_size: Literal["small", "medium", "large"]
+        self,
+        context: list[Content],
+        context_size: Literal["small", "medium", "large"],
+        budget: int | None = None,
+        query: str | None = None,
+        lang: str | None = None,
     ) -> str: ...
 
 
-def get_model(full_model_name: str, key: str | None = None) -> LanguageModel:
+class AsyncLanguageModel(Protocol):
+    def count_tokens(self, text: str, lang: str | None = None) -> int: ...
+
+    def count_tokens_many(self, texts: Sequence[str], lang: str | None = None) -> list[int]: ...
+
+    async def get_meta(
+        self, paragraphs: list[str], max_tokens: int = 4096, temperature: float = 0.5, lang: str | None = None
+    ) -> tuple[str, str]: ...
+
+    async def get_chapters(
+        self, passages: list[str], max_tokens: int = 4096, temperature: float = 0.5, lang: str | None = None
+    ) -> dict[int, str]: ...
+
+    async def get_paragraphs(
+        self,
+        text_with_markers: str,
+        examples: dict[str, list[str]],
+        max_tokens: int = 4096,
+        temperature: float = 0.5,
+        lang: str | None = None
+    ) -> list[str]: ...
+
+    async def prompt_model(
+        self,
+        messages: Sequence[User | Assistant],
+        max_tokens: int = 4096,
+        temperature=0.1,
+        stream=False,
+        system: str | None = None,
+        tools: list[dict] | None = None,
+    ) -> str | dict[str, str] | AsyncGenerator[str, None]: ...
+
+    async def prompt(
+        self,
+        prompt: Sequence[User | Assistant] | str,
+        *,
+        context: list[Content],
+        context_size: Literal["small", "medium", "large"] = "small",
+        max_tokens: int = 4096,
+        temperature: float = 0.5,
+        lang: str | None = None,
+        budget: int | None = None,
+        query: str | None = None,
+    ) -> str: ...
+
+    def render_context(
+        self,
+        context: list[Content],
+        context_size: Literal["small", "medium", "large"],
+        budget: int | None = None,
+        query: str | None = None,
+        lang: str | None = None,
+    ) -> str: ...
+
+
+def get_model(full_model_name: str, key: str | None = None, **kwargs) -> LanguageModel:
     if full_model_name.startswith("anthropic/"):
         from platogram.llm.anthropic import Model
 
-        return Model(full_model_name.split("/")[-1], key)
+        return Model(full_model_name.split("/")[-1], key, **kwargs)
+    else:
+        raise ValueError(f"Unsupported language model: {full_model_name}")
+
+
+def get_async_model(full_model_name: str, key: str | None = None, **kwargs) -> AsyncLanguageModel:
+    if full_model_name.startswith("anthropic/"):
+        from platogram.llm.anthropic import AsyncModel
+
+        return AsyncModel(full_model_name.split("/")[-1], key, **kwargs)
     else:
         raise ValueError(f"Unsupported language model: {full_model_name}")
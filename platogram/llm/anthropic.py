@@ -1,6 +1,10 @@
+import asyncio
 import os
 import re
-from typing import Any, Generator, Literal, Sequence
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Generator, Literal, Sequence
 
 import anthropic
 from anthropic import AnthropicError
@@ -11,45 +15,98 @@ from tenacity import (
     stop_after_delay,
 )
 
-from platogram.ops import render
+from platogram.llm.cache import ResponseCache
+from platogram.llm.tokenizer import TokenCounter
+from platogram.ops import pack, relevance_scores, render, shift_markers
 from platogram.types import Assistant, Content, User
+from platogram.utils import get_sha256_hash
 
 RETRY = retry(
     stop=(stop_after_delay(300) | stop_after_attempt(5)),
     retry=retry_if_exception_type(AnthropicError),
 )
 
+# Number of transcript events packed into context as one unit, see PromptBuilder.render_context().
+TRANSCRIPT_SPAN = 16
 
-class Model:
-    def __init__(self, model: str, key: str | None = None) -> None:
-        if key is None:
-            key = os.environ["ANTHROPIC_API_KEY"]
+# Number of rendered contexts memoized per process, see PromptBuilder.render_context_cached().
+RENDERED_CONTEXTS_SIZE = 32
 
-        if model == "claude-3-haiku":
-            self.model = "claude-3-haiku-20240307"
-        elif model == "claude-3-opus":
-            self.model = "claude-3-opus-20240229"
-        elif model == "claude-3-sonnet":
-            self.model = "claude-3-sonnet-20240229"
-        elif model == "claude-3-5-sonnet":
-            self.model = "claude-3-5-sonnet-20240620"
-        else:
+_rendered_contexts: OrderedDict[tuple, str] = OrderedDict()
+_rendered_contexts_lock = threading.Lock()
+
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+# Maximum number of requests in flight across all AsyncModel instances of the process.
+ASYNC_CONCURRENCY = 16
+
+# asyncio primitives and httpx connection pools are bound to an event loop,
+# so the semaphore and the clients are shared per loop.
+_async_state: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, tuple[asyncio.Semaphore, dict[str, anthropic.AsyncAnthropic]]
+] = weakref.WeakKeyDictionary()
+
+
+def _loop_state() -> tuple[asyncio.Semaphore, dict[str, anthropic.AsyncAnthropic]]:
+    loop = asyncio.get_running_loop()
+    if loop not in _async_state:
+        _async_state[loop] = (asyncio.Semaphore(ASYNC_CONCURRENCY), {})
+    return _async_state[loop]
+
+
+MODELS = {
+    "claude-3-haiku": "claude-3-haiku-20240307",
+    "claude-3-opus": "claude-3-opus-20240229",
+    "claude-3-sonnet": "claude-3-sonnet-20240229",
+    "claude-3-5-sonnet": "claude-3-5-sonnet-20240620",
+}
+
+
+class PromptBuilder:
+    """
+    Prompts and response parsing shared by Model and AsyncModel.
+
+    Every `*_request` method returns keyword arguments for prompt_model(), every `parse_*` method
+    turns its response into the value returned by the corresponding public method.
+    """
+
+    # Bump when prompts change, so checkpointed responses to old prompts are not reused.
+    prompt_version = "1"
+
+    def __init__(
+        self,
+        model: str,
+        token_counter: TokenCounter | None = None,
+        cache: ResponseCache | None = None,
+    ) -> None:
+        if model not in MODELS:
             raise ValueError(f"Unknown model: {model}")
 
-        self.client = anthropic.Client(api_key=key)
+        self.model = MODELS[model]
+        self.token_counter = token_counter or TokenCounter()
+        self.cache = cache
+        self.usage = {field: 0 for field in USAGE_FIELDS}
+        self.usage_lock = threading.Lock()
 
-    def count_tokens(self, text: str) -> int:
-        return self.client.count_tokens(text)
+    def count_tokens(self, text: str, lang: str | None = None) -> int:
+        return self.token_counter.count_tokens(text, lang=lang)
 
-    def prompt_model(
+    def count_tokens_many(self, texts: Sequence[str], lang: str | None = None) -> list[int]:
+        return self.token_counter.count_tokens_many(texts, lang=lang)
+
+    def message_params(
         self,
         messages: Sequence[User | Assistant],
-        max_tokens: int = 4096,
-        temperature=0.1,
-        stream=False,
-        system: str | None = None,
-        tools: list[dict] | None = None,
-    ) -> str | dict[str, str] | Generator[str, None, None]:
+        max_tokens: int,
+        temperature: float,
+        system: str | None,
+        tools: list[dict] | None,
+    ) -> dict[str, Any]:
         kwargs: dict[str, Any] = {}
 
         if tools:
@@ -58,61 +115,56 @@ class Model:
         if system:
             kwargs["system"] = system
 
-        if not stream:
-
-            @RETRY
-            def get_response(messages):
-                response = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    extra_headers={"anthropic-beta": "prompt-caching-2024-07-31"},
-                    messages=[
-                        {"role": m.role, "content": m.content}
-                        if not m.cache
-                        else {
-                            "role": m.role,
-                            "content": [{"type": "text", "text": m.content, "cache_control": {"type": "ephemeral"}}],
-                        }
-                        for m in messages
-                    ],
-                    **kwargs,
-                )
-
-                if response.stop_reason == "tool_use":
-                    return response.content[-1].input
+        return dict(
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            extra_headers={"anthropic-beta": "prompt-caching-2024-07-31"},
+            messages=[
+                {"role": m.role, "content": m.content}
+                if not m.cache
+                else {
+                    "role": m.role,
+                    "content": [{"type": "text", "text": m.content, "cache_control": {"type": "ephemeral"}}],
+                }
+                for m in messages
+            ],
+            **kwargs,
+        )
 
-                return response.content[0].text
+    def record_usage(self, usage: Any) -> None:
+        """Adds token counts reported by the API, including prompt cache writes and reads."""
+        with self.usage_lock:
+            for field in USAGE_FIELDS:
+                self.usage[field] += getattr(usage, field, None) or 0
 
-            return get_response(messages)
+    @staticmethod
+    def response_output(response: Any) -> str | dict[str, str]:
+        if response.stop_reason == "tool_use":
+            return response.content[-1].input
 
-        def stream_text():
-            with self.client.messages.stream(
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                messages=[{"role": m.role, "content": m.content} for m in messages],
-                **kwargs,
-            ) as stream:
+        return response.content[0].text
 
-                @RETRY
-                def get_response():
-                    while True:
-                        for text in stream.text_stream:
-                            yield text
-                        break
-
-                return get_response()
-
-        return stream_text()
-
-    def get_meta(
+    def cache_key(
+        self,
+        messages: Sequence[User | Assistant],
+        max_tokens: int,
+        temperature: float,
+        system: str | None,
+        tools: list[dict] | None,
+    ) -> str | None:
+        """Returns response cache key, or None if the response shouldn't be cached."""
+        if self.cache is None or not self.cache.cacheable(temperature):
+            return None
+        return self.cache.key(self.model, system, messages, tools, temperature, max_tokens)
+
+    def meta_request(
         self,
         paragraphs: list[str],
         max_tokens: int = 4096,
         temperature: float = 0.5,
         lang: str | None = None,
-    ) -> tuple[str, str]:
+    ) -> dict[str, Any]:
         if not lang:
             lang = "en"
 
@@ -172,7 +224,7 @@ Siempre llama al tool render_content_info y pasa la información sobre el conten
 
         text = "\n".join([f"<p>{paragraph}</p>" for paragraph in paragraphs])
 
-        meta = self.prompt_model(
+        return dict(
             system=system_prompt[lang],
             messages=[User(content=f"<text>{text}</text>")],
             tools=[tool_definition],
@@ -180,18 +232,20 @@ Siempre llama al tool render_content_info y pasa la información sobre el conten
             temperature=temperature,
         )
 
+    @staticmethod
+    def parse_meta(meta: Any) -> tuple[str, str]:
         assert isinstance(
             meta, dict
         ), f"Expected LLM to return dict with meta information, got {meta}"
         return meta["title"], meta["summary"]
 
-    def get_chapters(
+    def chapters_request(
         self,
         passages: list[str],
         max_tokens: int = 4096,
         temperature: float = 0.5,
         lang: str | None = None,
-    ) -> dict[int, str]:
+    ) -> dict[str, Any]:
         if not lang:
             lang = "en"
 
@@ -263,7 +317,7 @@ Sigue estos pasos para transformar los <passages> en un diccionario de capítulo
 
         text = "\n".join([f"<p>{passage}</p>" for passage in passages])
 
-        chapters = self.prompt_model(
+        return dict(
             system=system_prompt[lang],
             messages=[User(content=f"<passages>{text}</passages>")],
             tools=[tool_definition],
@@ -271,6 +325,8 @@ Sigue estos pasos para transformar los <passages> en un diccionario de capítulo
             temperature=temperature,
         )
 
+    @staticmethod
+    def parse_chapters(chapters: Any) -> dict[int, str]:
         assert isinstance(
             chapters, dict
         ), f"Expected LLM to return dict with chapters, got {chapters}"
@@ -282,14 +338,14 @@ Sigue estos pasos para transformar los <passages> en un diccionario de capítulo
             for chapter in chapters["entities"]
         }
 
-    def get_paragraphs(
+    def paragraphs_request(
         self,
         text_with_markers: str,
         examples: dict[str, list[str]],
         max_tokens: int = 4096,
         temperature: float = 0.5,
         lang: str | None = None,
-    ) -> list[str]:
+    ) -> dict[str, Any]:
         if not lang:
             lang = "en"
 
@@ -337,7 +393,7 @@ Siga estos pasos para reescribir el <transcript> y mantener cada <marker>:
         # https://docs.anthropic.com/en/docs/build-with-claude/prompt-caching#can-i-use-prompt-caching-at-the-same-time-as-other-betas
         example_messages[-1].cache = True
 
-        paragraphs = self.prompt_model(
+        return dict(
             max_tokens=max_tokens,
             messages=[
                 *example_messages,
@@ -347,48 +403,128 @@ Siga estos pasos para reescribir el <transcript> y mantener cada <marker>:
             system=system_prompt[lang],
             temperature=temperature,
         )
+
+    @staticmethod
+    def parse_paragraphs(paragraphs: Any) -> list[str]:
         assert isinstance(
             paragraphs, str
         ), f"Expected LLM to return str, got {paragraphs}"
         return re.findall(r"<p>(.*?)</p>", paragraphs, re.DOTALL)
 
     def render_context(
-        self, context: list[Content], context_size: Literal["small", "medium", "large"]
+        self,
+        context: list[Content],
+        context_size: Literal["small", "medium", "large"],
+        budget: int | None = None,
+        query: str | None = None,
+        lang: str | None = None,
     ) -> str:
+        """
+        Renders context with markers of every content offset by the length of the transcripts before it.
+
+        With a token budget, title and summary of every content are always included, and paragraphs
+        (and for "medium" and "large" spans of TRANSCRIPT_SPAN transcript events) are added by relevance
+        to query until the budget is full. Without a query, the budget is spread evenly across contents.
+        Markers are numbered the same way with or without a budget.
+        """
         base = 0
-        output = ""
+        headers: list[str] = []
+        # (content number, "p" for paragraph or "t" for transcript span, position, text)
+        units: list[tuple[int, str, int, str]] = []
+
+        for n, content in enumerate(context):
+            headers.append(f'<content title="{content.title}" summary="{content.summary}">\n')
+            if context_size == "small" or context_size == "large":
+                for i, paragraph in enumerate(content.passages):
+                    paragraph = re.sub(
+                        r"【(\d+)】(\w*【\d+】\w*)+",
+                        lambda m: f"【{int(m.group(1))}】",
+                        shift_markers(paragraph, base),
+                    )
+                    units.append((n, "p", i, paragraph))
+
+            if context_size == "medium" or context_size == "large":
+                for i, start in enumerate(range(0, len(content.transcript), TRANSCRIPT_SPAN)):
+                    events = content.transcript[start : start + TRANSCRIPT_SPAN]
+                    text = render({start + j + base: event.text for j, event in enumerate(events)})
+                    units.append((n, "t", i, text))
+
+            base += len(content.transcript)
 
-        for content in context:
+        if budget is None:
+            selected = set(range(len(units)))
+        else:
+            texts = [f"<p>{text}</p>" if kind == "p" else text for _, kind, _, text in units]
+            token_counts = self.count_tokens_many(texts, lang=lang)
+            relevance = relevance_scores(query, texts) if query else [0.0] * len(units)
+            priorities = [(score, -position) for score, (_, _, position, _) in zip(relevance, units)]
+            remaining = budget - sum(self.count_tokens_many(headers, lang=lang))
+            selected = set(pack(token_counts, priorities, remaining))
+
+        output = ""
+        for n, header in enumerate(headers):
             paragraphs = [
-                re.sub(r"【(\d+)】", lambda m: f"【{int(m.group(1))+base}】", paragraph)
-                for paragraph in content.passages
+                text
+                for i, (m, kind, _, text) in enumerate(units)
+                if m == n and kind == "p" and i in selected
             ]
-            paragraphs = [
-                re.sub(
-                    r"【(\d+)】(\w*【\d+】\w*)+",
-                    lambda m: f"【{int(m.group(1))}】",
-                    paragraph,
-                )
-                for paragraph in paragraphs
+            spans = [
+                (position, text)
+                for i, (m, kind, position, text) in enumerate(units)
+                if m == n and kind == "t" and i in selected
             ]
-            output += f'<content title="{content.title}" summary="{content.summary}">\n'
-            if context_size == "small" or context_size == "large":
+
+            output += header
+            if (context_size == "small" or context_size == "large") and (paragraphs or budget is None):
                 output += "<paragraphs>\n"
                 output += "\n".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
                 output += "\n</paragraphs>\n"
 
-            if context_size == "medium" or context_size == "large":
-                text = render(
-                    {i + base: event.text for i, event in enumerate(content.transcript)}
+            if (context_size == "medium" or context_size == "large") and (spans or budget is None):
+                # spans that are not adjacent in the transcript are separated by an ellipsis
+                text = "".join(
+                    span if i == 0 or position == spans[i - 1][0] + 1 else f" … {span}"
+                    for i, (position, span) in enumerate(spans)
                 )
                 output += f"<text>{text}</text>\n"
 
             output += "</content>\n"
-            base += len(content.transcript)
 
         return output.strip()
 
-    def prompt(
+    def render_context_cached(
+        self,
+        context: list[Content],
+        context_size: Literal["small", "medium", "large"],
+        budget: int | None = None,
+        query: str | None = None,
+        lang: str | None = None,
+    ) -> str:
+        """
+        Same as render_context(), memoized per process by content fingerprints and rendering options,
+        so follow-up prompts over the same content reuse the rendering.
+        """
+        key = (
+            tuple(get_sha256_hash(content.model_dump_json()) for content in context),
+            context_size,
+            budget,
+            query if budget is not None else None,
+            lang,
+        )
+        with _rendered_contexts_lock:
+            if key in _rendered_contexts:
+                _rendered_contexts.move_to_end(key)
+                return _rendered_contexts[key]
+
+        rendered = self.render_context(context, context_size, budget=budget, query=query, lang=lang)
+
+        with _rendered_contexts_lock:
+            _rendered_contexts[key] = rendered
+            while len(_rendered_contexts) > RENDERED_CONTEXTS_SIZE:
+                _rendered_contexts.popitem(last=False)
+        return rendered
+
+    def prompt_request(
         self,
         prompt: Sequence[User | Assistant] | str,
         *,
@@ -397,7 +533,9 @@ Siga estos pasos para reescribir el <transcript> y mantener cada <marker>:
         max_tokens: int = 4096,
         temperature: float = 0.5,
         lang: str | None = None,
-    ) -> str:
+        budget: int | None = None,
+        query: str | None = None,
+    ) -> dict[str, Any]:
         if not lang:
             lang = "en"
 
@@ -445,20 +583,319 @@ Sigue los pasos en <scratchpad> para construir <response> que esté bien estruct
         if isinstance(prompt, str):
             prompt = [User(content=prompt)]
 
-        response = self.prompt_model(
+        if budget is not None and query is None:
+            query = " ".join(message.content for message in prompt if message.role == "user")
+
+        # The context goes first, in a message of its own marked for prompt caching, so follow-up prompts
+        # over the same context read it from the cache.
+        context_text = self.render_context_cached(context, context_size, budget=budget, query=query, lang=lang)
+        return dict(
             max_tokens=max_tokens,
             messages=[
                 User(
                     content=f"""<context>
-{self.render_context(context, context_size)}
-</context>
-<prompt>
+{context_text}
+</context>""",
+                    cache=True,
+                ),
+                User(
+                    content=f"""<prompt>
 {prompt}
 </prompt>"""
-                )
+                ),
             ],
             system=system_prompt[lang],
             temperature=temperature,
         )
+
+    @staticmethod
+    def parse_prompt(response: Any) -> str:
         assert isinstance(response, str), f"Expected LLM to return str, got {response}"
         return response
+
+
+class Model(PromptBuilder):
+    def __init__(
+        self,
+        model: str,
+        key: str | None = None,
+        token_counter: TokenCounter | None = None,
+        cache: ResponseCache | None = None,
+    ) -> None:
+        super().__init__(model, token_counter, cache)
+
+        if key is None:
+            key = os.environ["ANTHROPIC_API_KEY"]
+
+        self.client = anthropic.Client(api_key=key)
+
+    def prompt_model(
+        self,
+        messages: Sequence[User | Assistant],
+        max_tokens: int = 4096,
+        temperature=0.1,
+        stream=False,
+        system: str | None = None,
+        tools: list[dict] | None = None,
+    ) -> str | dict[str, str] | Generator[str, None, None]:
+        if not stream:
+
+            @RETRY
+            def get_response(messages):
+                response = self.client.messages.create(
+                    **self.message_params(messages, max_tokens, temperature, system, tools)
+                )
+                self.record_usage(response.usage)
+                return self.response_output(response)
+
+            key = self.cache_key(messages, max_tokens, temperature, system, tools)
+            if key is None:
+                return get_response(messages)
+
+            cached = self.cache.get(key)  # type: ignore
+            if cached is not None:
+                return cached
+
+            response = get_response(messages)
+            self.cache.put(key, response)  # type: ignore
+            return response
+
+        kwargs: dict[str, Any] = {}
+
+        if tools:
+            kwargs["tools"] = tools
+
+        if system:
+            kwargs["system"] = system
+
+        def stream_text():
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                messages=[{"role": m.role, "content": m.content} for m in messages],
+                **kwargs,
+            ) as stream:
+
+                @RETRY
+                def get_response():
+                    while True:
+                        for text in stream.text_stream:
+                            yield text
+                        break
+
+                return get_response()
+
+        return stream_text()
+
+    def get_meta(
+        self,
+        paragraphs: list[str],
+        max_tokens: int = 4096,
+        temperature: float = 0.5,
+        lang: str | None = None,
+    ) -> tuple[str, str]:
+        return self.parse_meta(
+            self.prompt_model(**self.meta_request(paragraphs, max_tokens, temperature, lang))
+        )
+
+    def get_chapters(
+        self,
+        passages: list[str],
+        max_tokens: int = 4096,
+        temperature: float = 0.5,
+        lang: str | None = None,
+    ) -> dict[int, str]:
+        return self.parse_chapters(
+            self.prompt_model(**self.chapters_request(passages, max_tokens, temperature, lang))
+        )
+
+    def get_paragraphs(
+        self,
+        text_with_markers: str,
+        examples: dict[str, list[str]],
+        max_tokens: int = 4096,
+        temperature: float = 0.5,
+        lang: str | None = None,
+    ) -> list[str]:
+        return self.parse_paragraphs(
+            self.prompt_model(
+                **self.paragraphs_request(text_with_markers, examples, max_tokens, temperature, lang)
+            )
+        )
+
+    def prompt(
+        self,
+        prompt: Sequence[User | Assistant] | str,
+        *,
+        context: list[Content],
+        context_size: Literal["small", "medium", "large"] = "small",
+        max_tokens: int = 4096,
+        temperature: float = 0.5,
+        lang: str | None = None,
+        budget: int | None = None,
+        query: str | None = None,
+    ) -> str:
+        return self.parse_prompt(
+            self.prompt_model(
+                **self.prompt_request(
+                    prompt,
+                    context=context,
+                    context_size=context_size,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    lang=lang,
+                    budget=budget,
+                    query=query,
+                )
+            )
+        )
+
+
+class AsyncModel(PromptBuilder):
+    """
+    Same as Model, but every request method is a coroutine.
+
+    All instances in the process share one connection pool per API key and one semaphore
+    that limits the number of requests in flight to ASYNC_CONCURRENCY.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        key: str | None = None,
+        token_counter: TokenCounter | None = None,
+        cache: ResponseCache | None = None,
+    ) -> None:
+        super().__init__(model, token_counter, cache)
+
+        if key is None:
+            key = os.environ["ANTHROPIC_API_KEY"]
+
+        self.key = key
+
+    @property
+    def client(self) -> anthropic.AsyncAnthropic:
+        _, clients = _loop_state()
+        if self.key not in clients:
+            clients[self.key] = anthropic.AsyncAnthropic(api_key=self.key)
+        return clients[self.key]
+
+    async def prompt_model(
+        self,
+        messages: Sequence[User | Assistant],
+        max_tokens: int = 4096,
+        temperature=0.1,
+        stream=False,
+        system: str | None = None,
+        tools: list[dict] | None = None,
+    ) -> str | dict[str, str] | AsyncGenerator[str, None]:
+        semaphore, _ = _loop_state()
+
+        if not stream:
+
+            @RETRY
+            async def get_response(messages):
+                async with semaphore:
+                    response = await self.client.messages.create(
+                        **self.message_params(messages, max_tokens, temperature, system, tools)
+                    )
+                self.record_usage(response.usage)
+                return self.response_output(response)
+
+            key = self.cache_key(messages, max_tokens, temperature, system, tools)
+            if key is None:
+                return await get_response(messages)
+
+            cached = self.cache.get(key)  # type: ignore
+            if cached is not None:
+                return cached
+
+            response = await get_response(messages)
+            self.cache.put(key, response)  # type: ignore
+            return response
+
+        kwargs: dict[str, Any] = {}
+
+        if tools:
+            kwargs["tools"] = tools
+
+        if system:
+            kwargs["system"] = system
+
+        async def stream_text():
+            async with semaphore:
+                async with self.client.messages.stream(
+                    model=self.model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    messages=[{"role": m.role, "content": m.content} for m in messages],
+                    **kwargs,
+                ) as stream:
+                    async for text in stream.text_stream:
+                        yield text
+
+        return stream_text()
+
+    async def get_meta(
+        self,
+        paragraphs: list[str],
+        max_tokens: int = 4096,
+        temperature: float = 0.5,
+        lang: str | None = None,
+    ) -> tuple[str, str]:
+        return self.parse_meta(
+            await self.prompt_model(**self.meta_request(paragraphs, max_tokens, temperature, lang))
+        )
+
+    async def get_chapters(
+        self,
+        passages: list[str],
+        max_tokens: int = 4096,
+        temperature: float = 0.5,
+        lang: str | None = None,
+    ) -> dict[int, str]:
+        return self.parse_chapters(
+            await self.prompt_model(**self.chapters_request(passages, max_tokens, temperature, lang))
+        )
+
+    async def get_paragraphs(
+        self,
+        text_with_markers: str,
+        examples: dict[str, list[str]],
+        max_tokens: int = 4096,
+        temperature: float = 0.5,
+        lang: str | None = None,
+    ) -> list[str]:
+        return self.parse_paragraphs(
+            await self.prompt_model(
+                **self.paragraphs_request(text_with_markers, examples, max_tokens, temperature, lang)
+            )
+        )
+
+    async def prompt(
+        self,
+        prompt: Sequence[User | Assistant] | str,
+        *,
+        context: list[Content],
+        context_size: Literal["small", "medium", "large"] = "small",
+        max_tokens: int = 4096,
+        temperature: float = 0.5,
+        lang: str | None = None,
+        budget: int | None = None,
+        query: str | None = None,
+    ) -> str:
+        return self.parse_prompt(
+            await self.prompt_model(
+                **self.prompt_request(
+                    prompt,
+                    context=context,
+                    context_size=context_size,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    lang=lang,
+                    budget=budget,
+                    query=query,
+                )
+            )
+        )
@@ -0,0 +1,76 @@
+import json
+from pathlib import Path
+from typing import Any, Literal, Sequence
+
+from platogram.cache import DiskCache
+from platogram.types import Assistant, User
+from platogram.utils import get_sha256_hash
+
+
+class ResponseCache:
+    """
+    Disk-backed cache of model responses, keyed by everything that determines the response.
+
+    Modes:
+        use: return cached responses and store new ones.
+        refresh: ignore cached responses, but store new ones.
+        bypass: don't read or write the cache.
+
+    Responses sampled with temperature > 0 are not deterministic, so they are cached only
+    when `any_temperature` is set.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        mode: Literal["use", "refresh", "bypass"] = "use",
+        any_temperature: bool = False,
+        max_bytes: int = 256 * 2**20,
+        ttl: float | None = 7 * 24 * 3600,
+    ) -> None:
+        self.mode = mode
+        self.any_temperature = any_temperature
+        self.store = DiskCache(path, max_bytes=max_bytes, ttl=ttl)
+
+    @staticmethod
+    def key(
+        model: str,
+        system: str | None,
+        messages: Sequence[User | Assistant],
+        tools: list[dict] | None,
+        temperature: float,
+        max_tokens: int,
+    ) -> str:
+        return get_sha256_hash(
+            json.dumps(
+                {
+                    "model": model,
+                    "system": system,
+                    "messages": [message.model_dump() for message in messages],
+                    "tools": tools,
+                    "temperature": temperature,
+                    "max_tokens": max_tokens,
+                },
+                sort_keys=True,
+            )
+        )
+
+    def cacheable(self, temperature: float) -> bool:
+        return self.mode != "bypass" and (temperature == 0 or self.any_temperature)
+
+    def get(self, key: str) -> Any | None:
+        if self.mode != "use":
+            return None
+        return self.store.get(key)
+
+    def put(self, key: str, response: Any) -> None:
+        if self.mode != "bypass":
+            self.store.put(key, response)
+
+    @property
+    def hits(self) -> int:
+        return self.store.hits
+
+    @property
+    def misses(self) -> int:
+        return self.store.misses
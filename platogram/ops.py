@@ -1,14 +1,35 @@
+import asyncio
+import json
+import math
 import re
-from typing import Callable
+import time
+from bisect import bisect_right
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from itertools import accumulate
+from typing import AsyncGenerator, Awaitable, Callable, Generator, Sequence, TypeVar
 
 from tqdm import tqdm  # type: ignore
 
-from platogram.llm import LanguageModel
-from platogram.types import Content, SpeechEvent
+from platogram.checkpoint import Checkpoints
+from platogram.llm import AsyncLanguageModel, LanguageModel
+from platogram.types import (
+    MARKER,
+    Content,
+    ContentIndex,
+    IndexChapters,
+    IndexDone,
+    IndexEvent,
+    IndexMeta,
+    IndexParagraphs,
+    IndexProgress,
+    SpeechEvent,
+)
+
+T = TypeVar("T")
 
 
 def remove_markers(text: str) -> str:
-    return re.sub(r"(【\d+】)", r" ", text)
+    return MARKER.sub(" ", text)
 
 
 def parse(text_with_markers: str, marker: str = r"(【\d+】)") -> dict[int, str]:
@@ -89,6 +110,39 @@ def render(
     return "".join([f"{text}{marker_fn(value)}" for value, text in segments.items()])
 
 
+def chunk_bounds(token_counts: Sequence[int], chunk_size: int) -> list[tuple[int, int]]:
+    """
+    Splits a sequence of per-segment token counts into contiguous chunks of roughly equal size.
+
+    The number of chunks is the smallest one that keeps every chunk within chunk_size tokens, and the
+    segments are then distributed greedily so that each chunk stays within the average chunk size.
+    Uses prefix sums of token counts and a binary search for every boundary, so the cost is
+    O(n log n) in the number of segments and token counts are never recomputed.
+
+    Args:
+        token_counts: Number of tokens in each segment, markers included.
+        chunk_size: The desired maximum size of each chunk, in terms of the number of tokens.
+
+    Returns:
+        A list of (start, stop) index ranges into token_counts, one per chunk. A segment larger than the
+        target chunk size ends up in a chunk of its own.
+    """
+    prefix = list(accumulate(token_counts, initial=0))
+    total_tokens = prefix[-1]
+    num_chunks = max((total_tokens + chunk_size - 1) // chunk_size, 1)
+    target_chunk_size = (total_tokens + num_chunks - 1) // num_chunks
+
+    bounds = []
+    start = 0
+    while start < len(token_counts):
+        stop = bisect_right(prefix, prefix[start] + target_chunk_size, lo=start + 1) - 1
+        stop = max(stop, start + 1)
+        bounds.append((start, stop))
+        start = stop
+
+    return bounds
+
+
 def chunk_text(
     text_with_markers: str,
     chunk_size: int,
@@ -102,6 +156,9 @@ def chunk_text(
     "text【number】text【number】...【number】"
     where 【number】 is a numeric value enclosed in square brackets.
 
+    Every segment is rendered together with its marker and counted exactly once, so the marker overhead
+    is part of the segment's token count and the chunk boundaries are found with chunk_bounds().
+
     Args:
         text_with_markers: The input string containing text segments and markers.
         chunk_size: The desired maximum size of each chunk, in terms of the number of tokens.
@@ -113,127 +170,956 @@ def chunk_text(
         the text segments such that the total number of tokens in each chunk is as close as possible to the specified
         chunk size, without exceeding it. The markers are preserved in the output chunks.
     """
-    segments = parse(text_with_markers, marker)
-    total_tokens = token_count_fn(render(segments))
-    num_chunks = (total_tokens + chunk_size - 1) // chunk_size
-    target_chunk_size = (total_tokens + num_chunks - 1) // num_chunks
+    rendered = [render({key: text}) for key, text in parse(text_with_markers, marker).items()]
+    token_counts = [token_count_fn(segment) for segment in rendered]
 
-    chunks = []
-    chunk_segments: dict[int, str] = {}
-    for key, segment in segments.items():
-        updated_chunk_segments = {**chunk_segments, key: segment}
-        if (
-            token_count_fn(render(updated_chunk_segments)) > target_chunk_size
-            and chunk_segments
-        ):
-            chunks.append(chunk_segments)
-            chunk_segments = {key: segment}
-        else:
-            chunk_segments = updated_chunk_segments
+    return ["".join(rendered[start:stop]) for start, stop in chunk_bounds(token_counts, chunk_size)]
+
+
+def stitch_window(
+    paragraphs: list[str], window: list[str], core_end: int, covered: int, is_last: bool
+) -> int:
+    """
+    Appends paragraphs of one window that are owned by its core range, see stitch_paragraphs().
 
-    if chunk_segments:
-        chunks.append(chunk_segments)
+    Returns:
+        The largest marker covered by paragraphs after the window is stitched.
+    """
+    pending: list[str] | None = None
+    for paragraph in window:
+        markers = [int(marker) for marker in MARKER.findall(paragraph)]
+        if not markers:
+            if pending is not None:
+                pending.append(paragraph)
+            continue
 
-    return [render(chunk) for chunk in chunks]
+        if max(markers) <= covered:
+            pending = None
+            continue
 
+        if min(markers) <= covered:
+            # the paragraph starts in segments already kept, only the rest of it is new
+            paragraph = cut_covered(paragraph, covered)
+            markers = [marker for marker in markers if marker > covered]
+            pending = []
 
-def get_paragraphs(
-    text: str,
+        if min(markers) > core_end and not is_last:
+            break
+
+        paragraphs.extend(pending or [])
+        paragraphs.append(paragraph)
+        covered = max(markers)
+        pending = []
+
+    if is_last and pending:
+        paragraphs.extend(pending)
+
+    return covered
+
+
+def cut_covered(paragraph: str, covered: int) -> str:
+    """Drops the text of a paragraph up to and including the last marker not after `covered`."""
+    end = 0
+    for match in MARKER.finditer(paragraph):
+        if int(match.group(1)) <= covered:
+            end = match.end()
+    return paragraph[end:].lstrip()
+
+
+def stitch_paragraphs(windows: list[list[str]], core_ends: list[int]) -> list[str]:
+    """
+    Merges paragraphs rewritten from overlapping windows of a transcript into one list.
+
+    Windows are processed in order. A paragraph is kept by the window whose core range owns its first marker
+    that isn't covered by previously kept paragraphs yet, and the covered segments at its start are cut off,
+    so every marker ends up in exactly one paragraph. Paragraphs without markers are kept only when they sit
+    between two kept paragraphs of the same window.
+
+    Args:
+        windows: Paragraphs returned for every window, with absolute markers.
+        core_ends: The last marker of the core range of every window.
+
+    Returns:
+        The stitched list of paragraphs.
+    """
+    paragraphs: list[str] = []
+    covered = -1
+    for i, (window, core_end) in enumerate(zip(windows, core_ends)):
+        covered = stitch_window(paragraphs, window, core_end, covered, i == len(windows) - 1)
+
+    return paragraphs
+
+
+def shift_markers(text: str, offset: int) -> str:
+    """Adds offset to every marker in text: shift_markers("a【0】b【1】", 5) == "a【5】b【6】"."""
+    if not offset:
+        return text
+    return MARKER.sub(lambda match: f"【{int(match.group(1)) + offset}】", text)
+
+
+def render_range(
+    texts: Sequence[str], markers: Sequence[int], start: int, stop: int, base_marker: int = 0
+) -> str:
+    """Renders segments texts[start:stop] with their markers relative to base_marker."""
+    return "".join(f"{texts[i]}【{markers[i] - base_marker}】" for i in range(start, stop))
+
+
+def count_segment_tokens(
+    texts: Sequence[str],
+    markers: Sequence[int],
+    token_count_fn: Callable[[Sequence[str]], list[int]],
+    batch_size: int = 512,
+) -> list[int]:
+    """Counts tokens of every rendered segment, rendering at most batch_size segments at a time."""
+    token_counts: list[int] = []
+    for start in range(0, len(texts), batch_size):
+        stop = min(start + batch_size, len(texts))
+        token_counts += token_count_fn(
+            [f"{texts[i]}【{markers[i]}】" for i in range(start, stop)]
+        )
+    return token_counts
+
+
+def terms(text: str) -> list[str]:
+    return re.findall(r"\w+", remove_markers(text).lower())
+
+
+def relevance_scores(query: str, texts: Sequence[str]) -> list[float]:
+    """Scores texts by the overlap of their terms with query terms, rare terms weigh more."""
+    query_terms = set(terms(query))
+    text_terms = [set(terms(text)) & query_terms for text in texts]
+    document_frequency = {term: sum(term in found for found in text_terms) for term in query_terms}
+    idf = {
+        term: math.log(1 + len(texts) / count) for term, count in document_frequency.items() if count
+    }
+    return [sum(idf[term] for term in found) for found in text_terms]
+
+
+def pack(token_counts: Sequence[int], priorities: Sequence[tuple[float, float]], budget: int) -> list[int]:
+    """
+    Greedily picks items by descending priority while they fit into budget tokens.
+
+    Items that don't fit are skipped, so smaller items with lower priority can still fill up the budget.
+
+    Returns:
+        Indexes of the picked items in ascending order.
+    """
+    picked = []
+    used = 0
+    for i in sorted(range(len(token_counts)), key=lambda i: priorities[i], reverse=True):
+        if used + token_counts[i] <= budget:
+            picked.append(i)
+            used += token_counts[i]
+    return sorted(picked)
+
+
+def _range_rewriter(
+    texts: Sequence[str],
+    markers: Sequence[int],
     llm: LanguageModel,
     max_tokens: int,
     temperature: float,
-    chunk_size: int,
-    lang: str | None = None,
-) -> list[str]:
-    if not lang:
-        lang = "en"
+    lang: str,
+    checkpoints: Checkpoints | None = None,
+) -> Callable[[int, int], list[str]]:
+    """Returns a function that rewrites segments [start, stop) into paragraphs with absolute markers."""
+    examples, namespace = _rewrite_request(llm, max_tokens, temperature, lang)
 
+    def rewrite(start: int, stop: int) -> list[str]:
+        base_marker = min(markers[start:stop])
+        content = render_range(texts, markers, start, stop, base_marker)
+
+        key = Checkpoints.key(namespace, content)
+        paragraphs = checkpoints.get(key) if checkpoints is not None else None
+        if paragraphs is None:
+            paragraphs = llm.get_paragraphs(
+                content, examples, max_tokens=max_tokens, temperature=temperature, lang=lang,
+            )
+            if checkpoints is not None:
+                checkpoints.put(key, paragraphs)
+
+        # we are not parsing again, because sometimes model returns paragraphs without trailing marker
+        return [shift_markers(paragraph, base_marker) for paragraph in paragraphs]
+
+    return rewrite
+
+
+def _rewrite_request(
+    llm: LanguageModel | AsyncLanguageModel, max_tokens: int, temperature: float, lang: str
+) -> tuple[dict[str, list[str]], str]:
+    """Returns rewrite examples and checkpoint namespace for the chunks rewritten with these settings."""
     examples = {
         str(example["input"]): list(example["output"]) for example in rewrite_examples[lang]
     }
-    tail = ""
-    paragraphs = []
-    chunks = chunk_text(text, chunk_size, llm.count_tokens)
-    with tqdm(total=len(chunks), initial=0) as pbar:
-        pbar.update(0)
-        for i, chunk in enumerate(chunks):
-            chunk = tail + chunk
+    # everything besides the chunk text that determines the response
+    namespace = Checkpoints.key(
+        getattr(llm, "model", type(llm).__name__),
+        getattr(llm, "prompt_version", ""),
+        lang,
+        str(max_tokens),
+        str(temperature),
+        json.dumps(examples),
+    )
+    return examples, namespace
 
-            base_marker = sorted(parse(chunk).keys())[0]
-            content = render(
-                {marker - base_marker: text for marker, text in parse(chunk).items()}
+
+def _async_range_rewriter(
+    texts: Sequence[str],
+    markers: Sequence[int],
+    llm: AsyncLanguageModel,
+    max_tokens: int,
+    temperature: float,
+    lang: str,
+    checkpoints: Checkpoints | None = None,
+) -> Callable[[int, int], Awaitable[list[str]]]:
+    """Async counterpart of _range_rewriter()."""
+    examples, namespace = _rewrite_request(llm, max_tokens, temperature, lang)
+
+    async def rewrite(start: int, stop: int) -> list[str]:
+        base_marker = min(markers[start:stop])
+        content = render_range(texts, markers, start, stop, base_marker)
+
+        key = Checkpoints.key(namespace, content)
+        paragraphs = checkpoints.get(key) if checkpoints is not None else None
+        if paragraphs is None:
+            paragraphs = await llm.get_paragraphs(
+                content, examples, max_tokens=max_tokens, temperature=temperature, lang=lang,
             )
+            if checkpoints is not None:
+                checkpoints.put(key, paragraphs)
+
+        return [shift_markers(paragraph, base_marker) for paragraph in paragraphs]
+
+    return rewrite
+
+
+def _trim_tail(
+    paragraphs: list[str], markers: Sequence[int], window_start: int, stop: int, is_last: bool, added: int
+) -> int:
+    """
+    Drops the unfinished last paragraph of a sequentially rewritten window, whose `added` paragraphs
+    are at the end of paragraphs. Paragraphs of earlier windows are never dropped.
+
+    Returns the index of the first segment the next window should start with: the first one after
+    the last kept marker, whose segment is already in the last kept paragraph.
+    """
+    if not is_last and added:
+        kept = len(paragraphs) - added
+        paragraphs.pop()
+        # discard paragraphs without markers
+        while len(paragraphs) > kept and not MARKER.search(paragraphs[-1]):
+            paragraphs.pop()
+
+    tail_start = window_start
+    if len(paragraphs) > 1:
+        # we are not parsing, because sometimes model returns paragraphs without trailing marker
+        last_markers = [int(marker) for marker in MARKER.findall(paragraphs[-1])]
+        if last_markers:
+            last_marker = max(last_markers)
+            tail_start = next(
+                (j for j in range(window_start, stop) if markers[j] > last_marker), stop
+            )
+    return tail_start
+
+
+def _rewrite_sequential(
+    markers: Sequence[int],
+    bounds: list[tuple[int, int]],
+    rewrite: Callable[[int, int], list[str]],
+) -> Generator[IndexProgress | IndexParagraphs, None, list[str]]:
+    paragraphs: list[str] = []
+    emitted = 0
+    tail_start: int | None = None
+    with tqdm(total=len(bounds), initial=0) as pbar:
+        pbar.update(0)
+        for i, (start, stop) in enumerate(bounds):
+            # the window starts with the tail of the previous chunk the model hasn't finished
+            window_start = start if tail_start is None else tail_start
 
             # limit the number of output tokens to chunk size
-            for paragraph in llm.get_paragraphs(
-                content, examples, max_tokens=max_tokens, temperature=temperature, lang=lang,
-            ):
-                # we are not parsing again, because sometimes model returns paragraphs without trailing marker
-                paragraphs.append(
-                    re.sub(
-                        r"【(\d+)】",
-                        lambda match: f"【{int(match.group(1)) + base_marker}】",
-                        paragraph,
-                    )
-                )
-
-            if i < len(chunks) - 1 and paragraphs:
-                paragraphs.pop()
-                # discard paragraphs without markers
-                while paragraphs and not re.findall(r"【(\d+)】", paragraphs[-1]):
-                    paragraphs.pop()
-
-            if len(paragraphs) > 1:
-                # we are not parsing, because sometimes model returns paragraphs without trailing marker
-                markers = sorted(
-                    [int(marker) for marker in re.findall(r"【(\d+)】", paragraphs[-1])]
-                )
-                if markers:
-                    last_marker = markers[-1]
-                    tail = render(
-                        {
-                            marker: text
-                            for marker, text in parse(chunk).items()
-                            if marker >= last_marker
-                        }
-                    )
-                else:
-                    tail = chunk
-            else:
-                tail = chunk
+            added = rewrite(window_start, stop)
+            paragraphs += added
+            is_last = i == len(bounds) - 1
+            tail_start = _trim_tail(paragraphs, markers, window_start, stop, is_last, len(added))
             pbar.update(1)
 
+            # the last paragraph is held back until the next window is rewritten, in case it's trimmed
+            final = len(paragraphs) if is_last else len(paragraphs) - 1
+            if final > emitted:
+                yield IndexParagraphs(paragraphs=paragraphs[emitted:final])
+                emitted = final
+            yield IndexProgress(done=i + 1, total=len(bounds))
+
     return paragraphs
 
 
-def index(
+def _rewrite_parallel(
+    markers: Sequence[int],
+    bounds: list[tuple[int, int]],
+    rewrite: Callable[[int, int], list[str]],
+    concurrency: int,
+    overlap: int,
+) -> Generator[IndexProgress | IndexParagraphs, None, list[str]]:
+    core_ends = [max(markers[start:stop]) for start, stop in bounds]
+    paragraphs: list[str] = []
+    covered = -1
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(
+                rewrite, max(start - overlap, 0), min(stop + overlap, len(markers))
+            ): i
+            for i, (start, stop) in enumerate(bounds)
+        }
+        windows: dict[int, list[str]] = {}
+        stitched = 0
+        with tqdm(total=len(futures), initial=0) as pbar:
+            for done, future in enumerate(as_completed(futures), start=1):
+                windows[futures[future]] = future.result()
+                pbar.update(1)
+
+                # windows are stitched in order, as soon as all preceding ones are done
+                emitted = len(paragraphs)
+                while stitched in windows:
+                    is_last = stitched == len(bounds) - 1
+                    covered = stitch_window(
+                        paragraphs, windows.pop(stitched), core_ends[stitched], covered, is_last
+                    )
+                    stitched += 1
+
+                if len(paragraphs) > emitted:
+                    yield IndexParagraphs(paragraphs=paragraphs[emitted:])
+                yield IndexProgress(done=done, total=len(bounds))
+
+    return paragraphs
+
+
+def iter_rewrite_segments(
+    texts: Sequence[str],
+    markers: Sequence[int],
+    llm: LanguageModel,
+    max_tokens: int,
+    temperature: float,
+    chunk_size: int,
+    lang: str | None = None,
+    concurrency: int = 1,
+    overlap: int = 16,
+    checkpoints: Checkpoints | None = None,
+) -> Generator[IndexProgress | IndexParagraphs, None, list[str]]:
+    """
+    Rewrites transcript segments into paragraphs without rendering the whole transcript.
+
+    Segments are addressed by integer index ranges, and the text of a chunk is rendered only when it is sent
+    to the model. Markers are expected to be in ascending order.
+
+    Args:
+        texts: Text of every segment.
+        markers: Marker of every segment.
+        llm: Language model used to rewrite chunks.
+        max_tokens: Maximum number of output tokens per chunk.
+        temperature: Sampling temperature.
+        chunk_size: The desired maximum size of each chunk, in terms of the number of tokens.
+        lang: Content language, "en" by default.
+        concurrency: Number of chunks rewritten at once. With concurrency > 1 chunks are extended by
+            `overlap` segments on both sides and stitched by marker ranges (see stitch_paragraphs),
+            otherwise every chunk is prefixed with the unfinished tail of the previous one.
+        overlap: Number of segments shared by neighbouring chunks in concurrent mode.
+        checkpoints: Where to store the response for every chunk. Chunks found there are not sent to the model
+            again, which lets an interrupted job resume.
+
+    Yields:
+        IndexParagraphs with new paragraphs as soon as they are final, and IndexProgress after every chunk.
+
+    Returns:
+        A list of paragraphs with markers.
+    """
+    if not lang:
+        lang = "en"
+
+    token_counts = count_segment_tokens(
+        texts, markers, lambda segments: llm.count_tokens_many(segments, lang=lang)
+    )
+    bounds = chunk_bounds(token_counts, chunk_size)
+    rewrite = _range_rewriter(texts, markers, llm, max_tokens, temperature, lang, checkpoints)
+
+    if concurrency > 1:
+        return (yield from _rewrite_parallel(markers, bounds, rewrite, concurrency, overlap))
+    return (yield from _rewrite_sequential(markers, bounds, rewrite))
+
+
+def rewrite_segments(
+    texts: Sequence[str],
+    markers: Sequence[int],
+    llm: LanguageModel,
+    max_tokens: int,
+    temperature: float,
+    chunk_size: int,
+    lang: str | None = None,
+    concurrency: int = 1,
+    overlap: int = 16,
+    checkpoints: Checkpoints | None = None,
+) -> list[str]:
+    """Rewrites transcript segments into paragraphs, see iter_rewrite_segments()."""
+    return drain(
+        iter_rewrite_segments(
+            texts,
+            markers,
+            llm,
+            max_tokens,
+            temperature,
+            chunk_size,
+            lang,
+            concurrency,
+            overlap,
+            checkpoints,
+        )
+    )
+
+
+async def _rewrite_sequential_async(
+    markers: Sequence[int],
+    bounds: list[tuple[int, int]],
+    rewrite: Callable[[int, int], Awaitable[list[str]]],
+) -> AsyncGenerator[IndexProgress | IndexParagraphs, None]:
+    paragraphs: list[str] = []
+    emitted = 0
+    tail_start: int | None = None
+    for i, (start, stop) in enumerate(bounds):
+        window_start = start if tail_start is None else tail_start
+        added = await rewrite(window_start, stop)
+        paragraphs += added
+        is_last = i == len(bounds) - 1
+        tail_start = _trim_tail(paragraphs, markers, window_start, stop, is_last, len(added))
+
+        # the last paragraph is held back until the next window is rewritten, in case it's trimmed
+        final = len(paragraphs) if is_last else len(paragraphs) - 1
+        if final > emitted:
+            yield IndexParagraphs(paragraphs=paragraphs[emitted:final])
+            emitted = final
+        yield IndexProgress(done=i + 1, total=len(bounds))
+
+
+async def _rewrite_parallel_async(
+    markers: Sequence[int],
+    bounds: list[tuple[int, int]],
+    rewrite: Callable[[int, int], Awaitable[list[str]]],
+    concurrency: int,
+    overlap: int,
+) -> AsyncGenerator[IndexProgress | IndexParagraphs, None]:
+    core_ends = [max(markers[start:stop]) for start, stop in bounds]
+    limit = asyncio.Semaphore(concurrency)
+
+    async def rewrite_window(i: int, start: int, stop: int) -> tuple[int, list[str]]:
+        async with limit:
+            return i, await rewrite(max(start - overlap, 0), min(stop + overlap, len(markers)))
+
+    tasks = [asyncio.ensure_future(rewrite_window(i, start, stop)) for i, (start, stop) in enumerate(bounds)]
+    paragraphs: list[str] = []
+    covered = -1
+    windows: dict[int, list[str]] = {}
+    stitched = 0
+    try:
+        for done, next_window in enumerate(asyncio.as_completed(tasks), start=1):
+            i, window = await next_window
+            windows[i] = window
+
+            # windows are stitched in order, as soon as all preceding ones are done
+            emitted = len(paragraphs)
+            while stitched in windows:
+                is_last = stitched == len(bounds) - 1
+                covered = stitch_window(paragraphs, windows.pop(stitched), core_ends[stitched], covered, is_last)
+                stitched += 1
+
+            if len(paragraphs) > emitted:
+                yield IndexParagraphs(paragraphs=paragraphs[emitted:])
+            yield IndexProgress(done=done, total=len(bounds))
+    finally:
+        # a consumer that stops early doesn't leave windows being rewritten
+        for task in tasks:
+            task.cancel()
+
+
+def iter_rewrite_segments_async(
+    texts: Sequence[str],
+    markers: Sequence[int],
+    llm: AsyncLanguageModel,
+    max_tokens: int,
+    temperature: float,
+    chunk_size: int,
+    lang: str | None = None,
+    concurrency: int = 1,
+    overlap: int = 16,
+    checkpoints: Checkpoints | None = None,
+) -> AsyncGenerator[IndexProgress | IndexParagraphs, None]:
+    """
+    Async counterpart of iter_rewrite_segments(), chunks are rewritten as coroutines on the running loop.
+
+    Yields the same events. An async generator can't return a value, paragraphs are the concatenation
+    of all IndexParagraphs.
+    """
+    if not lang:
+        lang = "en"
+
+    token_counts = count_segment_tokens(
+        texts, markers, lambda segments: llm.count_tokens_many(segments, lang=lang)
+    )
+    bounds = chunk_bounds(token_counts, chunk_size)
+    rewrite = _async_range_rewriter(texts, markers, llm, max_tokens, temperature, lang, checkpoints)
+
+    if concurrency > 1:
+        return _rewrite_parallel_async(markers, bounds, rewrite, concurrency, overlap)
+    return _rewrite_sequential_async(markers, bounds, rewrite)
+
+
+async def rewrite_segments_async(
+    texts: Sequence[str],
+    markers: Sequence[int],
+    llm: AsyncLanguageModel,
+    max_tokens: int,
+    temperature: float,
+    chunk_size: int,
+    lang: str | None = None,
+    concurrency: int = 1,
+    overlap: int = 16,
+    checkpoints: Checkpoints | None = None,
+) -> list[str]:
+    """Async counterpart of rewrite_segments(), see iter_rewrite_segments_async()."""
+    paragraphs: list[str] = []
+    async for event in iter_rewrite_segments_async(
+        texts, markers, llm, max_tokens, temperature, chunk_size, lang, concurrency, overlap, checkpoints
+    ):
+        if event.type == "paragraphs":
+            paragraphs += event.paragraphs
+    return paragraphs
+
+
+def paragraph_windows(
+    paragraphs: list[str], llm: LanguageModel | AsyncLanguageModel, window_tokens: int, lang: str | None = None
+) -> list[list[str]]:
+    """Splits paragraphs into consecutive windows of at most window_tokens tokens."""
+    token_counts = llm.count_tokens_many(paragraphs, lang=lang)
+    return [paragraphs[start:stop] for start, stop in chunk_bounds(token_counts, window_tokens)]
+
+
+def _reduce_windows(
+    items: list[str], windows: list[list[str]], llm: LanguageModel | AsyncLanguageModel, window_tokens: int, lang: str | None
+) -> list[list[str]]:
+    """Windows over partial results of the previous level, guaranteed to be fewer than `windows`."""
+    reduced = paragraph_windows(items, llm, window_tokens, lang)
+    if len(reduced) >= len(windows):
+        # partial results are too long to shrink by tokens, merge them pairwise
+        reduced = [items[i : i + 2] for i in range(0, len(items), 2)]
+    return reduced
+
+
+def get_meta_map_reduce(
+    paragraphs: list[str],
+    llm: LanguageModel,
+    window_tokens: int = 100_000,
+    concurrency: int = 4,
+    lang: str | None = None,
+) -> tuple[str, str]:
+    """
+    Comes up with title and summary for paragraphs of any length.
+
+    Paragraphs that fit into window_tokens are sent to the model at once. Otherwise every window is summarized
+    separately (map), and the titles and summaries of the windows are summarized again (reduce) until
+    they fit into one window, so the number of levels grows logarithmically with the length of the content.
+    """
+    windows = paragraph_windows(paragraphs, llm, window_tokens, lang)
+    while len(windows) > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            partial = list(executor.map(lambda window: llm.get_meta(window, lang=lang), windows))
+        items = [f"{title}\n{summary}" for title, summary in partial]
+        windows = _reduce_windows(items, windows, llm, window_tokens, lang)
+
+    return llm.get_meta(windows[0], lang=lang)
+
+
+def get_chapters_map_reduce(
+    paragraphs: list[str],
+    llm: LanguageModel,
+    window_tokens: int = 100_000,
+    concurrency: int = 4,
+    lang: str | None = None,
+) -> dict[int, str]:
+    """
+    Comes up with chapters for paragraphs of any length.
+
+    Paragraphs that fit into window_tokens are sent to the model at once. Otherwise chapters are found in every
+    window separately (map), and then chosen from the titles of those chapters with their markers (reduce),
+    recursively. Markers are absolute, so chapters found at any level point into the original paragraphs.
+    """
+    windows = paragraph_windows(paragraphs, llm, window_tokens, lang)
+    if len(windows) == 1:
+        return llm.get_chapters(paragraphs, lang=lang)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        partial = list(executor.map(lambda window: llm.get_chapters(window, lang=lang), windows))
+    chapters = dict(sorted(chapter for chapters in partial for chapter in chapters.items()))
+    if len(chapters) >= len(paragraphs):
+        return chapters
+
+    passages = [f"{title}【{marker}】" for marker, title in chapters.items()]
+    reduced = get_chapters_map_reduce(passages, llm, window_tokens, concurrency, lang)
+    # the reduce pass may only pick among the chapters found by the map pass
+    reduced = {marker: title for marker, title in reduced.items() if marker in chapters}
+    return reduced or chapters
+
+
+async def get_meta_map_reduce_async(
+    paragraphs: list[str],
+    llm: AsyncLanguageModel,
+    window_tokens: int = 100_000,
+    lang: str | None = None,
+) -> tuple[str, str]:
+    """Async counterpart of get_meta_map_reduce(), windows are summarized concurrently."""
+    windows = paragraph_windows(paragraphs, llm, window_tokens, lang)
+    while len(windows) > 1:
+        partial = await asyncio.gather(*(llm.get_meta(window, lang=lang) for window in windows))
+        items = [f"{title}\n{summary}" for title, summary in partial]
+        windows = _reduce_windows(items, windows, llm, window_tokens, lang)
+
+    return await llm.get_meta(windows[0], lang=lang)
+
+
+async def get_chapters_map_reduce_async(
+    paragraphs: list[str],
+    llm: AsyncLanguageModel,
+    window_tokens: int = 100_000,
+    lang: str | None = None,
+) -> dict[int, str]:
+    """Async counterpart of get_chapters_map_reduce()."""
+    windows = paragraph_windows(paragraphs, llm, window_tokens, lang)
+    if len(windows) == 1:
+        return await llm.get_chapters(paragraphs, lang=lang)
+
+    partial = await asyncio.gather(*(llm.get_chapters(window, lang=lang) for window in windows))
+    chapters = dict(sorted(chapter for chapters in partial for chapter in chapters.items()))
+    if len(chapters) >= len(paragraphs):
+        return chapters
+
+    passages = [f"{title}【{marker}】" for marker, title in chapters.items()]
+    reduced = await get_chapters_map_reduce_async(passages, llm, window_tokens, lang)
+    reduced = {marker: title for marker, title in reduced.items() if marker in chapters}
+    return reduced or chapters
+
+
+def drain(generator: Generator[object, None, T]) -> T:
+    """Exhausts generator and returns its return value."""
+    while True:
+        try:
+            next(generator)
+        except StopIteration as stop:
+            return stop.value
+
+
+def get_paragraphs(
+    text: str,
+    llm: LanguageModel,
+    max_tokens: int,
+    temperature: float,
+    chunk_size: int,
+    lang: str | None = None,
+    concurrency: int = 1,
+    overlap: int = 16,
+    checkpoints: Checkpoints | None = None,
+) -> list[str]:
+    segments = parse(text)
+    return rewrite_segments(
+        list(segments.values()),
+        list(segments.keys()),
+        llm,
+        max_tokens,
+        temperature,
+        chunk_size,
+        lang=lang,
+        concurrency=concurrency,
+        overlap=overlap,
+        checkpoints=checkpoints,
+    )
+
+
+def iter_paragraphs_from_events(
+    transcript: list[SpeechEvent],
+    llm: LanguageModel,
+    max_tokens: int,
+    temperature: float,
+    chunk_size: int,
+    lang: str | None = None,
+    concurrency: int = 1,
+    overlap: int = 16,
+    checkpoints: Checkpoints | None = None,
+) -> Generator[IndexProgress | IndexParagraphs, None, list[str]]:
+    if not transcript:
+        raise ValueError("Transcript cannot be empty.")
+
+    return (
+        yield from iter_rewrite_segments(
+            [event.text for event in transcript],
+            range(len(transcript)),
+            llm,
+            max_tokens,
+            temperature,
+            chunk_size,
+            lang=lang,
+            concurrency=concurrency,
+            overlap=overlap,
+            checkpoints=checkpoints,
+        )
+    )
+
+
+def get_paragraphs_from_events(
+    transcript: list[SpeechEvent],
+    llm: LanguageModel,
+    max_tokens: int,
+    temperature: float,
+    chunk_size: int,
+    lang: str | None = None,
+    concurrency: int = 1,
+    overlap: int = 16,
+    checkpoints: Checkpoints | None = None,
+) -> list[str]:
+    return drain(
+        iter_paragraphs_from_events(
+            transcript,
+            llm,
+            max_tokens,
+            temperature,
+            chunk_size,
+            lang,
+            concurrency,
+            overlap,
+            checkpoints,
+        )
+    )
+
+
+def index_stream(
     transcript: list[SpeechEvent],
     llm: LanguageModel,
     max_tokens: int = 4096,
     temperature: float = 0.5,
     chunk_size: int = 2048,
     lang: str | None = None,
-) -> Content:
-    text = render({i: event.text for i, event in enumerate(transcript)})
-    paragraphs = get_paragraphs(text, llm, max_tokens, temperature, chunk_size, lang=lang)
+    concurrency: int = 1,
+    meta_timeout: float | None = 600,
+    chapters_timeout: float | None = 600,
+    checkpoints: Checkpoints | None = None,
+    meta_window_tokens: int = 100_000,
+) -> Generator[IndexEvent, None, Content]:
+    """
+    Indexes transcript like index(), yielding results as soon as they are available.
 
+    Yields:
+        IndexParagraphs with new paragraphs (absolute markers) and IndexProgress as chunks are rewritten,
+        then IndexMeta and IndexChapters, and finally IndexDone with the assembled Content.
+
+    Returns:
+        The same Content as in IndexDone.
+    """
+    paragraphs = yield from iter_paragraphs_from_events(
+        transcript,
+        llm,
+        max_tokens,
+        temperature,
+        chunk_size,
+        lang=lang,
+        concurrency=concurrency,
+        checkpoints=checkpoints,
+    )
+
+    # title/summary and chapters are independent requests over the same paragraphs
+    executor = ThreadPoolExecutor(max_workers=2)
     try:
-        title, summary = llm.get_meta(paragraphs, lang=lang)
-    except Exception:
-        title, summary = "Missing Title", "Missing Summary"
-    
-    try:
-        chapters = llm.get_chapters(paragraphs, lang=lang)
-    except Exception:
-        chapters = {0: "All Content"}
+        meta_future = executor.submit(
+            get_meta_map_reduce, paragraphs, llm, meta_window_tokens, lang=lang
+        )
+        chapters_future = executor.submit(
+            get_chapters_map_reduce, paragraphs, llm, meta_window_tokens, lang=lang
+        )
+        started = time.monotonic()
+
+        title, summary = result_or_default(
+            meta_future, started, meta_timeout, ("Missing Title", "Missing Summary")
+        )
+        yield IndexMeta(title=title, summary=summary)
+
+        chapters = result_or_default(
+            chapters_future, started, chapters_timeout, {0: "All Content"}
+        )
+        yield IndexChapters(chapters=chapters)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
-    return Content(
+    content = Content(
         title=title,
         summary=summary,
         passages=paragraphs,  # NOTE: we should experiment and settle on passage vs. paragraph
         transcript=transcript,
         chapters=chapters,
+        index=ContentIndex.build(paragraphs, transcript, chapters),
     )
+    yield IndexDone(content=content)
+    return content
+
+
+def index(
+    transcript: list[SpeechEvent],
+    llm: LanguageModel,
+    max_tokens: int = 4096,
+    temperature: float = 0.5,
+    chunk_size: int = 2048,
+    lang: str | None = None,
+    concurrency: int = 1,
+    meta_timeout: float | None = 600,
+    chapters_timeout: float | None = 600,
+    checkpoints: Checkpoints | None = None,
+    meta_window_tokens: int = 100_000,
+) -> Content:
+    """
+    Rewrites transcript into paragraphs and adds title, summary, and chapters.
+
+    Pass checkpoints to store the response for every chunk on disk: if indexing is interrupted,
+    the next call with the same checkpoints only sends the missing chunks to the model.
+
+    Title, summary and chapters of paragraphs longer than meta_window_tokens are produced
+    by map-reduce over windows of that size, see get_meta_map_reduce().
+    """
+    return drain(
+        index_stream(
+            transcript,
+            llm,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            chunk_size=chunk_size,
+            lang=lang,
+            concurrency=concurrency,
+            meta_timeout=meta_timeout,
+            chapters_timeout=chapters_timeout,
+            checkpoints=checkpoints,
+            meta_window_tokens=meta_window_tokens,
+        )
+    )
+
+
+async def index_stream_async(
+    transcript: list[SpeechEvent],
+    llm: AsyncLanguageModel,
+    max_tokens: int = 4096,
+    temperature: float = 0.5,
+    chunk_size: int = 2048,
+    lang: str | None = None,
+    concurrency: int = 1,
+    meta_timeout: float | None = 600,
+    chapters_timeout: float | None = 600,
+    checkpoints: Checkpoints | None = None,
+    meta_window_tokens: int = 100_000,
+) -> AsyncGenerator[IndexEvent, None]:
+    """Async counterpart of index_stream() for an AsyncLanguageModel, yields the same events without threads."""
+    if not transcript:
+        raise ValueError("Transcript cannot be empty.")
+
+    paragraphs: list[str] = []
+    async for event in iter_rewrite_segments_async(
+        [event.text for event in transcript],
+        range(len(transcript)),
+        llm,
+        max_tokens,
+        temperature,
+        chunk_size,
+        lang=lang,
+        concurrency=concurrency,
+        checkpoints=checkpoints,
+    ):
+        if event.type == "paragraphs":
+            paragraphs += event.paragraphs
+        yield event
+
+    # title/summary and chapters are independent requests over the same paragraphs
+    meta_task = asyncio.ensure_future(
+        result_or_default_async(
+            get_meta_map_reduce_async(paragraphs, llm, meta_window_tokens, lang),
+            meta_timeout,
+            ("Missing Title", "Missing Summary"),
+        )
+    )
+    chapters_task = asyncio.ensure_future(
+        result_or_default_async(
+            get_chapters_map_reduce_async(paragraphs, llm, meta_window_tokens, lang),
+            chapters_timeout,
+            {0: "All Content"},
+        )
+    )
+    try:
+        title, summary = await meta_task
+        yield IndexMeta(title=title, summary=summary)
+
+        chapters = await chapters_task
+        yield IndexChapters(chapters=chapters)
+    finally:
+        meta_task.cancel()
+        chapters_task.cancel()
+
+    yield IndexDone(
+        content=Content(
+            title=title,
+            summary=summary,
+            passages=paragraphs,
+            transcript=transcript,
+            chapters=chapters,
+            index=ContentIndex.build(paragraphs, transcript, chapters),
+        )
+    )
+
+
+async def index_async(
+    transcript: list[SpeechEvent],
+    llm: AsyncLanguageModel,
+    max_tokens: int = 4096,
+    temperature: float = 0.5,
+    chunk_size: int = 2048,
+    lang: str | None = None,
+    concurrency: int = 1,
+    meta_timeout: float | None = 600,
+    chapters_timeout: float | None = 600,
+    checkpoints: Checkpoints | None = None,
+    meta_window_tokens: int = 100_000,
+) -> Content:
+    """Async counterpart of index() for an AsyncLanguageModel, runs without threads."""
+    async for event in index_stream_async(
+        transcript,
+        llm,
+        max_tokens,
+        temperature,
+        chunk_size,
+        lang,
+        concurrency,
+        meta_timeout,
+        chapters_timeout,
+        checkpoints,
+        meta_window_tokens,
+    ):
+        if event.type == "done":
+            content = event.content
+    return content
+
+
+def result_or_default(future: Future[T], started: float, timeout: float | None, default: T) -> T:
+    """Waits for future at most `timeout` seconds since `started`, returns default on timeout or error."""
+    remaining = None if timeout is None else max(timeout - (time.monotonic() - started), 0)
+    try:
+        return future.result(timeout=remaining)
+    except Exception:
+        return default
+
+
+async def result_or_default_async(awaitable: Awaitable[T], timeout: float | None, default: T) -> T:
+    """Awaits at most `timeout` seconds, returns default on timeout or error."""
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except Exception:
+        return default
 
 
 rewrite_examples = {
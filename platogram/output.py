@@ -0,0 +1,255 @@
+import html
+import json
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable, Iterator, Literal, Sequence, TextIO
+
+from platogram.types import MARKER, Content, SpeechEvent
+
+# in the order they are written for every content
+SECTIONS = ("images", "origin", "title", "abstract", "passages", "chapters", "references")
+
+
+def format_time(ms):
+    seconds = ms // 1000
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def render_reference(url: str, transcript: list[SpeechEvent], i: int) -> str:
+    link = f" [[{i+1}]](#ts-{i + 1})"
+    return link
+
+
+def render_transcript(first, last, transcript, url):
+    return "\n".join(
+        [
+            f"\n##### {{#ts-{i + 1}}}\n{i-first+1}. [{format_time(event.time_ms)}]({url}#t={event.time_ms // 1000}): {event.text}"
+            for i, event in enumerate(transcript[first : last + 1], start=first)
+        ]
+    )
+
+
+def render_paragraph(p: str, render_reference_fn: Callable[[int], str]) -> str:
+    if "【" not in p:
+        return p
+
+    return MARKER.sub(lambda match: render_reference_fn(int(match.group(1))), p)
+
+
+def chapter_passages(content: Content) -> Iterator[tuple[str | None, str]]:
+    """Yields (title of the chapter starting at the passage or None, passage)."""
+    current_chapter = None
+    for passage, chapter_marker in zip(content.passages, content.get_index().passage_chapters):
+        if chapter_marker != -1 and chapter_marker != current_chapter:
+            current_chapter = chapter_marker
+            yield content.chapters[chapter_marker], passage
+        else:
+            yield None, passage
+
+
+def render_passages(content: Content, chapters: bool = False) -> str:
+    """Renders passages separated by blank lines, with a heading before each chapter if `chapters` is set."""
+    if not chapters:
+        return "\n\n".join(passage.strip() for passage in content.passages)
+
+    passages = []
+    for chapter, passage in chapter_passages(content):
+        if chapter is not None:
+            passages.append(f"### {chapter}\n\n")
+        passages.append(f"{passage.strip()}\n\n")
+    return "".join(passages)
+
+
+def render_chapters(content: Content) -> str:
+    return "\n".join(f"- {chapter} [{i}]" for i, chapter in content.chapters.items())
+
+
+class Writer(ABC):
+    """
+    Writes the answer and the `sections` of every content to `out` as they come, so that
+    output of any number of contents takes one pass and is never held in memory at once.
+
+    Markers of a content resolve against its own transcript, markers of the answer against
+    the first content. With `inline_references` they become links, otherwise they are dropped.
+    """
+
+    def __init__(self, out: TextIO, sections: Sequence[str], inline_references: bool = False):
+        unknown = set(sections) - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown sections: {sorted(unknown)}")
+        self.out = out
+        self.sections = [section for section in SECTIONS if section in sections]
+        self.inline_references = inline_references
+
+    def reference_fn(self, content: Content) -> Callable[[int], str]:
+        if self.inline_references:
+            return lambda i: render_reference(content.origin or "", content.transcript, i)
+        return lambda _: ""
+
+    def begin(self) -> None:
+        pass
+
+    @abstractmethod
+    def answer(self, text: str, content: Content | None) -> None: ...
+
+    @abstractmethod
+    def content(self, content: Content) -> None: ...
+
+    def end(self) -> None:
+        pass
+
+    def write_all(self, contents: Iterable[Content], answer: str | None = None) -> None:
+        """Writes the answer, if any, and contents, which are consumed one at a time."""
+        self.begin()
+        if answer is not None:
+            contents = list(contents)
+            self.answer(answer, contents[0] if contents else None)
+        for content in contents:
+            self.content(content)
+            self.out.flush()
+        self.end()
+
+
+class MarkdownWriter(Writer):
+    def answer(self, text: str, content: Content | None) -> None:
+        text = f"\n\n{text}\n\n"
+        if content is not None:
+            text = render_paragraph(text, self.reference_fn(content))
+        self.out.write(text)
+
+    def content(self, content: Content) -> None:
+        parts = []
+        for section in self.sections:
+            if section == "images" and content.images:
+                parts.append("\n".join(str(image) for image in content.images))
+            elif section == "origin":
+                parts.append(f"{content.origin}")
+            elif section == "title":
+                parts.append(content.title)
+            elif section == "abstract":
+                parts.append(content.summary)
+            elif section == "passages":
+                parts.append(render_passages(content, "chapters" in self.sections))
+            elif section == "chapters" and "passages" not in self.sections:
+                parts.append(render_chapters(content))
+            elif section == "references":
+                parts.append(render_transcript(0, len(content.transcript), content.transcript, content.origin))
+        self.out.write(render_paragraph("".join(f"{part}\n\n\n\n" for part in parts), self.reference_fn(content)))
+
+    def end(self) -> None:
+        self.out.write("\n")
+
+
+class JSONWriter(Writer):
+    """One JSON object {"answer": ..., "contents": [...]}, text fields in markdown."""
+
+    def begin(self) -> None:
+        self.out.write("{")
+        self.first = True
+
+    def answer(self, text: str, content: Content | None) -> None:
+        if content is not None:
+            text = render_paragraph(text, self.reference_fn(content))
+        self.out.write(f'"answer": {json.dumps(text, ensure_ascii=False)}, ')
+
+    def content(self, content: Content) -> None:
+        fn = self.reference_fn(content)
+        value: dict = {}
+        for section in self.sections:
+            if section == "images":
+                value["images"] = content.images or []
+            elif section == "origin":
+                value["origin"] = content.origin
+            elif section == "title":
+                value["title"] = content.title
+            elif section == "abstract":
+                value["abstract"] = render_paragraph(content.summary, fn)
+            elif section == "passages":
+                value["passages"] = [render_paragraph(passage.strip(), fn) for passage in content.passages]
+            elif section == "chapters":
+                value["chapters"] = {str(marker): chapter for marker, chapter in content.chapters.items()}
+            elif section == "references":
+                value["references"] = [
+                    {"marker": i, "time_ms": event.time_ms, "text": event.text}
+                    for i, event in enumerate(content.transcript)
+                ]
+        self.out.write(('"contents": [' if self.first else ", ") + json.dumps(value, ensure_ascii=False))
+        self.first = False
+
+    def end(self) -> None:
+        self.out.write(('"contents": []' if self.first else "]") + "}\n")
+
+
+class HTMLWriter(Writer):
+    """A standalone HTML page, one <article> per content."""
+
+    def reference_fn(self, content: Content) -> Callable[[int], str]:
+        if self.inline_references:
+            return lambda i: f' <a href="#ts-{i + 1}">[{i + 1}]</a>'
+        return lambda _: ""
+
+    def text(self, text: str, fn: Callable[[int], str]) -> str:
+        # markers survive escaping, so links are put in after it
+        return render_paragraph(html.escape(text.strip()), fn)
+
+    def begin(self) -> None:
+        self.out.write('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n</head>\n<body>\n')
+
+    def answer(self, text: str, content: Content | None) -> None:
+        fn = self.reference_fn(content) if content is not None else lambda i: f"【{i}】"
+        paragraphs = "".join(f"<p>{self.text(p, fn)}</p>\n" for p in text.split("\n\n") if p.strip())
+        self.out.write(f"<section>\n{paragraphs}</section>\n")
+
+    def content(self, content: Content) -> None:
+        fn = self.reference_fn(content)
+        parts = ["<article>\n"]
+        for section in self.sections:
+            if section == "images" and content.images:
+                parts.extend(f'<img src="{html.escape(str(image))}">\n' for image in content.images)
+            elif section == "origin" and content.origin:
+                origin = html.escape(content.origin)
+                parts.append(f'<p><a href="{origin}">{origin}</a></p>\n')
+            elif section == "title":
+                parts.append(f"<h1>{html.escape(content.title)}</h1>\n")
+            elif section == "abstract":
+                parts.append(f"<p>{self.text(content.summary, fn)}</p>\n")
+            elif section == "passages":
+                for chapter, passage in chapter_passages(content):
+                    if chapter is not None and "chapters" in self.sections:
+                        parts.append(f"<h3>{html.escape(chapter)}</h3>\n")
+                    parts.append(f"<p>{self.text(passage, fn)}</p>\n")
+            elif section == "chapters" and "passages" not in self.sections:
+                parts.append("<ul>\n")
+                parts.extend(f"<li>{html.escape(chapter)} [{i}]</li>\n" for i, chapter in content.chapters.items())
+                parts.append("</ul>\n")
+            elif section == "references":
+                origin = html.escape(content.origin or "")
+                parts.append("<ol>\n")
+                parts.extend(
+                    f'<li id="ts-{i + 1}"><a href="{origin}#t={event.time_ms // 1000}">'
+                    f"{format_time(event.time_ms)}</a>: {html.escape(event.text)}</li>\n"
+                    for i, event in enumerate(content.transcript)
+                )
+                parts.append("</ol>\n")
+        parts.append("</article>\n")
+        self.out.write("".join(parts))
+
+    def end(self) -> None:
+        self.out.write("</body>\n</html>\n")
+
+
+def get_writer(
+    format: Literal["markdown", "json", "html"],
+    out: TextIO,
+    sections: Sequence[str],
+    inline_references: bool = False,
+) -> Writer:
+    if format == "markdown":
+        return MarkdownWriter(out, sections, inline_references)
+    elif format == "json":
+        return JSONWriter(out, sections, inline_references)
+    elif format == "html":
+        return HTMLWriter(out, sections, inline_references)
+    else:
+        raise ValueError(f"Unsupported format: {format}")
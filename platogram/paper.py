@@ -0,0 +1,265 @@
+import argparse
+import asyncio
+import os
+import re
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from pydantic import BaseModel
+
+import platogram as plato
+from platogram.cache import MetadataCache
+from platogram.llm import AsyncLanguageModel
+from platogram.llm.cache import ResponseCache
+from platogram.output import (
+    render_chapters,
+    render_paragraph,
+    render_passages,
+    render_reference,
+    render_transcript,
+)
+from platogram.pipeline import CACHE_DIR, CONTEXT_BUDGET, process_url_async
+from platogram.types import Assistant, Content, IndexEvent, User
+
+# (prompt, prefill) for every generated section
+SECTIONS = {
+    "en": {
+        "contributors": (
+            'Thoroughly review the <context> and identify the list of contributors. Output as Markdown list: First Name, Last Name, Title, Organization. Output "Unknown" if the contributors are not known. In the end of the list always add "- [Platogram](https://github.com/code-anyway/platogram), Chief of Stuff, Code Anyway, Inc.". Start with "## Contributors, Acknowledgements, Mentions"',
+            "## Contributors, Acknowledgements, Mentions",
+        ),
+        "introduction": (
+            'Thoroughly review the <context> and write "Introduction" chapter for the paper. Write in the style of the original <context>. Use only words from <context>. Use quotes from <context> when necessary. Make sure to include <markers>. Output as Markdown. Start with "## Introduction"',
+            "## Introduction",
+        ),
+        "conclusion": (
+            'Thoroughly review the <context> and write "Conclusion" chapter for the paper. Write in the style of the original <context>. Use only words from <context>. Use quotes from <context> when necessary. Make sure to include <markers>. Output as Markdown. Start with "## Conclusion"',
+            "## Conclusion",
+        ),
+    },
+    "es": {
+        "contributors": (
+            'Revise a fondo el <context> e identifique la lista de contribuyentes. Salida como lista Markdown: Nombre, Apellido, Título, Organización. Salida "Desconocido" si los contribuyentes no se conocen. Al final de la lista, agregue siempre "- [Platogram](https://github.com/code-anyway/platogram), Chief of Stuff, Code Anyway, Inc.". Comience con "## Contribuyentes, Agradecimientos, Menciones"',
+            "## Contribuyentes, Agradecimientos, Menciones",
+        ),
+        "introduction": (
+            'Revise a fondo el <context> y escriba el capítulo "Introducción" para el artículo. Escriba en el estilo del original <context>. Use solo las palabras de <context>. Use comillas del original <context> cuando sea necesario. Asegúrese de incluir <markers>. Salida como Markdown. Comience con "## Introducción"',
+            "## Introducción",
+        ),
+        "conclusion": (
+            'Revise a fondo el <context> y escriba el capítulo "Conclusión" para el artículo. Escriba en el estilo del original <context>. Use solo las palabras de <context>. Use comillas del original <context> cuando sea necesario. Asegúrese de incluir <markers>. Salida como Markdown. Comience con "## Conclusión"',
+            "## Conclusión",
+        ),
+    },
+}
+
+
+class Paper(BaseModel):
+    title: str
+    abstract: str
+    markdown: str
+    markdown_with_references: str
+    files: list[Path]
+
+
+async def generate_sections(
+    content: Content,
+    llm: AsyncLanguageModel,
+    lang: str = "en",
+    context_budget: int | None = CONTEXT_BUDGET,
+) -> dict[str, str]:
+    """
+    Generates contributors, introduction and conclusion, markers are kept as is.
+
+    The first prompt writes the context to the prompt cache, the other two run concurrently
+    after it and read the context from there.
+    """
+
+    async def generate(prompt: str, prefill: str) -> str:
+        response = await llm.prompt(
+            [User(content=prompt), Assistant(content=prefill)],
+            context=[content],
+            context_size="large",
+            lang=lang,
+            budget=context_budget,
+        )
+        return f"{prefill}{response}"
+
+    first, *rest = SECTIONS[lang]
+    responses = [await generate(*SECTIONS[lang][first])]
+    responses += await asyncio.gather(*(generate(*SECTIONS[lang][name]) for name in rest))
+    return dict(zip([first, *rest], responses))
+
+
+def render_paper(content: Content, sections: dict[str, str], references: bool) -> str:
+    """Assembles the paper as markdown, with inline references and the transcript or without them."""
+    if references:
+        render_reference_fn = lambda i: render_reference(content.origin or "", content.transcript, i)  # noqa: E731
+    else:
+        render_reference_fn = lambda _: ""  # noqa: E731
+
+    parts = [
+        f"# {content.title}",
+        f"## Origin\n\n{content.origin}",
+        f"## Abstract\n\n{content.summary}",
+        render_paragraph(sections["contributors"], lambda _: ""),
+        f"## Chapters\n\n{render_chapters(content)}",
+        render_paragraph(sections["introduction"], render_reference_fn),
+        f"## Discussion\n\n{render_paragraph(render_passages(content, chapters=True), render_reference_fn)}",
+        render_paragraph(sections["conclusion"], render_reference_fn),
+    ]
+    if references:
+        transcript = render_transcript(0, len(content.transcript), content.transcript, content.origin)
+        parts.append(f"## References\n\n{transcript.strip()}")
+
+    markdown = "\n\n".join(part.strip() for part in parts) + "\n"
+    if not references:
+        # like audio_to_paper.sh, reference links and [n] are stripped from the whole document
+        markdown = re.sub(r"\[\[(\d+)\]\]\([^)]+\)", "", markdown)
+        markdown = re.sub(r"\[(\d+)\]", "", markdown)
+    return markdown
+
+
+async def pandoc(markdown: str, output: Path, source_format: str = "markdown") -> None:
+    process = await asyncio.create_subprocess_exec(
+        "pandoc",
+        "-o",
+        str(output),
+        "--from",
+        source_format,
+        "--pdf-engine=xelatex",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await process.communicate(markdown.encode())
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        raise RuntimeError(f"pandoc failed to render {output}: {stderr.decode()}")
+
+
+async def make_paper(
+    url: str,
+    output_dir: Path,
+    lang: str | None = None,
+    images: bool = False,
+    pdf: bool = True,
+    library_dir: Path = CACHE_DIR,
+    anthropic_api_key: str | None = None,
+    assemblyai_api_key: str | None = None,
+    llm_cache: ResponseCache | None = None,
+    context_budget: int | None = CONTEXT_BUDGET,
+    on_event: Callable[[IndexEvent], Awaitable[None]] | None = None,
+) -> Paper:
+    """
+    Converts url into a paper in one process: indexes the content (or loads it from the library),
+    generates contributors, introduction and conclusion concurrently and writes the documents to output_dir.
+
+    Indexing runs on an AsyncModel on the running loop, so many conversions can share one process.
+    Indexing events are passed to `on_event` as they come, see process_url_async().
+    Cancelling it stops processing of url at the next model call or step and returns only once
+    processing has stopped.
+
+    Files: "<title>-no-refs.md", and with `pdf` "<title>-no-refs.pdf" and "<title>-refs.pdf" rendered
+    by pandoc, and with `images` "<title>-images.zip".
+    """
+    if not lang:
+        lang = "en"
+
+    if lang not in SECTIONS:
+        raise ValueError(f"Unsupported language: {lang}")
+
+    if pdf and shutil.which("pandoc") is None:
+        raise RuntimeError("pandoc is required to render PDF files")
+
+    anthropic_api_key = anthropic_api_key or os.environ["ANTHROPIC_API_KEY"]
+    assemblyai_api_key = assemblyai_api_key or os.environ.get("ASSEMBLYAI_API_KEY")
+
+    library = plato.library.get_local_dumb(library_dir)
+    content = await process_url_async(
+        url,
+        library,
+        anthropic_api_key,
+        assemblyai_api_key,
+        extract_images=images,
+        lang=lang,
+        llm_cache=llm_cache,
+        on_event=on_event,
+    )
+
+    llm = plato.llm.get_async_model("anthropic/claude-3-5-sonnet", anthropic_api_key, cache=llm_cache)
+    sections = await generate_sections(content, llm, lang, context_budget)
+
+    markdown = render_paper(content, sections, references=False)
+    markdown_with_references = render_paper(content, sections, references=True)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = re.sub(r"[^a-zA-Z0-9]", "_", content.title)
+    files = [output_dir / f"{stem}-no-refs.md"]
+    files[0].write_text(markdown)
+
+    if pdf:
+        files += [output_dir / f"{stem}-no-refs.pdf", output_dir / f"{stem}-refs.pdf"]
+        await asyncio.gather(
+            pandoc(markdown, files[1]),
+            pandoc(markdown_with_references, files[2], "markdown+header_attributes"),
+        )
+
+    if images and content.images:
+        files.append(output_dir / f"{stem}-images.zip")
+        with zipfile.ZipFile(files[-1], "w") as archive:
+            for image in content.images:
+                archive.write(library.home / image, Path(image).name)
+
+    return Paper(
+        title=content.title,
+        abstract=content.summary,
+        markdown=markdown,
+        markdown_with_references=markdown_with_references,
+        files=files,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Platogram: convert audio or video to a paper")
+    parser.add_argument("url", help="URL or file to convert")
+    parser.add_argument("--lang", default="en", help="Content language: en, es")
+    parser.add_argument("--images", action="store_true", help="Extract images and save them as zip")
+    parser.add_argument("--no-pdf", action="store_true", help="Only write markdown, skip pandoc")
+    parser.add_argument("--output-dir", type=Path, default=Path("."), help="Where to write the documents")
+    parser.add_argument("--anthropic-api-key", help="Anthropic API key")
+    parser.add_argument("--assemblyai-api-key", help="AssemblyAI API key (optional)")
+    parser.add_argument("--verbose", action="store_true", help="Print title and abstract")
+    args = parser.parse_args()
+
+    import platogram.ingest as ingest
+
+    ingest.set_metadata_cache(MetadataCache(CACHE_DIR / "metadata-cache.sqlite3"))
+    paper = asyncio.run(
+        make_paper(
+            args.url,
+            args.output_dir,
+            lang=args.lang,
+            images=args.images,
+            pdf=not args.no_pdf,
+            anthropic_api_key=args.anthropic_api_key,
+            assemblyai_api_key=args.assemblyai_api_key,
+            llm_cache=ResponseCache(CACHE_DIR / "llm-cache.sqlite3"),
+        )
+    )
+
+    for file in paper.files:
+        print(file)
+
+    if args.verbose:
+        print(f"<title>\n{paper.title}\n</title>\n\n<abstract>\n{paper.abstract}\n</abstract>")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import asyncio
+import sys
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, TypeVar
+
+import platogram as plato
+from platogram.checkpoint import Checkpoints
+from platogram.library import Library
+from platogram.llm.cache import ResponseCache
+from platogram.types import Content, IndexEvent
+from platogram.utils import make_filesystem_safe
+
+T = TypeVar("T")
+
+CACHE_DIR = Path("./.platogram-cache")
+CONTEXT_BUDGET = 150_000
+# default width of extracted images, JPEG thumbnails legible enough for slides
+IMAGE_WIDTH = 640
+
+
+def process_url(
+    url: str,
+    library: Library,
+    anthropic_api_key: str,
+    assemblyai_api_key: str | None = None,
+    extract_images: bool = False,
+    lang: str | None = None,
+    resume: bool = True,
+    llm_cache: ResponseCache | None = None,
+    position: int | None = None,
+    cancelled: threading.Event | None = None,
+    image_width: int | None = IMAGE_WIDTH,
+    temperature: float = 0.5,
+) -> Content:
+    """
+    Downloads, transcribes and indexes url and saves it to the library, unless it's there already.
+
+    With `cancelled`, the event is checked between steps and indexed chunks, and once it is set
+    CancelledError is raised there, so that a caller running this in a thread can stop it.
+    Images are scaled down to `image_width`, None keeps the video's size. Indexing samples at `temperature`,
+    responses at 0 are cached by `llm_cache` without opting in to any temperature.
+    """
+    if not lang:
+        lang = "en"
+
+    def check_cancelled() -> None:
+        if cancelled is not None and cancelled.is_set():
+            raise CancelledError(f"Processing {url} cancelled")
+
+    id = make_filesystem_safe(url)
+
+    if library.exists(id):
+        return library.get_content(id)
+
+    # imported here so that content already in the library is served without loading
+    # the download, transcription and model clients
+    from tqdm import tqdm
+
+    import platogram.ingest as ingest
+
+    llm = plato.llm.get_model("anthropic/claude-3-5-sonnet", anthropic_api_key, cache=llm_cache)
+    asr = (
+        plato.asr.get_model("assembly-ai/best", assemblyai_api_key)
+        if assemblyai_api_key
+        else None
+    )
+
+    # responses for every chunk, so that an interrupted job can pick up where it left off
+    checkpoints = Checkpoints(library.home / ".checkpoints" / id)
+    if not resume:
+        checkpoints.clear()
+
+    with tqdm(total=4, desc=f"Processing {url}", file=sys.stderr, position=position) as pbar:
+        check_cancelled()
+        transcript = plato.extract_transcript(url, asr, lang=lang)
+        pbar.update(1)
+        pbar.set_description("Indexing content")
+        for event in plato.index_stream(
+            transcript, llm, temperature=temperature, lang=lang, checkpoints=checkpoints
+        ):
+            check_cancelled()
+            if event.type == "progress":
+                pbar.set_description(f"Indexing content ({event.done}/{event.total} chunks)")
+            elif event.type == "done":
+                content = event.content
+        pbar.update(1)
+        if extract_images:
+            check_cancelled()
+            pbar.set_description("Extracting images")
+            images_dir = library.home / id
+            images_dir.mkdir(exist_ok=True)
+            timestamps_ms = content.get_index().times_ms
+            images = ingest.extract_images(url, images_dir, timestamps_ms, width=image_width)
+            content.images = [str(image.relative_to(library.home)) for image in images]
+            pbar.update(1)
+        check_cancelled()
+        pbar.set_description("Saving content")
+        library.put(id, content, lang=lang)
+        checkpoints.clear()
+        pbar.update(1)
+
+    return content
+
+
+async def in_thread(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Runs blocking fn in a worker thread. A thread can't be killed, so cancelling waits for fn
+    to return before CancelledError is raised, and nothing outlives the cancelled call.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.gather(future, return_exceptions=True)
+        raise
+
+
+async def process_url_async(
+    url: str,
+    library: Library,
+    anthropic_api_key: str,
+    assemblyai_api_key: str | None = None,
+    extract_images: bool = False,
+    lang: str | None = None,
+    resume: bool = True,
+    llm_cache: ResponseCache | None = None,
+    image_width: int | None = IMAGE_WIDTH,
+    temperature: float = 0.5,
+    on_event: Callable[[IndexEvent], Awaitable[None]] | None = None,
+) -> Content:
+    """
+    Async counterpart of process_url(), indexing runs on the running loop with an AsyncModel.
+    Events of index_stream_async() are passed to `on_event` as they come, e.g. to show the first
+    paragraphs long before the whole content is indexed.
+
+    Downloads, transcription and images have no async API (yt-dlp, ffmpeg) and run in a worker thread
+    one step at a time. Cancelling stops at the next model call or once the current step returns.
+    """
+    if not lang:
+        lang = "en"
+
+    id = make_filesystem_safe(url)
+
+    if library.exists(id):
+        return library.get_content(id)
+
+    import platogram.ingest as ingest
+
+    llm = plato.llm.get_async_model("anthropic/claude-3-5-sonnet", anthropic_api_key, cache=llm_cache)
+    asr = (
+        plato.asr.get_model("assembly-ai/best", assemblyai_api_key)
+        if assemblyai_api_key
+        else None
+    )
+
+    checkpoints = Checkpoints(library.home / ".checkpoints" / id)
+    if not resume:
+        checkpoints.clear()
+
+    transcript = await in_thread(plato.extract_transcript, url, asr, lang=lang)
+    async for event in plato.index_stream_async(
+        transcript, llm, temperature=temperature, lang=lang, checkpoints=checkpoints
+    ):
+        if on_event is not None:
+            await on_event(event)
+        if event.type == "done":
+            content = event.content
+    if extract_images:
+        images_dir = library.home / id
+        images_dir.mkdir(exist_ok=True)
+        timestamps_ms = content.get_index().times_ms
+        images = await in_thread(ingest.extract_images, url, images_dir, timestamps_ms, width=image_width)
+        content.images = [str(image.relative_to(library.home)) for image in images]
+
+    library.put(id, content, lang=lang)
+    checkpoints.clear()
+
+    return content
+
+
+def process_urls(
+    urls: list[str],
+    library: Library,
+    anthropic_api_key: str,
+    assemblyai_api_key: str | None = None,
+    jobs: int = 1,
+    **kwargs,
+) -> list[Content | Exception]:
+    """
+    Runs process_url() for every url with up to `jobs` urls at once.
+
+    Returns results in the order of urls. A url that fails gets its exception in place of content
+    instead of aborting the rest.
+    """
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = [
+            executor.submit(
+                process_url,
+                url,
+                library,
+                anthropic_api_key,
+                assemblyai_api_key,
+                position=i if jobs > 1 else None,
+                **kwargs,
+            )
+            for i, url in enumerate(urls)
+        ]
+
+        results: list[Content | Exception] = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
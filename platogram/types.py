@@ -1,7 +1,11 @@
+import re
+from bisect import bisect_right
 from typing import Literal
 
 from pydantic import BaseModel
 
+MARKER = re.compile(r"【(\d+)】")
+
 
 class User(BaseModel):
     role: Literal["user"] = "user"
@@ -19,6 +23,61 @@ class SpeechEvent(BaseModel):
     speaker: str | None = None
 
 
+class ContentIndex(BaseModel):
+    """
+    Lookup arrays of a content, so that references resolve in O(1) or O(log n) instead of scans.
+    Markers are positions in the transcript. -1 stands for "none".
+
+    The index is derived from passages, transcript and chapters and has to be rebuilt when they change.
+    """
+
+    times_ms: list[int]  # marker -> time of its transcript event
+    marker_passages: list[int]  # marker -> passage that refers to it, or to the closest marker before it
+    passage_chapters: list[int]  # passage -> marker of its chapter, by the first marker of the passage
+    chapter_markers: list[int]  # sorted
+
+    @classmethod
+    def build(
+        cls, passages: list[str], transcript: list[SpeechEvent], chapters: dict[int, str]
+    ) -> "ContentIndex":
+        chapter_markers = sorted(chapters)
+        index = cls(
+            times_ms=[event.time_ms for event in transcript],
+            marker_passages=[-1] * len(transcript),
+            passage_chapters=[],
+            chapter_markers=chapter_markers,
+        )
+
+        for i, passage in enumerate(passages):
+            markers = [int(marker) for marker in MARKER.findall(passage)]
+            index.passage_chapters.append(index.chapter_of(markers[0]) if markers else -1)
+            for marker in markers:
+                if 0 <= marker < len(transcript) and index.marker_passages[marker] == -1:
+                    index.marker_passages[marker] = i
+
+        previous = -1
+        for marker, passage in enumerate(index.marker_passages):
+            if passage == -1:
+                index.marker_passages[marker] = previous
+            previous = index.marker_passages[marker]
+        return index
+
+    def time_ms(self, marker: int) -> int:
+        return self.times_ms[marker]
+
+    def marker_at(self, time_ms: int) -> int:
+        """Last marker at or before time_ms, -1 if the transcript starts later."""
+        return bisect_right(self.times_ms, time_ms) - 1
+
+    def passage_of(self, marker: int) -> int:
+        return self.marker_passages[marker]
+
+    def chapter_of(self, marker: int) -> int:
+        """Marker of the chapter the marker belongs to, -1 if it precedes all chapters."""
+        i = bisect_right(self.chapter_markers, marker)
+        return self.chapter_markers[i - 1] if i else -1
+
+
 class Content(BaseModel):
     title: str
     summary: str
@@ -27,3 +86,40 @@ class Content(BaseModel):
     transcript: list[SpeechEvent]
     images: list[str] | None = None
     origin: str | None = None
+    index: ContentIndex | None = None
+
+    def get_index(self) -> ContentIndex:
+        """Returns the index, building it if the content doesn't have one yet."""
+        if self.index is None:
+            self.index = ContentIndex.build(self.passages, self.transcript, self.chapters)
+        return self.index
+
+
+class IndexProgress(BaseModel):
+    type: Literal["progress"] = "progress"
+    done: int
+    total: int
+
+
+class IndexParagraphs(BaseModel):
+    type: Literal["paragraphs"] = "paragraphs"
+    paragraphs: list[str]
+
+
+class IndexMeta(BaseModel):
+    type: Literal["meta"] = "meta"
+    title: str
+    summary: str
+
+
+class IndexChapters(BaseModel):
+    type: Literal["chapters"] = "chapters"
+    chapters: dict[int, str]
+
+
+class IndexDone(BaseModel):
+    type: Literal["done"] = "done"
+    content: Content
+
+
+IndexEvent = IndexProgress | IndexParagraphs | IndexMeta | IndexChapters | IndexDone
@@ -1,7 +1,13 @@
 import hashlib
+import json
+import os
 import re
 import logging
+import threading
 from datetime import datetime
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 
 logger = logging.getLogger(__name__)
@@ -18,6 +24,18 @@ def make_filesystem_safe(s):
     return s[:255]
 
 
+def write_bytes(file: Path, data: bytes) -> None:
+    """Writes a file atomically: readers see either the old or the new file, never a partial one."""
+    temp_file = file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(temp_file, "wb") as f:
+        f.write(data)
+    os.replace(temp_file, file)
+
+
+def write_json(file: Path, data: Any) -> None:
+    write_bytes(file, json.dumps(data).encode())
+
+
 def get_sha256_hash(data):
     """Generate a sha256 hash for a given data."""
     sha256 = hashlib.sha256()
@@ -57,3 +75,39 @@ def format_time(time_ms: int) -> str:
         return f"{hours}:{minutes:02}:{seconds:02}"
     else:
         return f"{minutes:02}:{seconds:02}"
+
+
+# query parameters that don't change what a URL points to
+TRACKING_PARAMS = {"fbclid", "gclid"}
+# on YouTube also the share id, referrer and start time, metadata is the same for any of them
+YOUTUBE_HOSTS = {"youtube.com", "youtu.be"}
+YOUTUBE_PARAMS = {"si", "feature", "t"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for use as a cache key: lowercase scheme and host without "www.",
+    no fragment, tracking parameters or trailing slash, and query sorted. YouTube links lose
+    "m." and the si, feature and t parameters too, and youtu.be and youtube.com/shorts links
+    become youtube.com/watch?v=ID.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[len("www.") :]
+    if host.startswith("m.") and host[len("m.") :] in YOUTUBE_HOSTS:
+        host = host[len("m.") :]
+    ignored = TRACKING_PARAMS | YOUTUBE_PARAMS if host in YOUTUBE_HOSTS else TRACKING_PARAMS
+    path = parts.path.rstrip("/")
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name not in ignored and not name.startswith("utm_")
+    ]
+
+    if host == "youtu.be" and path:
+        host, query, path = "youtube.com", [("v", path.lstrip("/"))] + query, "/watch"
+    elif host == "youtube.com" and path.startswith("/shorts/"):
+        query, path = [("v", path.split("/")[2])] + query, "/watch"
+
+    return urlunsplit((parts.scheme.lower(), host, path, urlencode(sorted(query)), ""))
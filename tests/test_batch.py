@@ -0,0 +1,134 @@
+import re
+from pathlib import Path
+
+import pytest
+
+from platogram.batch import BatchIndexer, BatchRequest, LocalBatchBackend
+from platogram.llm.anthropic import PromptBuilder
+from platogram.llm.tokenizer import TokenCounter
+from platogram.ops import parse, render
+from platogram.types import SpeechEvent
+
+
+def respond(params: dict) -> str | dict:
+    """Groups every three transcript segments into a paragraph and fails the first chunk once."""
+    respond.temperatures.add(params["temperature"])  # type: ignore
+    tools = params.get("tools")
+    if tools and tools[0]["name"] == "render_content_info":
+        return {"title": "Title", "summary": "Summary"}
+    if tools:
+        return {"entities": [{"title": "Intro", "marker": "【0】"}]}
+
+    transcript = re.findall(r"<transcript>(.*?)</transcript>", params["messages"][-2]["content"])[0]
+    if "Sentence 0." in transcript and not respond.failed:  # type: ignore
+        respond.failed = True  # type: ignore
+        raise RuntimeError("overloaded")
+
+    segments = list(parse(transcript).items())
+    return "\n".join(
+        f"<p>{render(dict(segments[i : i + 3]))}</p>" for i in range(0, len(segments), 3)
+    )
+
+
+def test_batch_indexer_survives_restart(tmp_path: Path) -> None:
+    respond.failed = False  # type: ignore
+    respond.temperatures = set()  # type: ignore
+    llm = PromptBuilder("claude-3-5-sonnet", token_counter=TokenCounter(mode="estimate"))
+    backend = LocalBatchBackend(tmp_path / "batches", respond, polls=2)
+    state_file = tmp_path / "state.json"
+    transcripts = {
+        f"talk-{n}": [SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(40 + n)]
+        for n in range(3)
+    }
+
+    indexer = BatchIndexer(llm, backend, state_file, chunk_size=40, overlap=4, temperature=0.2)
+    for id, transcript in transcripts.items():
+        indexer.add(id, transcript)
+    assert not indexer.step()
+    assert len(indexer.state.batch_ids) == 1
+
+    # a new indexer picks up the batch in progress
+    indexer = BatchIndexer(llm, backend, state_file, chunk_size=40, overlap=4, temperature=0.2)
+    steps = 1
+    while not indexer.step():
+        steps += 1
+    # paragraphs, retry of the failed chunk, meta and chapters, each polled twice
+    assert steps == 6
+
+    contents = indexer.contents()
+    assert list(contents) == list(transcripts)
+    for id, content in contents.items():
+        markers = [int(m) for p in content.passages for m in re.findall(r"【(\d+)】", p)]
+        assert markers == list(range(len(transcripts[id])))
+        assert (content.title, content.chapters) == ("Title", {0: "Intro"})
+    assert not indexer.failed
+    # paragraphs, meta and chapters are all sampled with the indexer's temperature
+    assert respond.temperatures == {0.2}  # type: ignore
+
+
+
+class CrashingBackend(LocalBatchBackend):
+    """Records submitted batches, the job crashes when submitting batch number `crash_at`."""
+
+    def __init__(self, *args, crash_at: int | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.crash_at = crash_at
+        self.submitted: list[list[str]] = []
+
+    def submit(self, requests):
+        if len(self.submitted) + 1 == self.crash_at:
+            self.crash_at = None
+            raise KeyboardInterrupt
+        self.submitted.append([request.custom_id for request in requests])
+        return super().submit(requests)
+
+
+def test_batch_indexer_splits_batches_and_saves_every_batch_id(tmp_path: Path) -> None:
+    respond.failed = True  # type: ignore
+    respond.temperatures = set()  # type: ignore
+    llm = PromptBuilder("claude-3-5-sonnet", token_counter=TokenCounter(mode="estimate"))
+    backend = CrashingBackend(tmp_path / "batches", respond, crash_at=2)
+    state_file = tmp_path / "state.json"
+    transcripts = {
+        f"talk-{n}": [SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(40 + n)]
+        for n in range(3)
+    }
+
+    def make_indexer() -> BatchIndexer:
+        return BatchIndexer(llm, backend, state_file, chunk_size=40, overlap=4, max_batch_requests=4)
+
+    indexer = make_indexer()
+    for id, transcript in transcripts.items():
+        indexer.add(id, transcript)
+    with pytest.raises(KeyboardInterrupt):
+        indexer.step()
+
+    # the batch submitted before the crash is in the saved state
+    indexer = make_indexer()
+    assert indexer.state.batch_ids and len(backend.submitted) == 1
+    while not indexer.step():
+        pass
+
+    assert all(len(batch) <= 4 for batch in backend.submitted)
+    # no request was submitted twice
+    custom_ids = [custom_id for batch in backend.submitted for custom_id in batch]
+    assert len(custom_ids) == len(set(custom_ids))
+
+    contents = indexer.contents()
+    assert list(contents) == list(transcripts)
+    for id, content in contents.items():
+        markers = [int(m) for p in content.passages for m in re.findall(r"【(\d+)】", p)]
+        assert markers == list(range(len(transcripts[id])))
+
+
+def test_batch_indexer_splits_batches_by_bytes(tmp_path: Path) -> None:
+    llm = PromptBuilder("claude-3-5-sonnet", token_counter=TokenCounter(mode="estimate"))
+    indexer = BatchIndexer(llm, LocalBatchBackend(tmp_path, respond), tmp_path / "state.json")
+    requests = [BatchRequest(custom_id=str(i), params={"text": "x" * 100}) for i in range(5)]
+    size = len(requests[0].model_dump_json().encode())
+
+    indexer.max_batch_bytes = 2 * size
+    assert [len(batch) for batch in indexer._batches(requests)] == [2, 2, 1]
+    # a request over the limit still goes out, alone
+    indexer.max_batch_bytes = 1
+    assert [len(batch) for batch in indexer._batches(requests)] == [1, 1, 1, 1, 1]
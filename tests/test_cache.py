@@ -0,0 +1,75 @@
+import time
+from pathlib import Path
+
+from platogram.cache import DiskCache, MetadataCache
+from platogram.utils import normalize_url
+
+
+def test_disk_cache_ttl(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path / "cache.sqlite3", ttl=60)
+    cache.put("a", {"x": 1})
+    assert cache.get("a") == {"x": 1}
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    time.sleep(0.01)
+    assert cache.get("a", ttl=0) is None
+    assert len(cache) == 0
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path / "cache.sqlite3", max_bytes=25)
+    cache.put("a", "a" * 8)
+    cache.put("b", "b" * 8)
+    cache.get("a")
+    cache.put("c", "c" * 8)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "a" * 8
+    assert cache.get("c") == "c" * 8
+
+
+def test_disk_cache_many(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path / "cache.sqlite3")
+    cache.put_many({"a": 1, "b": [2]})
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "b": [2]}
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_normalize_url() -> None:
+    canonical = "https://youtube.com/watch?v=abc"
+    assert normalize_url("https://youtu.be/abc?si=xyz") == canonical
+    assert normalize_url("HTTPS://www.YouTube.com/watch?v=abc&t=42#comments") == canonical
+    assert normalize_url("https://m.youtube.com/shorts/abc/") == canonical
+    assert normalize_url("https://example.com/a?b=2&a=1&utm_source=x") == "https://example.com/a?a=1&b=2"
+    # YouTube rules don't apply to other hosts, where t= or m. may point to a different page
+    assert normalize_url("https://example.com/item?t=1") != normalize_url("https://example.com/item?t=2")
+    assert normalize_url("https://m.example.com/a?si=1") == "https://m.example.com/a?si=1"
+
+
+def test_metadata_cache_expires_failures_first(tmp_path: Path) -> None:
+    cache = MetadataCache(tmp_path / "metadata.sqlite3", ttl=60, failure_ttl=0)
+    cache.put("https://youtu.be/abc", {"id": "abc"})
+    cache.put("https://example.com/broken", {})
+
+    time.sleep(0.01)
+    assert cache.get("https://www.youtube.com/watch?v=abc") == {"id": "abc"}
+    assert cache.get("https://example.com/broken") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_get_metadata_is_cached_across_processes(monkeypatch, tmp_path: Path) -> None:
+    import platogram.ingest as ingest
+
+    calls = []
+    monkeypatch.setattr(ingest, "extract_metadata", lambda url: calls.append(url) or {"id": "abc"})
+    try:
+        for _ in range(2):
+            # a new process starts with an empty in-process cache
+            ingest.set_metadata_cache(MetadataCache(tmp_path / "metadata.sqlite3"))
+            assert ingest.get_id("https://youtu.be/abc") == "abc"
+            assert ingest.get_id("https://youtu.be/abc?si=1") == "abc"
+            assert ingest.get_metadata(f"file://{tmp_path}/video.mp4") == {}
+        assert calls == ["https://youtu.be/abc"]
+    finally:
+        ingest.set_metadata_cache(None)
@@ -1,31 +1,40 @@
-import os
 from pathlib import Path
-import tempfile
 import platogram.cli as cli
 from platogram.types import Content
 import platogram as plato
 
 
-def test_process_url():
-    anthropic_api_key = os.environ["ANTHROPIC_API_KEY"]
-    assemblyai_api_key = os.environ.get("ASSEMBLYAI_API_KEY")
+def make_content(title: str) -> Content:
+    return Content(
+        title=title,
+        summary="Summary",
+        chapters={0: "Intro", 2: "Outro"},
+        passages=["One【0】", "Two【1】", "Three【2】"],
+        transcript=[plato.SpeechEvent(time_ms=i * 1000, text=str(i)) for i in range(3)],
+    )
 
-    url = "https://www.youtube.com/shorts/XsLK3tPy9SI"
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        library = plato.library.get_semantic_local_chroma(Path(temp_dir))
+def test_main_renders_library_without_llm_cache(monkeypatch, tmp_path: Path, capsys) -> None:
+    library = plato.library.get_local_binary(tmp_path)
+    library.put("talk", make_content("Title"))
+    monkeypatch.setattr(cli, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr("sys.argv", ["plato", "--retrieval-method", "binary", "--title", "--verbose"])
 
-        content = cli.process_url(
-            url, library, anthropic_api_key, assemblyai_api_key, extract_images=True
-        )
+    cli.main()
+    assert "Title" in capsys.readouterr().out
+    assert not (tmp_path / "llm-cache.sqlite3").exists()
 
-        assert isinstance(content, Content)
-        assert content.title is not None
-        assert content.summary is not None
-        assert content.passages is not None
-        assert content.transcript is not None
-        assert content.images is not None
 
-        assert content.transcript
-        assert len(content.images) == len(content.transcript)
-        assert all((library.home / image).exists() for image in content.images)
+def test_main_passes_indexing_temperature(monkeypatch, tmp_path: Path) -> None:
+    calls = []
+
+    def process_urls(urls, *args, **kwargs):
+        calls.append(kwargs)
+        return [make_content("Title") for _ in urls]
+
+    monkeypatch.setattr(cli, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cli, "process_urls", process_urls)
+    monkeypatch.setattr("sys.argv", ["plato", "https://example.com/talk", "--temperature", "0", "--title"])
+
+    cli.main()
+    assert calls[0]["temperature"] == 0
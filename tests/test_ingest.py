@@ -1,4 +1,8 @@
+import shutil
+import subprocess
+
 import platogram
+import pytest
 
 from pathlib import Path
 from platogram import ingest
@@ -26,3 +30,94 @@ def test_slurp_youtube_transcribe():
         "https://www.youtube.com/shorts/XsLK3tPy9SI", asr_model
     )
     assert transcript
+
+
+def test_frame_segments():
+    timestamps_ms = [0, 1000, 500, 2000, 60_000, 61_000, 1000]
+    assert ingest.frame_segments(timestamps_ms, workers=1, max_gap_ms=10_000) == [
+        [0, 500, 1000, 2000],
+        [60_000, 61_000],
+    ]
+    assert ingest.frame_segments(timestamps_ms, workers=3, max_gap_ms=10_000) == [
+        [0, 500],
+        [1000, 2000],
+        [60_000, 61_000],
+    ]
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_extract_frames_matches_seeking(tmp_path):
+    video = tmp_path / "video.mp4"
+    subprocess.run(
+        ["ffmpeg", "-f", "lavfi", "-i", "testsrc2=size=160x90:rate=10", "-t", "5", str(video)],
+        check=True,
+        capture_output=True,
+    )
+    timestamps_ms = [0, 1234, 1250, 4000, 9000]
+    images = ingest.extract_frames(video, tmp_path, timestamps_ms)
+    assert images == [tmp_path / f"image_{ts:09d}.jpg" for ts in timestamps_ms]
+    # past the end of the video
+    assert not images[-1].exists()
+
+    for ts, image in zip(timestamps_ms[:-1], images):
+        seeked = tmp_path / f"seeked_{ts}.jpg"
+        subprocess.run(
+            ["ffmpeg", "-ss", f"{ts / 1000:.3f}", "-i", str(video)]
+            + ["-frames:v", "1", "-q:v", "2", str(seeked)],
+            check=True,
+            capture_output=True,
+        )
+        assert image.read_bytes() == seeked.read_bytes()
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_extract_frames_sparse_video(tmp_path):
+    # a slideshow: frames further apart than FRAME_SEARCH_MS
+    video = tmp_path / "video.mp4"
+    subprocess.run(
+        ["ffmpeg", "-f", "lavfi", "-i", "testsrc2=size=160x90:rate=0.1", "-t", "30", str(video)],
+        check=True,
+        capture_output=True,
+    )
+    timestamps_ms = [0, 1000, 1500]
+    images = ingest.extract_frames(video, tmp_path, timestamps_ms)
+    assert all(image.exists() for image in images)
+
+    for ts, image in zip(timestamps_ms, images):
+        seeked = tmp_path / f"seeked_{ts}.jpg"
+        subprocess.run(
+            ["ffmpeg", "-ss", f"{ts / 1000:.3f}", "-i", str(video)]
+            + ["-frames:v", "1", "-q:v", "2", str(seeked)],
+            check=True,
+            capture_output=True,
+        )
+        assert image.read_bytes() == seeked.read_bytes()
+
+    # both the pass and the seeking fallback scale images down, but not up
+    (tmp_path / "small").mkdir()
+    images = ingest.extract_frames(video, tmp_path / "small", [0, 1000], width=80)
+    assert [image_size(image) for image in images] == [(80, 46), (80, 46)]
+    (tmp_path / "large").mkdir()
+    images = ingest.extract_frames(video, tmp_path / "large", [0, 1000], width=640)
+    assert [image_size(image) for image in images] == [(160, 90), (160, 90)]
+
+
+def image_size(path: Path) -> tuple[int, int]:
+    # width and height from the JPEG start of frame segment
+    data = path.read_bytes()
+    i = 2
+    while data[i + 1] not in (0xC0, 0xC1, 0xC2):
+        i += 2 + int.from_bytes(data[i + 2 : i + 4], "big")
+    return int.from_bytes(data[i + 7 : i + 9], "big"), int.from_bytes(data[i + 5 : i + 7], "big")
+
+
+def test_passthrough_option_falls_back_to_vsync(monkeypatch):
+    def run(args, **kwargs):
+        return subprocess.CompletedProcess(args, 0, stdout="-vsync <>  set video sync method globally\n")
+
+    monkeypatch.setattr(ingest.subprocess, "run", run)
+    ingest.passthrough_option.cache_clear()
+    try:
+        assert ingest.passthrough_option() == ["-vsync", "passthrough"]
+    finally:
+        ingest.passthrough_option.cache_clear()
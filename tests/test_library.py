@@ -1,3 +1,4 @@
+import pytest
 import json
 
 from pathlib import Path
@@ -41,3 +42,204 @@ def test_keyword_local_bm25(tmp_path: Path) -> None:
     assert len(distances) == 16
     assert len(context[0].passages) == len(distances)
     assert "United Nations" in context[0].passages[0]
+
+
+def test_local_dumb_concurrent_put(tmp_path: Path) -> None:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from platogram.library import get_local_dumb
+
+    lib = get_local_dumb(tmp_path)
+    with open("samples/jfk.json", "r") as file:
+        content = Content(**json.load(file))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: lib.put(f"doc-{i % 4}", content), range(32)))
+
+    assert sorted(lib.ls()) == [f"doc-{i}" for i in range(4)]
+    assert all(lib.get_content(id) == content for id in lib.ls())
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_local_binary(tmp_path: Path) -> None:
+    from platogram.library import get_local_binary
+
+    lib = get_local_binary(tmp_path)
+    with open("samples/jfk.json", "r") as file:
+        content = Content(**json.load(file))
+    content.origin = "https://example.com/jfk"
+
+    lib.put("jfk", content, lang="en")
+
+    assert lib.ls() == ["jfk"]
+    assert lib.get_content("jfk") == content
+    assert lib.get_fields("jfk", ["title", "chapters"]) == {
+        "title": content.title,
+        "chapters": content.chapters,
+    }
+    assert lib.get_fields("jfk", ["transcript"])["transcript"] == content.transcript
+
+
+def test_migrate_json_to_binary(tmp_path: Path) -> None:
+    from platogram.library import get_local_dumb
+    from platogram.library.local_binary import LocalBinaryLibrary, migrate
+
+    source = get_local_dumb(tmp_path / "json")
+    with open("samples/jfk.json", "r") as file:
+        content = Content(**json.load(file))
+    content.images = ["jfk/image_000000000.png"]
+    source.put("jfk", content)
+    (source.home / "jfk").mkdir()
+    (source.home / "jfk" / "image_000000000.png").write_bytes(b"png")
+
+    assert migrate(source.home, tmp_path / "binary") == ["jfk"]
+
+    target = LocalBinaryLibrary(tmp_path / "binary")
+    assert target.get_content("jfk") == content
+    assert (target.home / "jfk" / "image_000000000.png").read_bytes() == b"png"
+    assert (tmp_path / "binary" / "jfk.plato").stat().st_size < (tmp_path / "json" / "jfk.json").stat().st_size
+
+
+def test_local_sqlite(tmp_path: Path) -> None:
+    from platogram.library.local_sqlite import LocalSQLiteLibrary
+
+    lib = LocalSQLiteLibrary(tmp_path)
+    with open("samples/jfk.json", "r") as file:
+        content = Content(**json.load(file))
+
+    for i in range(5):
+        content.origin = f"https://example.com/{i}"
+        lib.put(f"doc-{i}", content, lang="en" if i % 2 else "es")
+
+    assert lib.ls() == [f"doc-{i}" for i in range(5)]
+    assert lib.exists("doc-3") and not lib.exists("doc-5")
+    assert lib.get_content("doc-4") == content
+    assert lib.get_fields("doc-4", ["title", "chapters"]) == {"title": content.title, "chapters": content.chapters}
+
+    first = lib.ls_page(limit=2)
+    second = lib.ls_page(limit=2, after=first[-1].id)
+    assert [m.id for m in first + second] == ["doc-0", "doc-1", "doc-2", "doc-3"]
+    assert [m.id for m in lib.ls_page(lang="en")] == ["doc-1", "doc-3"]
+    assert [m.id for m in lib.ls_page(origin="https://example.com/2")] == ["doc-2"]
+    assert lib.get_metadata("doc-0").passages == len(content.passages)
+    with pytest.raises(KeyError):
+        lib.ls_page(after="doc-5")
+
+    lib.delete("doc-0")
+    assert lib.count() == 4
+    assert lib.db.execute("SELECT COUNT(*) FROM events WHERE content_id = 'doc-0'").fetchone()[0] == 0
+
+
+def test_keyword_local_bm25_corpus(tmp_path: Path) -> None:
+    from platogram.library.keyword_local_bm25 import LocalBM25Library
+
+    with open("samples/jfk.json", "r") as file:
+        jfk = Content(**json.load(file))
+    other = Content(
+        title="Cooking",
+        summary="Pasta",
+        chapters={0: "Pasta"},
+        passages=["Boil the pasta in salted water.【0】", "Serve the pasta with tomato sauce.【1】"],
+        transcript=jfk.transcript[:2],
+    )
+
+    lib = LocalBM25Library(tmp_path, compact_threshold=1000)
+    lib.put("jfk", jfk)
+    lib.put("pasta", other)
+
+    context, scores = lib.retrieve("pasta with tomato sauce", 3, [])
+    assert context[0].title == "Cooking"
+    assert context[0].passages[0] == other.passages[1]
+    assert len(scores) == 3
+
+    context, _ = lib.retrieve("pasta with tomato sauce", 3, ["jfk"])
+    assert [content.title for content in context] == [jfk.title]
+
+    lib.compact()
+    reopened = LocalBM25Library(tmp_path)
+    context, scores = reopened.retrieve("United Nations", 2, ["jfk", "pasta"])
+    assert "United Nations" in context[0].passages[0]
+
+    reopened.delete("pasta")
+    context, _ = reopened.retrieve("pasta", 5, [])
+    assert [content.title for content in context] == [jfk.title]
+
+    reopened.compact()
+    assert [path.name for path in (tmp_path / "bm25.index").glob("main-*")] == ["main-2"]
+
+
+def test_cached_embedding_function(tmp_path: Path) -> None:
+    from platogram.cache import DiskCache
+    from platogram.library.embeddings import CachedEmbeddingFunction, HashingEmbeddingFunction
+
+    calls = []
+
+    def embed(input: list[str]) -> list[list[float]]:
+        calls.append(len(input))
+        return HashingEmbeddingFunction(dim=16)(input)
+
+    texts = [f"passage {i}" for i in range(5)]
+    function = CachedEmbeddingFunction(embed, "test/model", DiskCache(tmp_path / "cache.sqlite3"), batch_size=2)
+    embeddings = function(texts + texts[:1])
+
+    assert calls == [2, 2, 1]
+    assert embeddings[-1] == embeddings[0]
+    assert function(texts) == embeddings[:5]
+    assert calls == [2, 2, 1]
+
+
+def test_semantic_local_chroma_local_embeddings(tmp_path: Path) -> None:
+    lib = get_semantic_local_chroma(tmp_path, "local/hashing")
+
+    with open("samples/jfk.json", "r") as file:
+        jfk = Content(**json.load(file))
+    pasta = Content(
+        title="Cooking",
+        summary="Pasta",
+        chapters={0: "Pasta"},
+        passages=["Boil the pasta in salted water.【0】", "Serve the pasta with tomato sauce.【1】"],
+        transcript=jfk.transcript[:2],
+    )
+    lib.put_many({"jfk": jfk, "pasta": pasta})
+
+    context, distances = lib.retrieve("pasta with tomato sauce", 2, ["jfk", "pasta"])
+    assert context[0].passages[0] == pasta.passages[1]
+    assert len(distances) == 2
+
+    misses = lib.embed.misses
+    lib.put("pasta", pasta)
+    assert lib.embed.misses == misses
+
+    pasta.passages = pasta.passages[:1]
+    lib.put("pasta", pasta)
+    context, distances = lib.retrieve("pasta with tomato sauce", 5, ["pasta"])
+    assert context[0].passages == pasta.passages
+
+
+def test_hybrid_local(tmp_path: Path) -> None:
+    from platogram.library import get_hybrid_local
+    from platogram.library.hybrid_local import reciprocal_rank_fusion
+
+    scores = reciprocal_rank_fusion([[("a", 0), ("b", 0)], [("b", 0), ("c", 0)]], [1.0, 1.0], k=1)
+    assert max(scores, key=scores.__getitem__) == ("b", 0)
+
+    lib = get_hybrid_local(tmp_path, "local/hashing")
+    with open("samples/jfk.json", "r") as file:
+        jfk = Content(**json.load(file))
+    with open("samples/obama.json", "r") as file:
+        obama = Content(**json.load(file))
+    lib.put("jfk", jfk)
+    lib.put("obama", obama)
+
+    context, scores = lib.retrieve("Iraq and Afghanistan", 3, [])
+    assert context[0].title == obama.title
+    assert "Iraq" in context[0].passages[0]
+    assert len(scores) == 3 and scores == sorted(scores, reverse=True)
+
+    context, _ = lib.retrieve("Iraq and Afghanistan", 3, ["jfk"])
+    assert [content.title for content in context] == [jfk.title]
+
+    lib.delete("obama")
+    assert lib.ls() == ["jfk"]
+    context, _ = lib.retrieve("Iraq and Afghanistan", 3, [])
+    assert [content.title for content in context] == [jfk.title]
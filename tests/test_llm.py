@@ -1,4 +1,5 @@
 import platogram
+from platogram.llm.tokenizer import TokenCounter
 from platogram.types import Content, SpeechEvent
 import json
 
@@ -123,3 +124,91 @@ def test_render_context() -> None:
 <text>Second Asset Sentence one.【3】Second Asset Sentence two.【4】Second Asset Sentence three.【5】</text>
 </content>"""
     )
+
+
+def test_token_counter_estimate() -> None:
+    counter = TokenCounter(mode="estimate")
+    assert counter.count_tokens("a" * 42, lang="en") == 10
+    assert counter.count_tokens("a" * 42, lang="es") == 14
+    assert counter.count_tokens_many(["a" * 42, "", "a" * 42]) == [10, 0, 10]
+
+
+def test_token_counter_cache() -> None:
+    counter = TokenCounter(mode="estimate", cache_size=2)
+    counter.count_tokens_many(["one", "two", "three"])
+    assert len(counter.cache) == 2
+    assert counter.count_tokens("three") == counter.estimate("three")
+
+
+def test_response_cache_modes(tmp_path) -> None:
+    from platogram.llm.cache import ResponseCache
+    from platogram.types import User
+
+    path = tmp_path / "llm-cache.sqlite3"
+    messages = [User(content="hello")]
+    key = ResponseCache.key("model", "system", messages, None, 0.0, 100)
+    assert key != ResponseCache.key("model", "system", messages, None, 0.0, 200)
+
+    cache = ResponseCache(path)
+    assert cache.cacheable(0.0) and not cache.cacheable(0.5)
+    cache.put(key, "world")
+    assert cache.get(key) == "world"
+
+    assert ResponseCache(path, mode="refresh").get(key) is None
+    assert ResponseCache(path, mode="bypass").cacheable(0.0) is False
+    assert ResponseCache(path, any_temperature=True).cacheable(0.5)
+
+
+def test_render_context_budget() -> None:
+    from platogram.llm.anthropic import PromptBuilder
+
+    llm = PromptBuilder("claude-3-5-sonnet", token_counter=TokenCounter(mode="estimate"))
+    context = []
+    for name in ("jfk", "obama"):
+        with open(f"samples/{name}.json") as f:
+            context.append(Content(**json.load(f)))
+
+    full = llm.render_context(context, "large")
+    assert llm.render_context(context, "large", budget=10**7) == full
+
+    packed = llm.render_context(context, "large", budget=2000, query="stars")
+    assert llm.count_tokens(packed) < 2100
+    assert all(content.title in packed for content in context)
+    assert "stars" in packed
+    assert "stars" not in llm.render_context(context, "large", budget=2000)
+    # markers keep their numbering
+    assert set(platogram.ops.MARKER.findall(packed)) <= set(platogram.ops.MARKER.findall(full))
+
+
+def test_prompt_caches_context(monkeypatch) -> None:
+    from types import SimpleNamespace
+
+    from platogram.llm.anthropic import Model
+
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        usage = SimpleNamespace(
+            input_tokens=10, output_tokens=5, cache_creation_input_tokens=0, cache_read_input_tokens=100
+        )
+        return SimpleNamespace(stop_reason="end_turn", content=[SimpleNamespace(text="ok")], usage=usage)
+
+    llm = Model("claude-3-5-sonnet", key="test", token_counter=TokenCounter(mode="estimate"))
+    monkeypatch.setattr(llm, "client", SimpleNamespace(messages=SimpleNamespace(create=create)))
+    renders = []
+    render_context = llm.render_context
+    monkeypatch.setattr(llm, "render_context", lambda *args, **kwargs: renders.append(1) or render_context(*args, **kwargs))
+
+    with open("samples/jfk.json") as f:
+        context = [Content(**json.load(f))]
+
+    for query in ("Who spoke?", "Summarize"):
+        assert llm.prompt(query, context=context, context_size="large") == "ok"
+
+    assert len(renders) == 1
+    first, second = requests
+    assert first["messages"][0] == second["messages"][0]
+    assert first["messages"][0]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert first["messages"][1] != second["messages"][1]
+    assert llm.usage["cache_read_input_tokens"] == 200
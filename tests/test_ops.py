@@ -1,6 +1,28 @@
+import asyncio
+import threading
+
 import platogram
 import pytest
-from platogram.ops import chunk_text, get_paragraphs, parse
+from platogram.ops import (
+    chunk_bounds,
+    chunk_text,
+    get_paragraphs,
+    get_chapters_map_reduce,
+    get_meta_map_reduce,
+    get_paragraphs_from_events,
+    index,
+    index_async,
+    index_stream,
+    index_stream_async,
+    pack,
+    parse,
+    relevance_scores,
+    render,
+    shift_markers,
+    stitch_paragraphs,
+)
+from platogram.checkpoint import Checkpoints
+from platogram.types import MARKER, ContentIndex, SpeechEvent
 
 
 def test_get_paragraphs() -> None:
@@ -108,3 +130,304 @@ def test_parse_multiple_segments():
     text = "segment1【1】segment2【2】segment3【3】"
     expected = {1: "segment1", 2: "segment2", 3: "segment3"}
     assert parse(text) == expected
+
+
+def test_chunk_bounds_oversized_segment():
+    assert chunk_bounds([1, 10, 1, 1], chunk_size=4) == [(0, 1), (1, 2), (2, 4)]
+
+
+def test_chunk_many_segments():
+    text_with_markers = render({i: "word " * (i % 7) for i in range(1000)})
+    chunks = chunk_text(text_with_markers, chunk_size=256, token_count_fn=len)
+    assert "".join(chunks) == text_with_markers
+    assert all(len(chunk) <= 256 for chunk in chunks)
+
+
+class FakeLLM:
+    """Groups every `group` (three by default) transcript segments into a paragraph."""
+
+    group = 3
+
+    def count_tokens(self, text: str, lang: str | None = None) -> int:
+        return len(text)
+
+    def count_tokens_many(self, texts, lang: str | None = None) -> list[int]:
+        return [len(text) for text in texts]
+
+    def get_paragraphs(self, text_with_markers, examples, max_tokens=4096, temperature=0.5, lang=None):
+        segments = list(parse(text_with_markers).items())
+        return [render(dict(segments[i : i + self.group])) for i in range(0, len(segments), self.group)]
+
+
+class SlowMetaLLM(FakeLLM):
+    """get_meta and get_chapters wait for each other, so they only return when run at once."""
+
+    def __init__(self) -> None:
+        self.both_started = threading.Barrier(2, timeout=5)
+
+    def get_meta(self, paragraphs, max_tokens=4096, temperature=0.5, lang=None):
+        self.both_started.wait()
+        return "Title", "Summary"
+
+    def get_chapters(self, passages, max_tokens=4096, temperature=0.5, lang=None):
+        self.both_started.wait()
+        raise RuntimeError("chapters failed")
+
+
+class HangingMetaLLM(FakeLLM):
+    def __init__(self) -> None:
+        self.release = threading.Event()
+
+    def get_meta(self, paragraphs, max_tokens=4096, temperature=0.5, lang=None):
+        self.release.wait(5)
+        return "Title", "Summary"
+
+
+def test_index_meta_and_chapters_concurrently() -> None:
+    transcript = [SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(10)]
+    # run one after the other, the barrier would break and leave the default title
+    content = index(transcript, SlowMetaLLM())
+    assert (content.title, content.summary) == ("Title", "Summary")
+    assert content.chapters == {0: "All Content"}
+
+    llm = HangingMetaLLM()
+    try:
+        content = index(transcript, llm, meta_timeout=0.05)
+    finally:
+        llm.release.set()
+    assert content.title == "Missing Title"
+
+
+def test_index_stream() -> None:
+    transcript = [SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(50)]
+    events = list(index_stream(transcript, SlowMetaLLM(), chunk_size=100))
+
+    assert events[0].type == "paragraphs"
+    assert [event.type for event in events[-3:]] == ["meta", "chapters", "done"]
+    streamed = [p for event in events if event.type == "paragraphs" for p in event.paragraphs]
+    assert streamed == events[-1].content.passages
+    assert events[-1].content.index is not None
+
+
+def test_index_stream_emits_every_paragraph_once() -> None:
+    transcript = [SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(200)]
+    # sequential: what is streamed is exactly what index() returns, nothing is emitted and then trimmed
+    events = list(index_stream(transcript, grouping_llm(5), chunk_size=300))
+    streamed = [p for event in events if event.type == "paragraphs" for p in event.paragraphs]
+    assert streamed == events[-1].content.passages
+    assert streamed == get_paragraphs_from_events(
+        transcript, grouping_llm(5), max_tokens=4096, temperature=0.5, chunk_size=300
+    )
+    assert paragraph_markers(streamed) == list(range(200))
+
+    events = list(index_stream(transcript, grouping_llm(5), chunk_size=300, concurrency=4))
+    streamed = [p for event in events if event.type == "paragraphs" for p in event.paragraphs]
+    assert streamed == events[-1].content.passages
+    assert paragraph_markers(streamed) == list(range(200))
+
+
+def test_content_index() -> None:
+    transcript = [SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(6)]
+    passages = ["One【0】 two【1】", "Three【3】", "Four【4】 five【5】"]
+    index = ContentIndex.build(passages, transcript, {1: "Intro", 4: "Outro"})
+
+    assert index.time_ms(3) == 3000
+    assert [index.marker_at(t) for t in (-1, 0, 2500, 10_000)] == [-1, 0, 2, 5]
+    # marker 2 is in no passage and belongs to the passage before it
+    assert [index.passage_of(m) for m in range(6)] == [0, 0, 0, 1, 2, 2]
+    assert [index.chapter_of(m) for m in (0, 1, 3, 4, 5)] == [-1, 1, 1, 4, 4]
+    assert index.passage_chapters == [-1, 1, 4]
+
+
+class FlakyLLM(FakeLLM):
+    def __init__(self, fail_after: int | None = None) -> None:
+        self.calls = 0
+        self.fail_after = fail_after
+
+    def get_paragraphs(self, text_with_markers, examples, max_tokens=4096, temperature=0.5, lang=None):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise RuntimeError("rate limited")
+        self.calls += 1
+        return super().get_paragraphs(text_with_markers, examples, max_tokens, temperature, lang)
+
+
+def test_get_paragraphs_resumes_from_checkpoints(tmp_path) -> None:
+    transcript = [SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(100)]
+    checkpoints = Checkpoints(tmp_path)
+
+    with pytest.raises(RuntimeError, match="rate limited"):
+        get_paragraphs_from_events(
+            transcript, FlakyLLM(fail_after=3), 2048, 0.5, chunk_size=200, checkpoints=checkpoints
+        )
+    assert len(checkpoints) == 3
+
+    llm = FlakyLLM()
+    paragraphs = get_paragraphs_from_events(
+        transcript, llm, 2048, 0.5, chunk_size=200, checkpoints=checkpoints
+    )
+    total = llm.calls + 3
+    assert paragraphs == get_paragraphs_from_events(transcript, FlakyLLM(), 2048, 0.5, chunk_size=200)
+
+    llm = FlakyLLM(fail_after=0)
+    assert paragraphs == get_paragraphs_from_events(
+        transcript, llm, 2048, 0.5, chunk_size=200, checkpoints=checkpoints
+    )
+    assert len(checkpoints) == total
+
+
+def grouping_llm(group: int) -> FakeLLM:
+    llm = FakeLLM()
+    llm.group = group
+    return llm
+
+
+def paragraph_markers(paragraphs: list[str]) -> list[int]:
+    return [int(marker) for paragraph in paragraphs for marker in MARKER.findall(paragraph)]
+
+
+def test_get_paragraphs_parallel_covers_every_marker_once() -> None:
+    text = render({i: f"Sentence {i}." for i in range(200)})
+    for group in (3, 5, 7):
+        paragraphs = get_paragraphs(
+            text, grouping_llm(group), max_tokens=2048, temperature=0.5, chunk_size=300, concurrency=4, overlap=4
+        )
+        assert paragraph_markers(paragraphs) == list(range(200))
+
+
+class RecordingLLM(FakeLLM):
+    """Records the segments of every window sent to the model."""
+
+    def __init__(self, group: int) -> None:
+        self.group = group
+        self.windows: list[list[int]] = []
+
+    def get_paragraphs(self, text_with_markers, examples, max_tokens=4096, temperature=0.5, lang=None):
+        self.windows.append([int(text.split()[1].rstrip(".")) for text in parse(text_with_markers).values()])
+        return super().get_paragraphs(text_with_markers, examples)
+
+
+def test_get_paragraphs_sequential_windows_dont_repeat_kept_segments() -> None:
+    text = render({i: f"Sentence {i}." for i in range(200)})
+    llm = RecordingLLM(group=5)
+    paragraphs = get_paragraphs(text, llm, max_tokens=2048, temperature=0.5, chunk_size=300)
+    assert paragraph_markers(paragraphs) == list(range(200))
+
+    # a window repeats only the segments of the paragraph trimmed from the previous one, it used to
+    # start with the last kept segment too, which ended up in two paragraphs
+    kept: list[int] = []
+    for window, next_window in zip(llm.windows, llm.windows[1:]):
+        kept += [segment for segment in window if segment < next_window[0]]
+        assert next_window[0] == kept[-1] + 1
+        assert next_window[0] > window[0]
+
+
+def test_get_paragraphs_from_events_matches_text() -> None:
+    transcript = [SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(100)]
+    text = render({i: event.text for i, event in enumerate(transcript)})
+    assert get_paragraphs_from_events(
+        transcript, FakeLLM(), max_tokens=2048, temperature=0.5, chunk_size=300
+    ) == get_paragraphs(text, FakeLLM(), max_tokens=2048, temperature=0.5, chunk_size=300)
+
+
+def test_shift_markers() -> None:
+    assert shift_markers("a【0】b【1】【2】", 5) == "a【5】b【6】【7】"
+
+
+def test_stitch_paragraphs() -> None:
+    windows = [
+        ["s0【0】s1【1】", "s2【2】s3【3】", "s4【4】s5【5】"],
+        ["s2【2】", "s3【3】 s4【4】", "no markers", "s5【5】s6【6】", "s7【7】"],
+    ]
+    paragraphs = stitch_paragraphs(windows, core_ends=[3, 7])
+    assert paragraphs == ["s0【0】s1【1】", "s2【2】s3【3】", "s4【4】", "no markers", "s5【5】s6【6】", "s7【7】"]
+    assert paragraph_markers(paragraphs) == list(range(8))
+
+
+class AsyncFakeLLM(FakeLLM):
+    async def get_paragraphs(self, text_with_markers, examples, max_tokens=4096, temperature=0.5, lang=None):
+        await asyncio.sleep(0.01)
+        return FakeLLM.get_paragraphs(self, text_with_markers, examples)
+
+    async def get_meta(self, paragraphs, max_tokens=4096, temperature=0.5, lang=None):
+        return "Title", "Summary"
+
+    async def get_chapters(self, passages, max_tokens=4096, temperature=0.5, lang=None):
+        raise RuntimeError("chapters failed")
+
+
+@pytest.mark.asyncio
+async def test_index_async_matches_index() -> None:
+    transcript = [SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(50)]
+    for concurrency in (1, 4):
+        expected = index(transcript, SlowMetaLLM(), chunk_size=100, concurrency=concurrency)
+        content = await index_async(transcript, AsyncFakeLLM(), chunk_size=100, concurrency=concurrency)
+        assert content.passages == expected.passages
+        assert (content.title, content.summary) == ("Title", "Summary")
+        assert content.chapters == {0: "All Content"}
+
+
+@pytest.mark.asyncio
+async def test_index_async_covers_every_marker_once() -> None:
+    transcript = [SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(200)]
+    llm = AsyncFakeLLM()
+    llm.group = 5
+    for concurrency in (1, 4):
+        content = await index_async(transcript, llm, chunk_size=300, concurrency=concurrency)
+        assert paragraph_markers(content.passages) == list(range(200))
+
+
+@pytest.mark.asyncio
+async def test_index_stream_async_matches_index_stream() -> None:
+    transcript = [SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(200)]
+    llm = AsyncFakeLLM()
+    llm.group = 5
+    for concurrency in (1, 4):
+        expected = list(index_stream(transcript, grouping_llm(5), chunk_size=300, concurrency=concurrency))
+        events = [event async for event in index_stream_async(transcript, llm, chunk_size=300, concurrency=concurrency)]
+        types = [event.type for event in events]
+        assert types[-3:] == ["meta", "chapters", "done"]
+        streamed = [p for event in events if event.type == "paragraphs" for p in event.paragraphs]
+        assert streamed == events[-1].content.passages == expected[-1].content.passages
+        # paragraphs arrive before the whole transcript is rewritten
+        assert types.index("paragraphs") < types.index("progress") + types.count("progress") - 1
+
+
+class WindowedLLM(FakeLLM):
+    """Fails on prompts longer than the context window, one chapter per three passages."""
+
+    context_window = 100
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def get_meta(self, paragraphs, max_tokens=4096, temperature=0.5, lang=None):
+        self.calls += 1
+        assert sum(self.count_tokens_many(paragraphs)) <= self.context_window
+        return "Title", f"Summary of {len(paragraphs)}"
+
+    def get_chapters(self, passages, max_tokens=4096, temperature=0.5, lang=None):
+        self.calls += 1
+        assert sum(self.count_tokens_many(passages)) <= self.context_window
+        return {min(parse(passage)): f"Chapter {i}" for i, passage in enumerate(passages[::3])}
+
+
+def test_get_meta_and_chapters_map_reduce() -> None:
+    paragraphs = [render({i: f"Sentence {i}."}) for i in range(200)]
+
+    llm = WindowedLLM()
+    assert get_meta_map_reduce(paragraphs, llm, window_tokens=100) == ("Title", "Summary of 2")
+    assert llm.calls < 60
+
+    chapters = get_chapters_map_reduce(paragraphs, llm, window_tokens=100)
+    assert chapters and set(chapters) <= set(range(200))
+
+    # short content takes a single request
+    llm = WindowedLLM()
+    get_meta_map_reduce(paragraphs[:3], llm, window_tokens=100)
+    assert llm.calls == 1
+
+
+def test_pack() -> None:
+    assert pack([5, 5, 1], [(0, 0), (2, 0), (1, 0)], budget=6) == [1, 2]
+    assert pack([5, 5, 1], [(0, 0), (0, -1), (0, -2)], budget=6) == [0, 2]
+    assert relevance_scores("moon", ["to the moon【1】", "the sea【2】"]) == [pytest.approx(1.0986, abs=1e-3), 0]
@@ -0,0 +1,58 @@
+import io
+import json
+
+import pytest
+
+import platogram as plato
+import platogram.output as output
+from platogram.types import Content
+
+
+def make_content(title: str) -> Content:
+    return Content(
+        title=title,
+        summary="Summary",
+        chapters={0: "Intro", 2: "Outro"},
+        passages=["One【0】", "Two【1】", "Three【2】"],
+        transcript=[plato.SpeechEvent(time_ms=i * 1000, text=str(i)) for i in range(3)],
+    )
+
+
+def test_render_passages_with_chapters() -> None:
+    rendered = output.render_passages(make_content("Title"), chapters=True)
+    assert rendered == "### Intro\n\nOne【0】\n\nTwo【1】\n\n### Outro\n\nThree【2】\n\n"
+    assert output.render_paragraph(rendered, lambda i: f"[{i}]").count("[") == 3
+
+
+def test_writers_stream_every_content_once() -> None:
+    consumed = []
+
+    def contents():
+        for title in ["A & B", "C"]:
+            consumed.append(title)
+            yield make_content(title)
+
+    out = io.StringIO()
+    output.get_writer("json", out, ["title", "passages"], inline_references=True).write_all(contents())
+    assert consumed == ["A & B", "C"]
+    document = json.loads(out.getvalue())
+    assert [content["title"] for content in document["contents"]] == ["A & B", "C"]
+    assert document["contents"][1]["passages"][0] == "One [[1]](#ts-1)"
+
+    out = io.StringIO()
+    output.get_writer("html", out, ["title", "passages", "chapters"]).write_all([make_content("A & B")], "Yes【1】")
+    page = out.getvalue()
+    assert "<p>Yes</p>" in page and "<h1>A &amp; B</h1>" in page and page.count("<h3>") == 2
+
+    out = io.StringIO()
+    output.get_writer("markdown", out, ["title"]).write_all([])
+    assert out.getvalue() == "\n"
+
+
+def test_writer_subclass_must_implement_answer_and_content() -> None:
+    class TitleWriter(output.Writer):
+        def content(self, content: Content) -> None:
+            self.out.write(content.title)
+
+    with pytest.raises(TypeError):
+        TitleWriter(io.StringIO(), ["title"])
@@ -0,0 +1,100 @@
+import json
+import re
+
+import pytest
+
+from platogram.paper import SECTIONS, generate_sections, render_paper
+from platogram.types import Content
+
+
+class EchoLLM:
+    async def prompt(self, prompt, *, context, context_size="small", lang=None, budget=None, **kwargs):
+        return f"\nAs said before【0】. {prompt[0].content[:10]}【1】"
+
+
+@pytest.fixture
+def content() -> Content:
+    with open("samples/jfk.json") as f:
+        return Content(**json.load(f))
+
+
+@pytest.mark.asyncio
+async def test_generate_sections(content: Content) -> None:
+    sections = await generate_sections(content, EchoLLM())
+    assert list(sections) == ["contributors", "introduction", "conclusion"]
+    assert sections["introduction"].startswith("## Introduction\nAs said before【0】")
+
+
+@pytest.mark.asyncio
+async def test_generate_sections_caches_context_before_concurrent_prompts(content: Content) -> None:
+    import asyncio
+
+    events = []
+
+    class RecordingLLM(EchoLLM):
+        async def prompt(self, prompt, **kwargs):
+            events.append(("start", prompt[1].content))
+            await asyncio.sleep(0.01)
+            events.append(("end", prompt[1].content))
+            return await super().prompt(prompt, **kwargs)
+
+    await generate_sections(content, RecordingLLM())
+    first = SECTIONS["en"]["contributors"][1]
+    # the first prompt is done before the others start, the others overlap
+    assert events[:2] == [("start", first), ("end", first)]
+    assert [kind for kind, _ in events[2:]] == ["start", "start", "end", "end"]
+
+
+@pytest.mark.asyncio
+async def test_render_paper(content: Content) -> None:
+    sections = await generate_sections(content, EchoLLM())
+
+    markdown = render_paper(content, sections, references=False)
+    assert markdown.startswith(f"# {content.title}\n\n## Origin")
+    assert "【" not in markdown and "](#ts-" not in markdown and "## References" not in markdown
+
+    # like audio_to_paper.sh, references the model wrote itself are stripped from every section
+    sections["conclusion"] += " As in [2] and [[3]](#ts-3)."
+    sections["contributors"] += "\n- Jane Doe [1]"
+    markdown = render_paper(content, sections, references=False)
+    assert not re.search(r"\[\d+\]", markdown)
+    assert "As in  and ." in markdown and "- Jane Doe \n" in markdown
+
+    markdown = render_paper(content, sections, references=True)
+    assert "As said before [[1]](#ts-1)" in markdown
+    assert "## References" in markdown
+
+
+@pytest.mark.asyncio
+async def test_make_paper_cancel_stops_processing(monkeypatch, tmp_path) -> None:
+    import asyncio
+    import threading
+
+    import platogram as plato
+    import platogram.paper as paper
+
+    started = threading.Event()
+    release = threading.Event()
+    finished = threading.Event()
+
+    def extract_transcript(url, asr, lang=None):
+        started.set()
+        release.wait(5)
+        finished.set()
+        return [plato.SpeechEvent(time_ms=0, text="Hello.")]
+
+    monkeypatch.setattr(plato, "extract_transcript", extract_transcript)
+    monkeypatch.setattr(plato.llm, "get_async_model", lambda *args, **kwargs: None)
+    task = asyncio.ensure_future(
+        paper.make_paper("https://example.com/talk", tmp_path, pdf=False, anthropic_api_key="key", library_dir=tmp_path)
+    )
+    await asyncio.to_thread(started.wait, 5)
+    task.cancel()
+    await asyncio.sleep(0.05)
+    # the conversion is over only once the transcription thread has returned
+    assert not task.done()
+    release.set()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert finished.is_set()
+    assert not plato.library.get_local_dumb(tmp_path).ls()
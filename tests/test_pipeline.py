@@ -0,0 +1,129 @@
+import asyncio
+import os
+from pathlib import Path
+import tempfile
+
+import pytest
+
+import platogram.pipeline as pipeline
+from platogram.ops import parse, render
+from platogram.types import Content, IndexDone
+import platogram as plato
+
+
+def test_process_url():
+    anthropic_api_key = os.environ["ANTHROPIC_API_KEY"]
+    assemblyai_api_key = os.environ.get("ASSEMBLYAI_API_KEY")
+
+    url = "https://www.youtube.com/shorts/XsLK3tPy9SI"
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        library = plato.library.get_semantic_local_chroma(Path(temp_dir))
+
+        content = pipeline.process_url(
+            url, library, anthropic_api_key, assemblyai_api_key, extract_images=True
+        )
+
+        assert isinstance(content, Content)
+        assert content.title is not None
+        assert content.summary is not None
+        assert content.passages is not None
+        assert content.transcript is not None
+        assert content.images is not None
+
+        assert content.transcript
+        assert len(content.images) == len(content.transcript)
+        assert all((library.home / image).exists() for image in content.images)
+
+
+def test_process_urls_keeps_order_and_isolates_failures(monkeypatch, tmp_path: Path) -> None:
+    import threading
+
+    fast_done = threading.Event()
+
+    def process_url(url, library, *args, position=None, **kwargs):
+        if url == "slow" and not fast_done.wait(5):
+            # "fast" comes later in the list, it only finishes first when URLs run at once
+            raise TimeoutError("URLs were processed one at a time")
+        if url == "broken":
+            raise RuntimeError("download failed")
+        if url == "fast":
+            fast_done.set()
+        return url
+
+    monkeypatch.setattr(pipeline, "process_url", process_url)
+    library = plato.library.get_local_dumb(tmp_path)
+
+    results = pipeline.process_urls(["slow", "broken", "fast"], library, "key", jobs=3)
+    assert results[0] == "slow" and results[2] == "fast"
+    assert isinstance(results[1], RuntimeError)
+
+
+def make_content(title: str) -> Content:
+    return Content(
+        title=title,
+        summary="Summary",
+        chapters={0: "Intro", 2: "Outro"},
+        passages=["One【0】", "Two【1】", "Three【2】"],
+        transcript=[plato.SpeechEvent(time_ms=i * 1000, text=str(i)) for i in range(3)],
+    )
+
+
+def test_process_url_saves_lang(monkeypatch, tmp_path: Path) -> None:
+    from platogram.library.local_sqlite import LocalSQLiteLibrary
+
+    content = make_content("Title")
+    monkeypatch.setattr(plato.llm, "get_model", lambda *args, **kwargs: None)
+    monkeypatch.setattr(plato, "extract_transcript", lambda *args, **kwargs: content.transcript)
+    monkeypatch.setattr(plato, "index_stream", lambda *args, **kwargs: iter([IndexDone(content=content)]))
+
+    library = LocalSQLiteLibrary(tmp_path)
+    pipeline.process_url("https://example.com/talk", library, "key", lang="es")
+    assert library.get_metadata("httpsexample.comtalk").lang == "es"
+
+
+class AsyncFakeLLM:
+    """Groups every three transcript segments into a paragraph."""
+
+    def count_tokens(self, text: str, lang: str | None = None) -> int:
+        return len(text)
+
+    def count_tokens_many(self, texts, lang: str | None = None) -> list[int]:
+        return [len(text) for text in texts]
+
+    async def get_paragraphs(self, text_with_markers, examples, max_tokens=4096, temperature=0.5, lang=None):
+        await asyncio.sleep(0)
+        segments = list(parse(text_with_markers).items())
+        return [render(dict(segments[i : i + 3])) for i in range(0, len(segments), 3)]
+
+    async def get_meta(self, paragraphs, max_tokens=4096, temperature=0.5, lang=None):
+        return "Title", "Summary"
+
+    async def get_chapters(self, passages, max_tokens=4096, temperature=0.5, lang=None):
+        return {0: "All Content"}
+
+
+@pytest.mark.asyncio
+async def test_process_url_async_indexes_with_async_model(monkeypatch, tmp_path: Path) -> None:
+    transcript = [plato.SpeechEvent(time_ms=i * 1000, text=f"Sentence {i}.") for i in range(10)]
+
+    def get_model(*args, **kwargs):
+        raise AssertionError("the sync model is not used")
+
+    monkeypatch.setattr(plato.llm, "get_model", get_model)
+    monkeypatch.setattr(plato.llm, "get_async_model", lambda *args, **kwargs: AsyncFakeLLM())
+    monkeypatch.setattr(plato, "extract_transcript", lambda *args, **kwargs: transcript)
+
+    events = []
+
+    async def on_event(event) -> None:
+        events.append(event)
+
+    library = plato.library.get_local_dumb(tmp_path)
+    content = await pipeline.process_url_async("https://example.com/talk", library, "key", on_event=on_event)
+    assert content.title == "Title"
+    # paragraphs are passed on before title, summary and chapters
+    assert [event.type for event in events][-3:] == ["meta", "chapters", "done"]
+    assert [p for event in events if event.type == "paragraphs" for p in event.paragraphs] == content.passages
+    assert content.passages[0] == "Sentence 0.【0】Sentence 1.【1】Sentence 2.【2】"
+    assert library.get_content("httpsexample.comtalk") == content
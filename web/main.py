@@ -1,7 +1,6 @@
 import asyncio
 import base64
 import os
-import re
 import tempfile
 import time
 from concurrent.futures import ProcessPoolExecutor
@@ -38,6 +37,8 @@ from pydantic import BaseModel
 from starlette.middleware.base import BaseHTTPMiddleware
 
 import platogram as plato
+from platogram.paper import Paper, make_paper
+from platogram.types import MARKER, IndexEvent
 
 SCOPES = [
     "https://mail.google.com/",
@@ -83,6 +84,9 @@ class Task(BaseModel):
     request: ConversionRequest
     status: Literal["running", "done", "failed"] = "running"
     error: Optional[str] = None
+    # indexing progress and the paragraphs indexed so far, shown while the paper is being made
+    progress: Optional[str] = None
+    passages: list[str] = []
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -198,7 +202,11 @@ async def status(user_id: str = Depends(verify_token_and_get_user_id)) -> dict:
     if user_id not in tasks:
         return {"status": "idle"}
     if tasks[user_id].status == "running":
-        return {"status": "running"}
+        return {
+            "status": "running",
+            "progress": tasks[user_id].progress,
+            "passages": tasks[user_id].passages,
+        }
     if tasks[user_id].status == "failed":
         return {"status": "failed", "error": tasks[user_id].error}
     if tasks[user_id].status == "done":
@@ -210,8 +218,8 @@ async def status(user_id: str = Depends(verify_token_and_get_user_id)) -> dict:
 @logfire.instrument()
 async def reset(user_id: str = Depends(verify_token_and_get_user_id)):
     if user_id in processes:
-        processes[user_id].terminate()
-        del processes[user_id]
+        # the conversion removes itself from processes once it has stopped
+        processes[user_id].cancel()
 
     if user_id in tasks:
         del tasks[user_id]
@@ -221,39 +229,35 @@ async def reset(user_id: str = Depends(verify_token_and_get_user_id)):
 
 async def audio_to_paper(
     url: str, lang: Language, output_dir: Path, user_id: str
-) -> tuple[str, str]:
-    # Get absolute path of current working directory
-    script_path = Path.cwd() / "examples" / "audio_to_paper.sh"
-    command = f'cd {output_dir} && {script_path} "{url}" --lang {lang} --verbose'
-
+) -> Paper:
     if user_id in processes:
         raise RuntimeError("Conversion already in progress.")
 
-    process = await asyncio.create_subprocess_shell(
-        command,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        shell=True,
-    )
-    processes[user_id] = process
+    task = asyncio.current_task()
+    processes[user_id] = task
+
+    async def on_event(event: IndexEvent) -> None:
+        if user_id not in tasks:
+            return
+        if event.type == "progress":
+            tasks[user_id].progress = f"Indexing: {event.done}/{event.total} chunks"
+        elif event.type == "paragraphs":
+            tasks[user_id].passages += [MARKER.sub("", paragraph) for paragraph in event.paragraphs]
 
     try:
-        stdout, stderr = await process.communicate()
+        return await make_paper(
+            url,
+            output_dir,
+            lang=lang,
+            library_dir=output_dir / ".platogram-cache",
+            on_event=on_event,
+        )
     finally:
-        if user_id in processes:
+        # make_paper returns only after processing has stopped, even when cancelled,
+        # and until then a new conversion for the user is refused
+        if processes.get(user_id) is task:
             del processes[user_id]
 
-    if process.returncode != 0:
-        raise RuntimeError(f"""Failed to execute {command} with return code {process.returncode}.
-
-stdout:
-{stdout.decode()}
-
-stderr:
-{stderr.decode()}""")
-
-    return stdout.decode(), stderr.decode()
-
 
 async def send_email(user_id: str, subj: str, body: str, files: list[Path]):
     loop = asyncio.get_running_loop()
@@ -312,7 +316,7 @@ async def convert_and_send(request: ConversionRequest, user_id: str):
             url = request.payload
 
         try:
-            stdout, stderr = await audio_to_paper(
+            paper = await audio_to_paper(
                 url, request.lang, Path(tmpdir), user_id
             )
         finally:
@@ -328,19 +332,8 @@ async def convert_and_send(request: ConversionRequest, user_id: str):
                         f"Failed to delete temporary file {request.payload}: {e}"
                     )
 
-        title_match = re.search(r"<title>(.*?)</title>", stdout, re.DOTALL)
-        if title_match:
-            title = title_match.group(1).strip()
-        else:
-            title = "👋"
-            logfire.warning("No title found in stdout, using default title")
-
-        abstract_match = re.search(r"<abstract>(.*?)</abstract>", stdout, re.DOTALL)
-        if abstract_match:
-            abstract = abstract_match.group(1).strip()
-        else:
-            abstract = ""
-            logfire.warning("No abstract found in stdout, using default abstract")
+        title = paper.title or "👋"
+        abstract = paper.abstract
 
         files = [f for f in Path(tmpdir).glob("*no-refs.pdf") if f.is_file()]
 